@@ -1,9 +1,15 @@
 from django.contrib import admin
 
-from core.accounts.models import Profile
+from core.accounts.models import Follow, Profile
 
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ("username", "name")
     search_fields = ["username", "name"]
+
+
+@admin.register(Follow)
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ("follower", "followee", "created_at")
+    raw_id_fields = ("follower", "followee")
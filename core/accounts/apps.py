@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = 'core.accounts'
+
+    def ready(self):
+        from core.accounts import signals  # noqa: F401
@@ -0,0 +1,97 @@
+"""
+Follow and unfollow many profiles at once.
+
+Django 2.1 has no bulk_create(ignore_conflicts=True), so edges are written
+with INSERT ... ON CONFLICT DO NOTHING / DELETE ... RETURNING on the Follow
+table. Only the edges actually created or removed come back, and the
+followed profiles' followers_count is updated in the same statement. These
+paths bypass the Follow signals of core.accounts.signals, the follower's
+following_count is updated here instead.
+"""
+import phonenumbers
+from django.db import connection, transaction
+from django.db.models import F, Q
+from phonenumbers import NumberParseException
+
+from core.accounts.models import Follow, Profile
+
+FOLLOW_SQL = """
+WITH followed AS (
+    INSERT INTO {edge} (follower_id, followee_id, created_at)
+    SELECT %(profile_id)s, id, now() FROM {profile} WHERE id = ANY(%(profile_ids)s)
+    ON CONFLICT (follower_id, followee_id) DO NOTHING
+    RETURNING followee_id
+)
+UPDATE {profile} SET followers_count = followers_count + 1
+FROM followed WHERE {profile}.id = followed.followee_id
+RETURNING {profile}.id
+"""
+
+UNFOLLOW_SQL = """
+WITH unfollowed AS (
+    DELETE FROM {edge}
+    WHERE follower_id = %(profile_id)s AND followee_id = ANY(%(profile_ids)s)
+    RETURNING followee_id
+)
+UPDATE {profile} SET followers_count = followers_count - 1
+FROM unfollowed WHERE {profile}.id = unfollowed.followee_id
+RETURNING {profile}.id
+"""
+
+
+def _execute(sql, profile, profile_ids, counter_change):
+    profile_ids = sorted(set(profile_ids) - {profile.id})
+    if not profile_ids:
+        return []
+    sql = sql.format(
+        edge=connection.ops.quote_name(Follow._meta.db_table),
+        profile=connection.ops.quote_name(Profile._meta.db_table),
+    )
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {"profile_id": profile.id, "profile_ids": profile_ids})
+            changed = [profile_id for profile_id, in cursor.fetchall()]
+        if changed:
+            Profile.objects.filter(id=profile.id).update(
+                following_count=F("following_count") + counter_change * len(changed)
+            )
+    return changed
+
+
+def follow(profile, profile_ids):
+    """ Follow every profile not followed yet, returns the ids that were newly followed """
+    return _execute(FOLLOW_SQL, profile, profile_ids, 1)
+
+
+def unfollow(profile, profile_ids):
+    """ Returns the ids that were actually unfollowed """
+    return _execute(UNFOLLOW_SQL, profile, profile_ids, -1)
+
+
+def resolve(ids=(), usernames=()):
+    """ Profiles referenced by id or by username, in one query """
+    return Profile.objects.filter(Q(id__in=ids) | Q(owner__username__in=usernames))
+
+
+def from_contacts(numbers):
+    """
+    Profiles whose phone is one of `numbers`, given in international format.
+    Profile.phone holds the national digits of the number, see SignupSerializer.
+    """
+    wanted = set()
+    for number in numbers:
+        try:
+            parsed = phonenumbers.parse(number, None)
+        except NumberParseException:
+            continue
+        wanted.add((f"+{parsed.country_code}", str(parsed.national_number)))
+    if not wanted:
+        return Profile.objects.none()
+
+    candidates = Profile.objects.filter(phone__in={phone for _, phone in wanted})
+    matches = [
+        profile.id
+        for profile in candidates.only("id", "phone", "country_code")
+        if (profile.country_code, profile.phone) in wanted
+    ]
+    return Profile.objects.filter(id__in=matches)
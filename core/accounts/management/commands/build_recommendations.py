@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.accounts import recommendations
+from core.accounts.tasks import schedule_recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuild the explore users recommendations, or start the periodic build task"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="queue the accounts.build_recommendations task, which reschedules itself "
+            "every RECOMMENDATIONS_INTERVAL seconds, instead of running once (e.g. from cron)",
+        )
+
+    def handle(self, *args, **options):
+        if options["schedule"]:
+            # the task is left to the worker process, this one exits right away
+            if schedule_recommendations(wake=False) is None:
+                self.stdout.write("A recommendations build is already scheduled")
+            else:
+                self.stdout.write(self.style.SUCCESS("Scheduled the recommendations build"))
+            return
+
+        profiles = recommendations.build()
+        if profiles is None:
+            raise CommandError("Another recommendations build is running")
+        self.stdout.write(self.style.SUCCESS(f"Recommendations built for {profiles} profiles"))
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_auto_20181009_2201'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='fanout_on_read',
+            field=models.BooleanField(default=False),
+        ),
+    ]
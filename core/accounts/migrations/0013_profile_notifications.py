@@ -0,0 +1,43 @@
+# Generated by Django 2.1.2 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_unread(apps, schema_editor):
+    """ nothing was ever marked as read, so every existing notification is unread """
+    Profile = apps.get_model('accounts', 'Profile')
+    Notification = apps.get_model('images', 'Notification')
+    unread = (
+        Notification.objects.filter(to=OuterRef('pk'))
+        .order_by()
+        .values('to')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Profile.objects.update(
+        unread_notifications_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_profile_counters'),
+        ('images', '0008_notification_grouping'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='notifications_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='unread_notifications_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
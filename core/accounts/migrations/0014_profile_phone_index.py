@@ -0,0 +1,18 @@
+# Generated by Django 2.1.2 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_profile_notifications'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='phone',
+            field=models.CharField(db_index=True, max_length=140, null=True),
+        ),
+    ]
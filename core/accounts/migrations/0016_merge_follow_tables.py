@@ -0,0 +1,48 @@
+# Generated by Django 2.1.2 on 2026-10-18 16:05
+
+from django.db import migrations
+
+BATCH_SIZE = 10000
+
+# (table, follower column, followed profile column): profile.following.add(x) stored
+# (from=profile, to=x) while profile.followers.add(x), x following profile, stored the same
+SOURCES = (
+    ('accounts_profile_following', 'from_profile_id', 'to_profile_id'),
+    ('accounts_profile_followers', 'to_profile_id', 'from_profile_id'),
+)
+
+COPY_BATCH = """
+INSERT INTO accounts_follow (follower_id, followee_id, created_at)
+SELECT {follower}, {followee}, now() FROM {table}
+WHERE id > %s AND id <= %s AND {follower} <> {followee}
+ON CONFLICT (follower_id, followee_id) DO NOTHING
+"""
+
+RECOUNT = """
+UPDATE accounts_profile SET
+    followers_count = (SELECT count(*) FROM accounts_follow WHERE followee_id = accounts_profile.id),
+    following_count = (SELECT count(*) FROM accounts_follow WHERE follower_id = accounts_profile.id)
+"""
+
+
+def merge_follow_tables(apps, schema_editor):
+    """ copy both edge tables into accounts_follow in primary key ranges, then recount """
+    with schema_editor.connection.cursor() as cursor:
+        for table, follower, followee in SOURCES:
+            cursor.execute(f'SELECT coalesce(max(id), 0) FROM {table}')
+            max_id, = cursor.fetchone()
+            sql = COPY_BATCH.format(table=table, follower=follower, followee=followee)
+            for start in range(0, max_id, BATCH_SIZE):
+                cursor.execute(sql, [start, start + BATCH_SIZE])
+        cursor.execute(RECOUNT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_follow'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_follow_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.1.2 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_merge_follow_tables'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='profile',
+            name='followers',
+        ),
+        migrations.RemoveField(
+            model_name='profile',
+            name='following',
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following',
+            field=models.ManyToManyField(blank=True, related_name='followers', symmetrical=False, through='accounts.Follow', through_fields=('follower', 'followee'), to='accounts.Profile'),
+        ),
+    ]
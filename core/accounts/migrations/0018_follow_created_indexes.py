@@ -0,0 +1,21 @@
+# Generated by Django 2.1.2 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_profile_following_through_follow'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followee', '-created_at'], name='follow_followee_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', '-created_at'], name='follow_follower_created_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.1.2 on 2026-10-18 17:05
+
+from django.conf import settings
+from django.db import migrations
+
+# match the UPPER("column"::text) LIKE UPPER('prefix%') that istartswith generates
+CREATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS auth_user_username_upper_like
+    ON auth_user (UPPER("username"::text) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS auth_user_first_name_upper_like
+    ON auth_user (UPPER("first_name"::text) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS auth_user_last_name_upper_like
+    ON auth_user (UPPER("last_name"::text) text_pattern_ops);
+"""
+
+DROP_INDEXES = """
+DROP INDEX IF EXISTS auth_user_username_upper_like;
+DROP INDEX IF EXISTS auth_user_first_name_upper_like;
+DROP INDEX IF EXISTS auth_user_last_name_upper_like;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0018_follow_created_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEXES, DROP_INDEXES),
+    ]
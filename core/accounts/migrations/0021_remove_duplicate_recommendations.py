@@ -0,0 +1,22 @@
+# Generated by Django 2.1.2 on 2026-10-18 21:40
+
+from django.db import migrations
+
+REMOVE_DUPLICATES = """
+DELETE FROM accounts_recommendation duplicate USING accounts_recommendation kept
+WHERE duplicate.profile_id = kept.profile_id
+  AND duplicate.candidate_id = kept.candidate_id
+  AND duplicate.id > kept.id;
+"""
+
+
+class Migration(migrations.Migration):
+    """ overlapping builds could insert a candidate twice, keep one before it becomes unique """
+
+    dependencies = [
+        ('accounts', '0020_recommendation'),
+    ]
+
+    operations = [
+        migrations.RunSQL(REMOVE_DUPLICATES, migrations.RunSQL.noop),
+    ]
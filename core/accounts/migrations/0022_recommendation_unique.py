@@ -0,0 +1,17 @@
+# Generated by Django 2.1.2 on 2026-10-18 21:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_remove_duplicate_recommendations'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='recommendation',
+            unique_together={('profile', 'candidate')},
+        ),
+    ]
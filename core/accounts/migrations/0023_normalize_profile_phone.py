@@ -0,0 +1,38 @@
+# Generated by Django 2.1.2 on 2026-10-18 22:00
+
+import phonenumbers
+from django.db import migrations
+from django.db.models import Value
+from django.db.models.functions import Concat
+from phonenumbers import NumberParseException
+
+
+def normalize_phones(apps, schema_editor):
+    """
+    phones and country codes were stored as typed at signup, keep the national
+    digits and the "+"-prefixed country code like new signups
+    """
+    Profile = apps.get_model('accounts', 'Profile')
+    Profile.objects.filter(country_code__isnull=False).exclude(country_code__startswith='+').update(
+        country_code=Concat(Value('+'), 'country_code')
+    )
+    profiles = Profile.objects.filter(phone__isnull=False, country_code__isnull=False)
+    for profile in profiles.only('id', 'phone', 'country_code').iterator():
+        try:
+            parsed = phonenumbers.parse(profile.country_code + profile.phone, None)
+        except NumberParseException:
+            continue
+        phone = str(parsed.national_number)
+        if phone != profile.phone:
+            Profile.objects.filter(id=profile.id).update(phone=phone)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0022_recommendation_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_phones, migrations.RunPython.noop),
+    ]
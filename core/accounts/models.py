@@ -1,12 +1,11 @@
 import os
 
-from authy.api import AuthyApiClient
-from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
 
 # Create your models here.
 from core.abstract_models import TimeStampedModel
+from core.accounts import verification
 
 
 def get_profile_img_path(instance, filename):
@@ -30,15 +29,31 @@ class Profile(TimeStampedModel):
     profile_image = models.ImageField(null=True, upload_to=get_profile_img_path)
     website = models.URLField(null=True)
     bio = models.TextField(null=True)
-    phone = models.CharField(max_length=140, null=True)
+    phone = models.CharField(max_length=140, null=True, db_index=True)
     country_code = models.CharField(max_length=5, null=True)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, default=NOT_SPECIFIED)
     verified = models.BooleanField(default=False)
     verification_metadata = models.TextField(blank=True)
-    followers = models.ManyToManyField("self", symmetrical=False, blank=True)
+    # profile.following: profiles it follows, profile.followers: profiles following it
     following = models.ManyToManyField(
-        "self", symmetrical=False, blank=True, related_name="profiles"
+        "self",
+        through="Follow",
+        through_fields=("follower", "followee"),
+        symmetrical=False,
+        blank=True,
+        related_name="followers",
     )
+    # set once a profile has too many followers to fan its posts out on write,
+    # followers then pull its images into their feed at read time
+    fanout_on_read = models.BooleanField(default=False)
+    # denormalized counters, kept up to date by core.accounts.signals and
+    # core.images.signals, see the reconcile_counters command
+    post_count = models.IntegerField(default=0)
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    # inbox rows created after notifications_read_at, see core.images.notifications
+    unread_notifications_count = models.IntegerField(default=0)
+    notifications_read_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.owner.username
@@ -52,16 +67,15 @@ class Profile(TimeStampedModel):
         return self.owner.username
 
     def verify(self, token=None):
-        authy_api = AuthyApiClient(settings.ACCOUNT_SECURITY_API_KEY)
+        """ Check the code sent to the phone, raises verification.ProviderUnavailable """
+        verified, errors = verification.provider().check(self.phone, self.country_code, token)
 
-        verification = authy_api.phones.verification_check(self.phone, self.country_code, token)
-
-        if verification.ok():
+        if verified:
             self.verified = True
-            self.save()
+            self.save(update_fields=["verified", "updated_at"])
             return True, None  # verified, error_msg
         else:
-            return False, verification.errors()
+            return False, errors
 
     def get_images(self, size=5):
         return self.images.all().order_by('-created_at')[:size]
@@ -71,14 +85,43 @@ class Profile(TimeStampedModel):
         profile = cls.objects.create(owner=user)
         return profile
 
-    @property
-    def post_count(self):
-        return self.images.count()
 
-    @property
-    def followers_count(self):
-        return self.followers.count()
+class Follow(models.Model):
+    """ The follow graph, one row per edge """
+    follower = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="following_edges")
+    followee = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="follower_edges")
+    created_at = models.DateTimeField(auto_now_add=True)
 
-    @property
-    def following_count(self):
-        return self.following.count()
+    class Meta:
+        # the unique index serves "does X follow Y", follow_followee_idx "who follows X"
+        unique_together = ("follower", "followee")
+        indexes = [
+            models.Index(fields=["followee", "follower"], name="follow_followee_idx"),
+            # followers/following lists, most recent first
+            models.Index(fields=["followee", "-created_at"], name="follow_followee_created_idx"),
+            models.Index(fields=["follower", "-created_at"], name="follow_follower_created_idx"),
+        ]
+
+    def __str__(self):
+        return "{} follows {}".format(self.follower_id, self.followee_id)
+
+
+class Recommendation(models.Model):
+    """
+    A profile suggested to another in explore, rebuilt by core.accounts.recommendations.
+    Rows without a profile are the suggestions for profiles that have none of their own.
+    """
+    profile = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, null=True, related_name="recommendations"
+    )
+    candidate = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ("profile", "candidate")
+        indexes = [
+            models.Index(fields=["profile", "-score", "-id"], name="recommendation_profile_idx")
+        ]
+
+    def __str__(self):
+        return "{} for {}: {}".format(self.candidate_id, self.profile_id, self.score)
@@ -0,0 +1,188 @@
+"""
+Explore users recommendations.
+
+`build()` ranks, for every profile, the profiles it doesn't follow yet:
+
+    RECOMMENDATIONS_MUTUAL_WEIGHT * people followed who follow the candidate
+    + RECOMMENDATIONS_ACTIVITY_WEIGHT * ln(1 + images posted in the last RECOMMENDATIONS_DAYS)
+    + RECOMMENDATIONS_PROXIMITY_WEIGHT * (1 - distance / RECOMMENDATIONS_RADIUS)
+
+where the distance is between the centers of the two profiles' recent
+images. Candidates are follows of follows, profiles posting within the
+radius and the most active posters. The RECOMMENDATIONS_SIZE best are
+stored as Recommendation rows, RECOMMENDATIONS_BATCH profiles per
+statement, plus a list without a profile ranked by activity alone for the
+profiles that have none yet. It runs periodically as the
+`accounts.build_recommendations` task, see the build_recommendations command.
+
+The activity and center of every recently posting profile are computed once
+per build into a temporary table with a GiST index on the centers, which
+every batch joins against. A build holds a PostgreSQL advisory lock, a
+second build started meanwhile (e.g. by a worker taking over an expired
+task lease) returns right away.
+"""
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.accounts.models import Follow, Profile, Recommendation
+from core.images.models import Image
+
+BUILD_LOCK = zlib.crc32(b"accounts.build_recommendations")
+
+ACTIVITY_SQL = """
+CREATE TEMPORARY TABLE {activity} AS
+SELECT creator_id AS profile_id, count(*) AS images,
+       ST_Centroid(ST_Collect(point))::geography AS center
+FROM {image}
+WHERE created_at > %(since)s AND processing_status = %(ready)s AND creator_id IS NOT NULL
+GROUP BY creator_id
+"""
+
+ACTIVITY_INDEXES_SQL = (
+    "CREATE UNIQUE INDEX ON {activity} (profile_id)",
+    "CREATE INDEX ON {activity} USING gist (center)",
+    "ANALYZE {activity}",
+)
+
+DEFAULT_SQL = """
+INSERT INTO {recommendation} (profile_id, candidate_id, score)
+SELECT NULL, profile_id, %(activity_weight)s * ln(1 + images)
+FROM {activity}
+ORDER BY images DESC, profile_id
+LIMIT %(size)s
+"""
+
+PROFILES_SQL = """
+WITH batch AS (
+    SELECT unnest(%(profile_ids)s::integer[]) AS profile_id
+),
+follows_of_follows AS (
+    SELECT followed.follower_id AS profile_id, second.followee_id AS candidate_id,
+           count(*) AS mutual
+    FROM {follow} followed JOIN {follow} second ON second.follower_id = followed.followee_id
+    WHERE followed.follower_id = ANY(%(profile_ids)s)
+    GROUP BY followed.follower_id, second.followee_id
+),
+popular AS (
+    SELECT profile_id AS candidate_id FROM {activity} ORDER BY images DESC, profile_id
+    LIMIT %(size)s
+),
+candidates AS (
+    SELECT profile_id, candidate_id FROM follows_of_follows
+    UNION
+    SELECT own.profile_id, other.profile_id
+    FROM batch
+    JOIN {activity} own ON own.profile_id = batch.profile_id
+    JOIN {activity} other ON ST_DWithin(own.center, other.center, %(radius)s)
+    UNION
+    SELECT batch.profile_id, popular.candidate_id FROM batch CROSS JOIN popular
+),
+scored AS (
+    SELECT candidates.profile_id, candidates.candidate_id,
+           %(mutual_weight)s * coalesce(fof.mutual, 0)
+           + %(activity_weight)s * ln(1 + coalesce(other.images, 0))
+           + %(proximity_weight)s * coalesce(
+               greatest(0, 1 - ST_Distance(own.center, other.center) / %(radius)s), 0
+           ) AS score
+    FROM candidates
+    LEFT JOIN follows_of_follows fof
+      ON fof.profile_id = candidates.profile_id AND fof.candidate_id = candidates.candidate_id
+    LEFT JOIN {activity} own ON own.profile_id = candidates.profile_id
+    LEFT JOIN {activity} other ON other.profile_id = candidates.candidate_id
+    WHERE candidates.candidate_id <> candidates.profile_id
+      AND NOT EXISTS (
+          SELECT 1 FROM {follow} following
+          WHERE following.follower_id = candidates.profile_id
+            AND following.followee_id = candidates.candidate_id
+      )
+),
+ranked AS (
+    SELECT profile_id, candidate_id, score,
+           row_number() OVER (PARTITION BY profile_id ORDER BY score DESC, candidate_id) AS position
+    FROM scored
+)
+INSERT INTO {recommendation} (profile_id, candidate_id, score)
+SELECT profile_id, candidate_id, score FROM ranked WHERE position <= %(size)s
+"""
+
+
+def _tables():
+    quote = connection.ops.quote_name
+    return {
+        "activity": "recommendation_activity",
+        "follow": quote(Follow._meta.db_table),
+        "image": quote(Image._meta.db_table),
+        "recommendation": quote(Recommendation._meta.db_table),
+    }
+
+
+def build():
+    """
+    Rebuild the recommendations of every profile, returns the number of
+    profiles, or None when another build holds the lock
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [BUILD_LOCK])
+        if not cursor.fetchone()[0]:
+            return None
+    try:
+        return _build()
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS recommendation_activity")
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [BUILD_LOCK])
+
+
+def _build():
+    params = {
+        "since": timezone.now() - timedelta(days=settings.RECOMMENDATIONS_DAYS),
+        "ready": Image.READY,
+        "radius": settings.RECOMMENDATIONS_RADIUS,
+        "size": settings.RECOMMENDATIONS_SIZE,
+        "mutual_weight": settings.RECOMMENDATIONS_MUTUAL_WEIGHT,
+        "activity_weight": settings.RECOMMENDATIONS_ACTIVITY_WEIGHT,
+        "proximity_weight": settings.RECOMMENDATIONS_PROXIMITY_WEIGHT,
+    }
+    tables = _tables()
+
+    with connection.cursor() as cursor:
+        # left behind on this connection if a previous build died half way
+        cursor.execute("DROP TABLE IF EXISTS recommendation_activity")
+        cursor.execute(ACTIVITY_SQL.format(**tables), params)
+        for sql in ACTIVITY_INDEXES_SQL:
+            cursor.execute(sql.format(**tables))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        Recommendation.objects.filter(profile__isnull=True).delete()
+        cursor.execute(DEFAULT_SQL.format(**tables), params)
+
+    count = 0
+    last_id = 0
+    while True:
+        profile_ids = list(
+            Profile.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[: settings.RECOMMENDATIONS_BATCH]
+        )
+        if not profile_ids:
+            return count
+        with transaction.atomic(), connection.cursor() as cursor:
+            Recommendation.objects.filter(profile_id__in=profile_ids).delete()
+            cursor.execute(PROFILES_SQL.format(**tables), dict(params, profile_ids=profile_ids))
+        count += len(profile_ids)
+        last_id = profile_ids[-1]
+
+
+def for_profile(profile):
+    """ The profile's recommendations, or the default ones, without the profiles it follows """
+    recommendations = Recommendation.objects.filter(profile=profile)
+    if profile is None or not recommendations.exists():
+        recommendations = Recommendation.objects.filter(profile__isnull=True)
+    if profile is None:
+        return recommendations
+    followed = Follow.objects.filter(follower=profile).values("followee_id")
+    return recommendations.exclude(candidate_id__in=followed).exclude(candidate=profile)
@@ -0,0 +1,79 @@
+"""
+Username and display name prefix search.
+
+Matches are found with case-insensitive prefix lookups on auth_user, served
+by the UPPER(...) text_pattern_ops indexes of migration 0019. At most
+USER_SEARCH_CANDIDATES matches, most followed first, are then ranked for the
+viewer: exact username first, then the number of people the viewer follows
+who follow the profile, then followers_count. Candidates of prefixes up to
+USER_SEARCH_SHORT_PREFIX characters, which match a large part of the users,
+are cached for USER_SEARCH_CACHE_TIMEOUT seconds so they cost the same as
+longer ones.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from core.accounts.models import Follow, Profile
+
+
+def _matching(prefix):
+    """ username, first name or last name, "first last" when the prefix has a space """
+    condition = (
+        Q(owner__username__istartswith=prefix)
+        | Q(owner__first_name__istartswith=prefix)
+        | Q(owner__last_name__istartswith=prefix)
+    )
+    first, _, last = prefix.partition(" ")
+    if first and last:
+        condition |= Q(owner__first_name__iexact=first, owner__last_name__istartswith=last)
+    return Profile.objects.filter(condition)
+
+
+def candidate_ids(prefix):
+    candidates = _matching(prefix).order_by("-followers_count", "id").values_list("id", flat=True)
+    candidates = candidates[: settings.USER_SEARCH_CANDIDATES]
+    if len(prefix) > settings.USER_SEARCH_SHORT_PREFIX:
+        return list(candidates)
+
+    key = "user-search:" + prefix.upper().encode("utf-8").hex()
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(candidates)
+        cache.set(key, ids, settings.USER_SEARCH_CACHE_TIMEOUT)
+    return ids
+
+
+def search(prefix, viewer=None):
+    """ Up to USER_SEARCH_LIMIT profiles matching prefix, best first for the viewer profile """
+    prefix = " ".join(prefix.split())
+    if not prefix:
+        return Profile.objects.none()
+
+    profiles = Profile.objects.filter(id__in=candidate_ids(prefix)).select_related("owner")
+    exact = Case(
+        When(owner__username__iexact=prefix, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    profiles = profiles.annotate(exact_match=exact)
+
+    if viewer is None:
+        profiles = profiles.annotate(mutual_follows=Value(0, output_field=IntegerField()))
+    else:
+        followed_by_viewer = Follow.objects.filter(follower=viewer).values("followee_id")
+        mutual = (
+            Follow.objects.filter(followee=OuterRef("pk"), follower_id__in=followed_by_viewer)
+            .order_by()
+            .values("followee")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        profiles = profiles.annotate(
+            mutual_follows=Coalesce(Subquery(mutual, output_field=IntegerField()), 0)
+        )
+
+    return profiles.order_by("-exact_match", "-mutual_follows", "-followers_count", "id")[
+        : settings.USER_SEARCH_LIMIT
+    ]
@@ -0,0 +1,26 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.accounts.models import Follow, Profile
+
+
+def _add_to_follow_counters(follow, amount):
+    Profile.objects.filter(pk=follow.follower_id).update(
+        following_count=F("following_count") + amount
+    )
+    Profile.objects.filter(pk=follow.followee_id).update(
+        followers_count=F("followers_count") + amount
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    """ Follows written through the ORM, core.accounts.follows keeps its own counters """
+    if created:
+        _add_to_follow_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    _add_to_follow_counters(instance, -1)
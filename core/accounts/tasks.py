@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.accounts import recommendations, verification
+from core.accounts.models import Profile
+from core.tasks.models import Task
+from core.tasks.queue import task
+
+
+@task("accounts.start_phone_verification", max_attempts=6, retry_delay=30)
+def start_phone_verification(profile_id):
+    """
+    Send the verification code of a new signup. Runs after the signup has
+    committed, provider outages (or an open circuit breaker) are retried with
+    backoff by the task queue.
+    """
+    profile = Profile.objects.filter(id=profile_id, verified=False).first()
+    if profile is None:
+        return
+    metadata = verification.provider().start(profile.phone, profile.country_code)
+    Profile.objects.filter(id=profile_id).update(verification_metadata=metadata)
+
+
+@task("accounts.build_recommendations", max_attempts=1)
+def build_recommendations():
+    """ Rebuild the recommendations, then schedule the next build RECOMMENDATIONS_INTERVAL later """
+    try:
+        recommendations.build()
+    finally:
+        pending = Task.objects.filter(name=build_recommendations.task_name, status=Task.PENDING)
+        if not pending.exists():
+            build_recommendations.delay(
+                run_after=timezone.now() + timedelta(seconds=settings.RECOMMENDATIONS_INTERVAL)
+            )
+
+
+def schedule_recommendations(delay=0, wake=True):
+    """ Start the periodic build unless a build is already waiting or running """
+    scheduled = Task.objects.filter(
+        name=build_recommendations.task_name, status__in=(Task.PENDING, Task.RUNNING)
+    )
+    if scheduled.exists():
+        return None
+    return build_recommendations.delay(
+        run_after=timezone.now() + timedelta(seconds=delay), wake=wake
+    )
@@ -1,3 +1,428 @@
-from django.test import TestCase
+import math
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.accounts import follows, recommendations, search
+from core.accounts.models import Follow, Profile, Recommendation
+from core.accounts.verification import CircuitBreaker, ProviderUnavailable
+from core.images.geo import make_point
+from core.images.models import Image
+
+
+def create_profile(username, **fields):
+    profile = Profile.create_profile(user=User.objects.create_user(username))
+    if fields:
+        Profile.objects.filter(id=profile.id).update(**fields)
+    return profile
+
+
+class FollowTests(TestCase):
+    def setUp(self):
+        self.profile = create_profile("follower")
+        self.first = create_profile("first")
+        self.second = create_profile("second")
+
+    def assertCounts(self, profile, followers, following):
+        profile.refresh_from_db()
+        self.assertEqual(profile.followers_count, followers)
+        self.assertEqual(profile.following_count, following)
+
+    def test_follow(self):
+        followed = follows.follow(self.profile, [self.first.id, self.second.id])
+
+        self.assertEqual(sorted(followed), sorted([self.first.id, self.second.id]))
+        self.assertCounts(self.profile, 0, 2)
+        self.assertCounts(self.first, 1, 0)
+        self.assertCounts(self.second, 1, 0)
+
+    def test_follow_again_counts_once(self):
+        follows.follow(self.profile, [self.first.id])
+        followed = follows.follow(self.profile, [self.first.id, self.second.id])
+
+        self.assertEqual(followed, [self.second.id])
+        self.assertEqual(Follow.objects.filter(follower=self.profile).count(), 2)
+        self.assertCounts(self.profile, 0, 2)
+        self.assertCounts(self.first, 1, 0)
+
+    def test_follow_skips_self_and_missing_profiles(self):
+        missing = self.second.id + 1000
+
+        self.assertEqual(follows.follow(self.profile, [self.profile.id, missing]), [])
+        self.assertCounts(self.profile, 0, 0)
+
+    def test_unfollow(self):
+        follows.follow(self.profile, [self.first.id, self.second.id])
+
+        self.assertEqual(follows.unfollow(self.profile, [self.first.id]), [self.first.id])
+        self.assertCounts(self.profile, 0, 1)
+        self.assertCounts(self.first, 0, 0)
+
+    def test_unfollow_not_followed(self):
+        self.assertEqual(follows.unfollow(self.profile, [self.first.id]), [])
+        self.assertCounts(self.profile, 0, 0)
+        self.assertCounts(self.first, 0, 0)
+
+
+class FollowCounterTests(TestCase):
+    """ Follows written through the ORM keep the counters by core.accounts.signals """
+
+    def setUp(self):
+        self.profiles = [create_profile(f"profile{number}") for number in range(3)]
+
+    def assertCountersMatch(self):
+        for profile in self.profiles:
+            profile.refresh_from_db()
+            followers = Follow.objects.filter(followee=profile).count()
+            following = Follow.objects.filter(follower=profile).count()
+            self.assertEqual(profile.followers_count, followers)
+            self.assertEqual(profile.following_count, following)
+
+    def test_follow_and_unfollow(self):
+        first, second, third = self.profiles
+        Follow.objects.create(follower=first, followee=second)
+        Follow.objects.create(follower=first, followee=third)
+        Follow.objects.create(follower=third, followee=second)
+        self.assertCountersMatch()
+
+        Follow.objects.get(follower=first, followee=second).delete()
+        self.assertCountersMatch()
+        self.assertEqual(self.profiles[0].following_count, 1)
+
+    def test_follows_of_a_deleted_profile(self):
+        first, second, third = self.profiles
+        Follow.objects.create(follower=first, followee=second)
+        Follow.objects.create(follower=second, followee=third)
+        Follow.objects.create(follower=third, followee=first)
+
+        first.delete()
+        first.owner.delete()
+        self.profiles.remove(first)
+        self.assertCountersMatch()
+
+
+class FollowTableMigrationTests(TransactionTestCase):
+    """ 0016 copies both legacy edge tables into Follow """
+
+    migrate_from = [("accounts", "0015_follow")]
+    migrate_to = [("accounts", "0016_merge_follow_tables")]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        User = apps.get_model("auth", "User")
+        Profile = apps.get_model("accounts", "Profile")
+        self.first, self.second, self.third = [
+            Profile.objects.create(owner=User.objects.create(username=f"legacy{number}")).id
+            for number in range(3)
+        ]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_edges_are_merged(self):
+        with connection.cursor() as cursor:
+            # first follows second, stored in both tables
+            cursor.execute(
+                "INSERT INTO accounts_profile_following (from_profile_id, to_profile_id) "
+                "VALUES (%s, %s), (%s, %s)",
+                [self.first, self.second, self.first, self.first],
+            )
+            # first follows third, only stored as third's follower
+            cursor.execute(
+                "INSERT INTO accounts_profile_followers (from_profile_id, to_profile_id) "
+                "VALUES (%s, %s), (%s, %s)",
+                [self.second, self.first, self.third, self.first],
+            )
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT follower_id, followee_id FROM accounts_follow ORDER BY followee_id"
+            )
+            self.assertEqual(
+                cursor.fetchall(), [(self.first, self.second), (self.first, self.third)]
+            )
+            cursor.execute(
+                "SELECT id, followers_count, following_count FROM accounts_profile ORDER BY id"
+            )
+            self.assertEqual(
+                cursor.fetchall(), [(self.first, 0, 2), (self.second, 1, 0), (self.third, 1, 0)]
+            )
+
+
+class NormalizePhoneMigrationTests(TransactionTestCase):
+    """ 0023 brings the phones and country codes of older signups to the current format """
+
+    migrate_from = [("accounts", "0022_recommendation_unique")]
+    migrate_to = [("accounts", "0023_normalize_profile_phone")]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        User = apps.get_model("auth", "User")
+        Profile = apps.get_model("accounts", "Profile")
+        signups = [("legacy", "1", "(415) 555-2671"), ("current", "+44", "7400123456")]
+        self.legacy, self.current = [
+            Profile.objects.create(
+                owner=User.objects.create(username=username), country_code=code, phone=phone
+            ).id
+            for username, code, phone in signups
+        ]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_phones_are_normalized(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+
+        self.assertEqual(
+            list(Profile.objects.order_by("id").values_list("id", "country_code", "phone")),
+            [(self.legacy, "+1", "4155552671"), (self.current, "+44", "7400123456")],
+        )
+        self.assertEqual(
+            list(follows.from_contacts(["+1 415-555-2671"]).values_list("id", flat=True)),
+            [self.legacy],
+        )
+
+
+class FromContactsTests(TestCase):
+    def test_matches_the_national_number(self):
+        profile = create_profile("contact", country_code="+1", phone="4155552671")
+        create_profile("elsewhere", country_code="+44", phone="4155552671")
+
+        found = follows.from_contacts(["+1 415-555-2671", "not a number"])
+
+        self.assertEqual(list(found), [profile])
+
+
+class ScriptedProvider:
+    """ Fails while `available` is False, counts the calls that reached it """
+
+    def __init__(self):
+        self.available = False
+        self.calls = 0
+
+    def check(self, phone, country_code, code):
+        self.calls += 1
+        if not self.available:
+            raise ProviderUnavailable("timed out")
+        return True, None
+
+
+@mock.patch("core.accounts.verification.time.monotonic")
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.provider = ScriptedProvider()
+        self.breaker = CircuitBreaker(self.provider, failures=2, reset_timeout=30)
+
+    def check(self):
+        return self.breaker.check("4155552671", "+1", "000000")
+
+    def open_breaker(self, monotonic):
+        monotonic.return_value = 100
+        for _ in range(2):
+            with self.assertRaises(ProviderUnavailable):
+                self.check()
+
+    def test_opens_after_consecutive_failures(self, monotonic):
+        self.open_breaker(monotonic)
+
+        with self.assertRaises(ProviderUnavailable):
+            self.check()
+        # failed right away, the provider wasn't called
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_success_resets_the_failure_count(self, monotonic):
+        monotonic.return_value = 100
+        with self.assertRaises(ProviderUnavailable):
+            self.check()
+        self.provider.available = True
+        self.check()
+        self.provider.available = False
+
+        with self.assertRaises(ProviderUnavailable):
+            self.check()
+        with self.assertRaises(ProviderUnavailable):
+            self.check()
+        self.assertEqual(self.provider.calls, 4)
+
+    def test_half_open_after_the_reset_timeout(self, monotonic):
+        self.open_breaker(monotonic)
+        monotonic.return_value = 131
+        self.provider.available = True
+
+        self.assertEqual(self.check(), (True, None))
+        self.assertEqual(self.provider.calls, 3)
+        # closed again
+        self.provider.available = False
+        with self.assertRaises(ProviderUnavailable):
+            self.check()
+        self.assertEqual(self.provider.calls, 4)
+
+    def test_failed_trial_call_opens_it_again(self, monotonic):
+        self.open_breaker(monotonic)
+        monotonic.return_value = 131
+
+        with self.assertRaises(ProviderUnavailable):
+            self.check()
+        with self.assertRaises(ProviderUnavailable):
+            self.check()
+        self.assertEqual(self.provider.calls, 3)
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = create_profile("viewer")
+
+    def create(self, username, first_name="", last_name="", followers_count=0):
+        user = User.objects.create_user(username, first_name=first_name, last_name=last_name)
+        profile = Profile.create_profile(user=user)
+        Profile.objects.filter(id=profile.id).update(followers_count=followers_count)
+        return profile
+
+    def usernames(self, prefix):
+        return [profile.username for profile in search.search(prefix, self.viewer)]
+
+    def test_matches_username_and_name_prefixes(self):
+        self.create("bobby")
+        self.create("alice", first_name="Bob")
+        self.create("carol", last_name="Bobson")
+        self.create("dave", first_name="Ann", last_name="Leeds")
+        self.create("erin")
+
+        self.assertEqual(sorted(self.usernames("BOB")), ["alice", "bobby", "carol"])
+        self.assertEqual(self.usernames("ann  lee"), ["dave"])
+        self.assertEqual(self.usernames("  "), [])
+
+    def test_ranking(self):
+        self.create("samantha", followers_count=10)
+        samuel = self.create("samuel", followers_count=1)
+        self.create("sam")
+        friend = self.create("friend")
+        Follow.objects.create(follower=self.viewer, followee=friend)
+        Follow.objects.create(follower=friend, followee=samuel)
+
+        # exact username, then followed by people the viewer follows, then most followed
+        self.assertEqual(self.usernames("sam"), ["sam", "samuel", "samantha"])
+        self.assertEqual(
+            [profile.username for profile in search.search("sam")], ["sam", "samantha", "samuel"]
+        )
+
+    @override_settings(USER_SEARCH_LIMIT=2, USER_SEARCH_CANDIDATES=3)
+    def test_limit_and_candidates_cap(self):
+        for number in range(5):
+            self.create(f"user{number}", followers_count=number)
+
+        self.assertEqual(self.usernames("user"), ["user4", "user3"])
+        self.assertEqual(self.usernames("user0"), ["user0"])
+        # only the most followed matches are ranked
+        self.assertEqual(len(search.candidate_ids("us")), 3)
+        self.assertNotIn("user0", self.usernames("us"))
+
+    def test_short_prefixes_are_cached(self):
+        self.create("zed")
+        self.assertEqual(self.usernames("z"), ["zed"])
+
+        self.create("zoe", followers_count=1)
+
+        self.assertEqual(self.usernames("z"), ["zed"])
+        self.assertEqual(self.usernames("zo"), ["zoe"])
+        self.assertEqual(self.usernames("zoe"), ["zoe"])
+
+
+@override_settings(
+    RECOMMENDATIONS_SIZE=10,
+    RECOMMENDATIONS_DAYS=30,
+    RECOMMENDATIONS_RADIUS=25000,
+    RECOMMENDATIONS_MUTUAL_WEIGHT=1,
+    RECOMMENDATIONS_ACTIVITY_WEIGHT=0.5,
+    RECOMMENDATIONS_PROXIMITY_WEIGHT=2,
+)
+class RecommendationTests(TestCase):
+    PARIS = (48.8566, 2.3522)
+    REIMS = (49.2583, 4.0317)
+
+    def setUp(self):
+        self.viewer = create_profile("viewer")
+        self.friend = create_profile("friend")
+        self.mutual = create_profile("mutual")
+        self.neighbour = create_profile("neighbour")
+        self.far = create_profile("far")
+        Follow.objects.create(follower=self.viewer, followee=self.friend)
+        Follow.objects.create(follower=self.friend, followee=self.mutual)
+        self.post(self.viewer, self.PARIS)
+        self.post(self.neighbour, self.PARIS)
+        self.post(self.far, self.REIMS)
+
+    def post(self, profile, point, **fields):
+        return Image.objects.create(
+            creator=profile, restaurant="Chez Test", dish="Soup", point=make_point(*point), **fields
+        )
+
+    def ranked(self, profile):
+        return [
+            (recommendation.candidate_id, recommendation.score)
+            for recommendation in recommendations.for_profile(profile).order_by("-score")
+        ]
+
+    def test_build_ranks_mutual_follows_activity_and_proximity(self):
+        self.post(self.mutual, self.REIMS, processing_status=Image.PENDING)
+
+        self.assertEqual(recommendations.build(), Profile.objects.count())
+
+        activity = 0.5 * math.log(2)
+        ranked = self.ranked(self.viewer)
+        self.assertEqual(
+            [candidate for candidate, _ in ranked],
+            [self.neighbour.id, self.mutual.id, self.far.id],
+        )
+        for (_, score), expected in zip(ranked, [2 + activity, 1, activity]):
+            self.assertAlmostEqual(score, expected, places=3)
+
+    def test_default_recommendations(self):
+        recommendations.build()
+        stranger = create_profile("stranger")
+
+        self.assertEqual(
+            list(
+                recommendations.for_profile(stranger)
+                .order_by("-score", "candidate_id")
+                .values_list("candidate_id", flat=True)
+            ),
+            sorted([self.viewer.id, self.neighbour.id, self.far.id]),
+        )
+        self.assertEqual(recommendations.for_profile(None).count(), 3)
+
+    def test_viewer_filter(self):
+        recommendations.build()
+        Follow.objects.create(follower=self.viewer, followee=self.neighbour)
+        # a stale row, e.g. written before the profile followed the candidate
+        Recommendation.objects.create(profile=self.viewer, candidate=self.viewer, score=100)
+
+        candidates = [candidate for candidate, _ in self.ranked(self.viewer)]
+        self.assertEqual(candidates, [self.mutual.id, self.far.id])
+
+    def test_build_is_skipped_while_another_holds_the_lock(self):
+        other = connection.copy()
+        try:
+            with other.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(%s)", [recommendations.BUILD_LOCK])
+            self.assertIsNone(recommendations.build())
+            self.assertFalse(Recommendation.objects.exists())
+        finally:
+            other.close()
+
+        self.assertEqual(recommendations.build(), Profile.objects.count())
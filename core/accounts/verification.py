@@ -0,0 +1,140 @@
+"""
+Phone number verification providers.
+
+PHONE_VERIFICATION_PROVIDER names the class used, AuthyProvider talks to the
+Authy phone verification API with a PHONE_VERIFICATION_TIMEOUT, FakeProvider
+sends nothing and accepts PHONE_VERIFICATION_FAKE_CODE, so signups can be
+load-tested offline. A provider implements:
+
+    start(phone, country_code) -> metadata (text stored in Profile.verification_metadata)
+    check(phone, country_code, code) -> (verified, errors)
+
+Both raise ProviderUnavailable when the provider can't be reached. The
+provider is wrapped in a per-process circuit breaker: after
+PHONE_VERIFICATION_BREAKER_FAILURES consecutive failures calls fail right away
+for PHONE_VERIFICATION_BREAKER_RESET seconds instead of tying up a thread on
+each timeout. Sending codes runs in the background, see core.accounts.tasks.
+"""
+import json
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class ProviderUnavailable(Exception):
+    pass
+
+
+class AuthyProvider:
+    API_URL = "https://api.authy.com/protected/json/phones/verification"
+
+    def __init__(self, api_key=None, timeout=None):
+        self.api_key = api_key or settings.ACCOUNT_SECURITY_API_KEY
+        self.timeout = timeout or settings.PHONE_VERIFICATION_TIMEOUT
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = requests.request(
+                method,
+                f"{self.API_URL}/{path}",
+                headers={"X-Authy-API-Key": self.api_key},
+                timeout=self.timeout,
+                **kwargs,
+            )
+        except requests.RequestException as e:
+            raise ProviderUnavailable(str(e)) from e
+        if response.status_code >= 500:
+            raise ProviderUnavailable(f"Authy returned {response.status_code}")
+        return response
+
+    def start(self, phone, country_code):
+        response = self._request(
+            "post",
+            "start",
+            data={"via": "sms", "phone_number": phone, "country_code": country_code},
+        )
+        return response.text
+
+    def check(self, phone, country_code, code):
+        response = self._request(
+            "get",
+            "check",
+            params={
+                "phone_number": phone,
+                "country_code": country_code,
+                "verification_code": code,
+            },
+        )
+        if response.ok:
+            return True, None
+        try:
+            errors = response.json()
+        except ValueError:
+            errors = {"message": response.text}
+        return False, errors
+
+
+class FakeProvider:
+    """ Sends nothing, PHONE_VERIFICATION_FAKE_CODE verifies any number """
+
+    def start(self, phone, country_code):
+        time.sleep(settings.PHONE_VERIFICATION_FAKE_LATENCY)
+        return json.dumps({"success": True, "message": f"Fake code sent to {country_code}{phone}"})
+
+    def check(self, phone, country_code, code):
+        time.sleep(settings.PHONE_VERIFICATION_FAKE_LATENCY)
+        if code == settings.PHONE_VERIFICATION_FAKE_CODE:
+            return True, None
+        return False, {"message": "Verification code is incorrect", "success": False}
+
+
+class CircuitBreaker:
+    def __init__(self, provider, failures, reset_timeout):
+        self.provider = provider
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failed = 0
+        self._open_until = 0
+
+    def _call(self, method, *args):
+        with self._lock:
+            if self._failed >= self.failures and time.monotonic() < self._open_until:
+                raise ProviderUnavailable("Phone verification is temporarily unavailable")
+        try:
+            result = getattr(self.provider, method)(*args)
+        except ProviderUnavailable:
+            with self._lock:
+                self._failed += 1
+                if self._failed >= self.failures:
+                    self._open_until = time.monotonic() + self.reset_timeout
+            raise
+        with self._lock:
+            self._failed = 0
+        return result
+
+    def start(self, phone, country_code):
+        return self._call("start", phone, country_code)
+
+    def check(self, phone, country_code, code):
+        return self._call("check", phone, country_code, code)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def provider():
+    """ The configured provider behind this process's circuit breaker """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = CircuitBreaker(
+                import_string(settings.PHONE_VERIFICATION_PROVIDER)(),
+                settings.PHONE_VERIFICATION_BREAKER_FAILURES,
+                settings.PHONE_VERIFICATION_BREAKER_RESET,
+            )
+        return _provider
@@ -0,0 +1 @@
+default_app_config = 'core.api.apps.ApiConfig'
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'core.api'
+
+    def ready(self):
+        from core.api import checks, signals  # noqa: F401
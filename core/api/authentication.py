@@ -0,0 +1,158 @@
+"""
+Authentication classes that keep the database and the password hasher off the
+hot path.
+
+- JWTAuthentication trusts a verified, unexpired token: request.user answers
+  id, pk, username and is_authenticated from its claims and only loads the
+  user (with its profile, in one query) when a view needs anything else. A
+  deactivated user keeps access until the token expires (JWT_EXPIRATION_DELTA).
+- CachedTokenAuthentication keeps token -> user rows in a per-process LRU for
+  AUTH_TOKEN_CACHE_TTL seconds. Every request gets its own User instance
+  built from the cached values. Deleting a token (Logout) drops it from the
+  cache of the process that deleted it, other processes stop accepting it
+  within the TTL.
+- BasicAuthentication, which hashes the password on every request, is only
+  used by the login view.
+
+Every class records how long it took per scheme, see auth_timings().
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework import authentication, exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework_jwt.authentication import JSONWebTokenAuthentication
+
+_timings_lock = threading.Lock()
+_timings = {}
+
+
+def _record(scheme, seconds):
+    with _timings_lock:
+        timing = _timings.setdefault(scheme, {"count": 0, "total": 0.0, "max": 0.0})
+        timing["count"] += 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+
+
+def auth_timings():
+    """ {scheme: {count, total, max, mean}} in seconds, for this process since it started """
+    with _timings_lock:
+        return {
+            scheme: dict(timing, mean=timing["total"] / timing["count"])
+            for scheme, timing in _timings.items()
+        }
+
+
+class TimedAuthenticationMixin:
+    scheme = None
+
+    def authenticate(self, request):
+        started = time.perf_counter()
+        try:
+            return super().authenticate(request)
+        finally:
+            _record(self.scheme, time.perf_counter() - started)
+
+
+class JWTUser(SimpleLazyObject):
+    """ request.user for a verified JWT, see the module docstring """
+
+    def __init__(self, payload):
+        user_id = payload["user_id"]
+        super().__init__(lambda: User.objects.select_related("profile").get(pk=user_id))
+        self.__dict__["_claims"] = {
+            "id": user_id,
+            "pk": user_id,
+            "username": payload.get("username"),
+            "is_active": True,
+            "is_authenticated": True,
+            "is_anonymous": False,
+        }
+
+    def __getattr__(self, name):
+        claims = self.__dict__.get("_claims", {})
+        if self._wrapped is empty and name in claims:
+            return claims[name]
+        return super().__getattr__(name)
+
+    def __bool__(self):
+        # `request.user and request.user.is_authenticated` must not load the user
+        return True
+
+
+class JWTAuthentication(TimedAuthenticationMixin, JSONWebTokenAuthentication):
+    scheme = "jwt"
+
+    def authenticate_credentials(self, payload):
+        if not payload.get("user_id"):
+            raise exceptions.AuthenticationFailed("Invalid payload.")
+        return JWTUser(payload)
+
+
+class _TokenCache:
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+token_cache = _TokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TimedAuthenticationMixin, authentication.TokenAuthentication):
+    scheme = "token"
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            field_names = [field.attname for field in User._meta.concrete_fields]
+            cached = (field_names, [getattr(user, name) for name in field_names])
+            token_cache.set(key, cached)
+            return user, token
+        field_names, values = cached
+        user = User.from_db("default", field_names, values)
+        return user, Token(key=key, user=user)
+
+
+class TimedSessionAuthentication(TimedAuthenticationMixin, authentication.SessionAuthentication):
+    scheme = "session"
+
+
+class TimedBasicAuthentication(TimedAuthenticationMixin, authentication.BasicAuthentication):
+    scheme = "basic"
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
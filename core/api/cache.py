@@ -0,0 +1,160 @@
+"""
+Response cache for the read-heavy image and profile endpoints.
+
+The serialized form of an object is the same for every viewer except a few
+fields (is_liked, is_self, following). The rest is cached in the
+RESPONSE_CACHE cache, keyed by the object's kind, id and version, and the
+viewer fields are merged back in per request. Saving or deleting an Image,
+Comment, Like, Follow or Profile drops the object's version once the
+transaction commits (see core.api.signals), which orphans its entries. Data
+embedded from other objects, such as an image's creator, may lag behind
+for up to RESPONSE_CACHE_TIMEOUT seconds.
+
+Responses carry a weak ETag built from the versions, the viewer and the URL,
+so a matching If-None-Match is answered with a 304 before anything is
+loaded or serialized.
+
+Versions must be shared by every process serving the API, an invalidation
+only reaching the worker that handled the write would let the others
+answer 304 with stale data. With a per-process backend (LocMemCache, the
+default without CACHE_URL) the cache and the ETags are disabled and
+responses are serialized on every request.
+
+A cacheable serializer declares:
+
+    cache_kind = "image"
+    cache_extras(instance) -> whatever merge_viewer needs besides the data
+    merge_viewer(viewer, payloads) -> sets the viewer fields of each (data, extras)
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.api.viewer import ViewerContext
+
+# serializers cached per profile id
+PROFILE_KINDS = ("profile", "profile-list")
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE]
+
+
+def is_enabled():
+    return not isinstance(_cache(), LocMemCache)
+
+
+def _version_key(kind, object_id):
+    return f"response:v:{kind}:{object_id}"
+
+
+def invalidate(kind, ids):
+    """ Drop the cached payloads of ids once the current transaction commits """
+    keys = [_version_key(kind, object_id) for object_id in ids if object_id is not None]
+    if keys and is_enabled():
+        transaction.on_commit(lambda: _cache().delete_many(keys))
+
+
+def invalidate_images(ids):
+    invalidate("image", ids)
+
+
+def invalidate_profiles(ids):
+    for kind in PROFILE_KINDS:
+        invalidate(kind, ids)
+
+
+def versions(kind, ids):
+    cache = _cache()
+    keys = {object_id: _version_key(kind, object_id) for object_id in ids}
+    found = cache.get_many(keys.values())
+    missing = {key: uuid.uuid4().hex for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing)
+        found.update(missing)
+    return {object_id: found[key] for object_id, key in keys.items()}
+
+
+def _etag(request, kind, ids, object_versions):
+    parts = [kind, request.get_full_path(), str(request.user.id)]
+    parts += [f"{object_id}:{object_versions[object_id]}" for object_id in ids]
+    return 'W/"{}"'.format(hashlib.md5("|".join(parts).encode("utf-8")).hexdigest())
+
+
+def _not_modified(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH", "")
+    return etag in (tag.strip() for tag in header.split(","))
+
+
+def payloads(request, serializer_class, ids, queryset, object_versions):
+    """ Serialized objects of ids, in order, skipping the ids missing from queryset """
+    cache = _cache()
+    kind = serializer_class.cache_kind
+    origin = request.build_absolute_uri("/")
+    keys = {
+        object_id: f"response:{kind}:{object_id}:{object_versions[object_id]}:{origin}"
+        for object_id in ids
+    }
+    entries = cache.get_many(keys.values())
+
+    missing = [object_id for object_id in ids if keys[object_id] not in entries]
+    if missing:
+        instances = list(queryset.filter(id__in=missing))
+        serializer = serializer_class(instances, many=True, context={"request": request})
+        fresh = {
+            keys[instance.id]: (data, serializer_class.cache_extras(instance))
+            for instance, data in zip(instances, serializer.data)
+        }
+        cache.set_many(fresh, settings.RESPONSE_CACHE_TIMEOUT)
+        entries.update(fresh)
+
+    found = [entries[keys[object_id]] for object_id in ids if keys[object_id] in entries]
+    serializer_class.merge_viewer(ViewerContext.for_request(request), found)
+    return [data for data, extras in found]
+
+
+def _serialize(request, serializer_class, ids, queryset):
+    """ What payloads() returns, without the cache """
+    instances = queryset.in_bulk(ids)
+    page = [instances[object_id] for object_id in ids if object_id in instances]
+    return serializer_class(page, many=True, context={"request": request}).data
+
+
+def cached_response(request, serializer_class, ids, queryset, many=True, paginator=None):
+    """
+    The response for ids serialized with serializer_class, a 304 when the
+    client's ETag still matches. With many=False ids holds at most one id and
+    a missing object is a 404. With a paginator, ids is its current page.
+    """
+    ids = list(ids)
+    etag = None
+    if is_enabled():
+        object_versions = versions(serializer_class.cache_kind, ids)
+        etag = _etag(request, serializer_class.cache_kind, ids, object_versions)
+
+    if etag is not None and _not_modified(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        if etag is not None:
+            data = payloads(request, serializer_class, ids, queryset, object_versions)
+        else:
+            data = _serialize(request, serializer_class, ids, queryset)
+        if paginator is not None:
+            response = paginator.get_paginated_response(data)
+        elif many:
+            response = Response(data=data, status=status.HTTP_200_OK)
+        elif data:
+            response = Response(data=data[0], status=status.HTTP_200_OK)
+        else:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+    if etag is not None:
+        response["ETag"] = etag
+    patch_vary_headers(response, ("Authorization", "Cookie"))
+    return response
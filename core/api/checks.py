@@ -0,0 +1,17 @@
+from django.core.checks import Warning, register
+
+from core.api import cache
+
+
+@register("caches", deploy=True)
+def response_cache_check(app_configs, **kwargs):
+    if cache.is_enabled():
+        return []
+    return [
+        Warning(
+            "The RESPONSE_CACHE cache is local to each process, the response cache and "
+            "ETags are disabled.",
+            hint="Point CACHE_URL at a shared cache such as memcached or redis.",
+            id="api.W001",
+        )
+    ]
@@ -0,0 +1,118 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+from urllib.parse import quote
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_jwt.settings import api_settings
+
+from core.accounts.models import Profile
+from core.images.models import HashtagStat, Image
+
+# (weight, path) of the read-mostly traffic of the app
+PROFILE = (
+    (4, "/api/v1/feed/"),
+    (2, "/api/v1/images/?ordering=trending"),
+    (2, "/api/v1/images/{image_id}/"),
+    (1, "/api/v1/search/?hashtags={tag}"),
+    (1, "/api/v1/users/profile/{username}/"),
+    (1, "/api/v1/users/explore/"),
+    (1, "/api/v1/notifications/status/"),
+)
+
+
+def _run_client(options):
+    """ One client process: `threads` sessions sending requests back to back until the deadline """
+    url, token, samples, threads, deadline = options
+    weights = [weight for weight, path in PROFILE]
+    paths = [path for weight, path in PROFILE]
+
+    def session_loop(seed):
+        chooser = random.Random(seed)
+        session = requests.Session()
+        session.headers["Authorization"] = f"{api_settings.JWT_AUTH_HEADER_PREFIX} {token}"
+        results = []
+        while time.time() < deadline:
+            path = chooser.choices(paths, weights)[0].format(
+                **{name: quote(str(chooser.choice(values))) for name, values in samples.items()}
+            )
+            started = time.perf_counter()
+            try:
+                ok = session.get(url + path, timeout=30).status_code < 400
+            except requests.RequestException:
+                ok = False
+            results.append((time.perf_counter() - started, ok))
+        return results
+
+    with ThreadPoolExecutor(threads) as executor:
+        sessions = executor.map(session_loop, range(threads))
+        return [result for results in sessions for result in results]
+
+
+def _percentile(latencies, percent):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))] * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the read-mostly traffic of the app to a running server with an increasing number "
+        "of client processes and report the throughput of each stage. Run it against servers "
+        "started with different WEB_CONCURRENCY (see foodtalk/gunicorn_conf.py) to see how "
+        "throughput scales with the cores given to the web process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="user the requests are authenticated as")
+        parser.add_argument("--url", default="http://localhost:8000")
+        parser.add_argument(
+            "--clients", default="1,2,4,8", help="client processes of each stage, comma separated"
+        )
+        parser.add_argument("--threads", type=int, default=8, help="sessions per client process")
+        parser.add_argument("--duration", type=int, default=30, help="seconds per stage")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['username']}")
+        if options["duration"] * 2 > settings.JWT_AUTH["JWT_EXPIRATION_DELTA"].total_seconds():
+            self.stdout.write("Stages longer than half the JWT lifetime may end with 401s")
+        token = api_settings.JWT_ENCODE_HANDLER(api_settings.JWT_PAYLOAD_HANDLER(user))
+
+        images = Image.objects.ready().order_by("-id").values_list("id", flat=True)
+        tags = HashtagStat.objects.order_by("-images_count").values_list("tag__name", flat=True)
+        samples = {
+            "image_id": list(images[:200]),
+            "tag": list(tags[:50]),
+            "username": list(
+                Profile.objects.order_by("-followers_count").values_list(
+                    "owner__username", flat=True
+                )[:200]
+            ),
+        }
+        if not all(samples.values()):
+            raise CommandError("Needs at least one ready image, hashtag and profile")
+
+        self.stdout.write("clients  requests  errors    req/s    p50 ms    p95 ms    p99 ms")
+        for clients in [int(number) for number in options["clients"].split(",")]:
+            deadline = time.time() + options["duration"]
+            client_options = (options["url"], token, samples, options["threads"], deadline)
+            with Pool(clients) as pool:
+                results = [
+                    result
+                    for client_results in pool.map(_run_client, [client_options] * clients)
+                    for result in client_results
+                ]
+            latencies = sorted(latency for latency, ok in results)
+            errors = sum(1 for latency, ok in results if not ok)
+            if not latencies:
+                continue
+            self.stdout.write(
+                f"{clients:7d}  {len(results):8d}  {errors:6d}  "
+                f"{len(results) / options['duration']:7.1f}  {_percentile(latencies, 50):8.1f}  "
+                f"{_percentile(latencies, 95):8.1f}  {_percentile(latencies, 99):8.1f}"
+            )
@@ -1,7 +1,233 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import date, datetime
+from functools import cmp_to_key
 
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
-class StandardResultsSetPagination(PageNumberPagination):
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek pagination over an ordering such as `(-created_at, -id)`.
+
+    Each page is fetched with a `WHERE (created_at, id) < (last seen)` filter
+    instead of an OFFSET, and no `COUNT(*)` is issued, so the cost of a page
+    does not depend on how deep the client has scrolled. The cursor is an
+    opaque token holding the ordering values of the first/last row.
+
+    Views pick the ordering with a `keyset_ordering` attribute or a
+    `get_keyset_ordering()` method. Its last field must be unique.
+    """
     page_size = 12
     page_size_query_param = 'page_size'
     max_page_size = 12
+    cursor_query_param = 'cursor'
+    cursor_query_description = _('The pagination cursor value.')
+    page_size_query_description = _('Number of results to return per page.')
+    invalid_cursor_message = _('Invalid cursor')
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Paginate the rows of several querysets having the ordering fields as a
+        single sequence. Each queryset is seeked and limited on its own and
+        the rows merged, rows at the same position are listed once.
+        """
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(view)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = [_flip(field) for field in self.ordering] if reverse else self.ordering
+        results = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*ordering)
+            if position is not None:
+                queryset = queryset.filter(self._seek(ordering, self._clean(queryset, position)))
+            results += queryset[:self.page_size + 1]
+        if len(querysets) > 1:
+            results = self._merge(ordering, results)
+
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        # an empty page still links back to where it was reached from
+        self.next_position = self._get_position(self.page[-1]) if self.page else position
+        self.previous_position = self._get_position(self.page[0]) if self.page else position
+        return self.page
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, view):
+        if hasattr(view, 'get_keyset_ordering'):
+            return tuple(view.get_keyset_ordering())
+        return tuple(getattr(view, 'keyset_ordering', self.ordering))
+
+    def _clean(self, queryset, position):
+        """
+        The cursor's values converted by the fields (or annotations) they are
+        compared with, a tampered cursor is a 404 rather than a failing query
+        """
+        values = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            try:
+                if name in queryset.query.annotations:
+                    model_field = queryset.query.annotations[name].output_field
+                else:
+                    model_field = queryset.model._meta.get_field(name)
+                # the referenced column for foreign keys, e.g. `image_id`
+                model_field = getattr(model_field, 'target_field', model_field)
+                value = model_field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None or not self._in_range(queryset, model_field, value):
+                raise NotFound(self.invalid_cursor_message)
+            values.append(value)
+        return values
+
+    @staticmethod
+    def _in_range(queryset, model_field, value):
+        """ Whether an integer fits the column, AutoField has no validator for it """
+        operations = connections[queryset.db].ops
+        internal_type = model_field.get_internal_type()
+        if internal_type not in operations.integer_field_ranges:
+            return True
+        low, high = operations.integer_field_range(internal_type)
+        return (low is None or value >= low) and (high is None or value <= high)
+
+    @staticmethod
+    def _seek(ordering, position):
+        """
+        Build `(a, b, c) > (x, y, z)` as `a > x OR (a = x AND b > y) OR ...`,
+        respecting the direction of each field.
+        """
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            branch = Q(**{f'{name}__{lookup}': position[index]})
+            for previous_field, value in zip(ordering[:index], position):
+                branch &= Q(**{previous_field.lstrip('-'): value})
+            condition |= branch
+        return condition
+
+    def _get_position(self, instance):
+        return [_encode_value(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+
+    def _merge(self, ordering, rows):
+        """ The first page_size + 1 distinct rows in ordering """
+        def compare(first, second):
+            for field in ordering:
+                name = field.lstrip('-')
+                a, b = getattr(first, name), getattr(second, name)
+                if a != b:
+                    return (1 if a < b else -1) if field.startswith('-') else (-1 if a < b else 1)
+            return 0
+
+        merged = []
+        for row in sorted(rows, key=cmp_to_key(compare)):
+            if not merged or compare(merged[-1], row) != 0:
+                merged.append(row)
+        return merged[:self.page_size + 1]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse=False):
+        cursor = {'p': position}
+        if reverse:
+            cursor['r'] = 1
+        encoded = b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_schema_fields(self, view):
+        assert coreapi is not None, 'coreapi must be installed to use `get_schema_fields()`'
+        assert coreschema is not None, 'coreschema must be installed to use `get_schema_fields()`'
+        return [
+            coreapi.Field(
+                name=self.cursor_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title='Cursor',
+                    description=str(self.cursor_query_description)
+                )
+            ),
+            coreapi.Field(
+                name=self.page_size_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.Integer(
+                    title='Page size',
+                    description=str(self.page_size_query_description)
+                )
+            ),
+        ]
@@ -1,14 +1,40 @@
+import os
+
 import phonenumbers
-from authy.api import AuthyApiClient
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.contrib.gis.geos import GEOSGeometry
-from django.db import transaction
+from django.db import IntegrityError, models, transaction
+from django.urls import reverse
 from phonenumbers import NumberParseException
 from rest_framework import serializers
 from taggit_serializer.serializers import TagListSerializerField, TaggitSerializer
 from core.accounts.models import Profile
-from core.images.models import Image, Comment, Like, Notification
+from core.accounts.tasks import start_phone_verification
+from core.api.viewer import ViewerContext
+from core.images.geo import make_point
+from core.images.models import (
+    Image,
+    Comment,
+    Like,
+    Notification,
+    HashtagStat,
+    TrendingTag,
+    original_image_path,
+)
+from core.images.tasks import process_image
+
+
+class ViewerListSerializer(serializers.ListSerializer):
+    """
+    Lets the child serializer load the viewer's likes / follows for the
+    whole page at once before the rows are serialized one by one.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.Manager) else data)
+        if "request" in self.context:
+            self.child.prime_viewer(ViewerContext.for_request(self.context["request"]), items)
+        return super().to_representation(items)
 
 
 class SignupSerializer(serializers.ModelSerializer):
@@ -45,7 +71,8 @@ class SignupSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Please input a valid phone number")
         except NumberParseException as e:
             raise serializers.ValidationError(str(e))
-        return phone_number
+        # stored as national digits, as core.accounts.follows.from_contacts looks them up
+        return str(full_number.national_number)
 
     def _create_user_profile(self, user, profile_data):
         profile = Profile.create_profile(user=user)
@@ -55,12 +82,8 @@ class SignupSerializer(serializers.ModelSerializer):
 
     @staticmethod
     def _start_phone_verification(user):
-        authy_api = AuthyApiClient(settings.ACCOUNT_SECURITY_API_KEY)
-        request = authy_api.phones.verification_start(
-            user.profile.phone, user.profile.country_code, via="sms"
-        )
-        user.profile.verification_metadata = request.content
-        user.profile.save()
+        # sent by a background task once the signup has committed
+        start_phone_verification.delay(profile_id=user.profile.id)
 
     @transaction.atomic
     def create(self, validated_data):
@@ -102,7 +125,19 @@ class UserProfileSerializer(serializers.ModelSerializer):
     def get_is_self(self, profile):
         if "request" in self.context:
             request = self.context["request"]
-            return profile.owner.id == request.user.id
+            return profile.owner_id == request.user.id
+
+    # core.api.cache
+    cache_kind = "profile"
+
+    @staticmethod
+    def cache_extras(profile):
+        return profile.owner_id
+
+    @staticmethod
+    def merge_viewer(viewer, payloads):
+        for data, owner_id in payloads:
+            data["is_self"] = owner_id == viewer.user.id
 
 
 class ListUserSerializer(serializers.ModelSerializer):
@@ -119,11 +154,30 @@ class ListUserSerializer(serializers.ModelSerializer):
             "followers_count",
             "following_count",
         )
+        read_only_fields = ("followers_count", "following_count")
+        list_serializer_class = ViewerListSerializer
+
+    @staticmethod
+    def prime_viewer(viewer, profiles):
+        viewer.prime_following(profile.id for profile in profiles)
 
     def get_following(self, obj):
         if "request" in self.context:
-            request = self.context["request"]
-            return obj.id in request.user.profile.following.values_list('id', flat=True)
+            viewer = ViewerContext.for_request(self.context["request"])
+            return viewer.is_following(obj.id)
+
+    # core.api.cache
+    cache_kind = "profile-list"
+
+    @staticmethod
+    def cache_extras(profile):
+        return None
+
+    @staticmethod
+    def merge_viewer(viewer, payloads):
+        viewer.prime_following(data["id"] for data, extras in payloads)
+        for data, extras in payloads:
+            data["following"] = viewer.is_following(data["id"])
 
 
 class SmallImageSerializer(serializers.ModelSerializer):
@@ -154,6 +208,7 @@ class FeedUserSerializer(serializers.ModelSerializer):
             "followers_count",
             "following_count",
         )
+        read_only_fields = ("post_count", "followers_count", "following_count")
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -164,10 +219,10 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ("id", "message", "creator", "is_self")
 
-    def get_is_self(self, image):
+    def get_is_self(self, comment):
         if "request" in self.context:
-            request = self.context["request"]
-            return image.creator.id == request.user.id
+            viewer = ViewerContext.for_request(self.context["request"])
+            return viewer.is_self(comment.creator_id)
 
 
 class LikeSerializer(serializers.ModelSerializer):
@@ -177,10 +232,12 @@ class LikeSerializer(serializers.ModelSerializer):
 
 
 class ImageSerializer(TaggitSerializer, serializers.ModelSerializer):
-    comments = CommentSerializer(many=True)
+    comments = serializers.SerializerMethodField()
+    more_comments = serializers.SerializerMethodField()
     creator = FeedUserSerializer(required=False)
     tags = TagListSerializerField()
     is_liked = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Image
@@ -190,6 +247,7 @@ class ImageSerializer(TaggitSerializer, serializers.ModelSerializer):
             "restaurant",
             "dish",
             "comments",
+            "more_comments",
             "likes_count",
             "comments_count",
             "creator",
@@ -199,48 +257,248 @@ class ImageSerializer(TaggitSerializer, serializers.ModelSerializer):
             "natural_time",
             "is_liked",
             "is_vertical",
+            "processing_status",
+            "srcset",
         )
+        read_only_fields = ("likes_count", "comments_count", "processing_status")
+        list_serializer_class = ViewerListSerializer
+
+    @staticmethod
+    def prime_viewer(viewer, images):
+        viewer.prime_likes(image.id for image in images)
+
+    # core.api.cache
+    cache_kind = "image"
+
+    @staticmethod
+    def cache_extras(image):
+        """ the creators of the inlined comments, for their is_self """
+        return [comment.creator_id for comment in image.get_recent_comments()]
+
+    @staticmethod
+    def merge_viewer(viewer, payloads):
+        viewer.prime_likes(data["id"] for data, comment_creators in payloads)
+        for data, comment_creators in payloads:
+            data["is_liked"] = viewer.is_liked(data["id"])
+            for comment, creator_id in zip(data["comments"], comment_creators):
+                comment["is_self"] = viewer.is_self(creator_id)
+
+    def get_comments(self, obj):
+        return CommentSerializer(obj.get_recent_comments(), many=True, context=self.context).data
+
+    def get_more_comments(self, obj):
+        """ link to the full comment list when only the most recent ones are inlined """
+        if obj.comments_count <= len(obj.get_recent_comments()):
+            return None
+        url = reverse("api:comment_image", kwargs={"image_id": obj.id})
+        if "request" in self.context:
+            return self.context["request"].build_absolute_uri(url)
+        return url
 
     def get_is_liked(self, obj):
         if "request" in self.context:
-            request = self.context["request"]
-            return Like.objects.filter(
-                creator__id=request.user.profile.id, image__id=obj.id
-            ).exists()
+            viewer = ViewerContext.for_request(self.context["request"])
+            return viewer.is_liked(obj.id)
+
+    def get_srcset(self, obj):
+        """ {"thumbnail": {"width": .., "height": .., "webp": url, "jpeg": url}, "feed": ..} """
+        storage = obj.file.storage
+        srcset = {}
+        for name, rendition in obj.renditions.items():
+            srcset[name] = {
+                key: storage.url(value) if key not in ("width", "height") else value
+                for key, value in rendition.items()
+            }
+        return srcset
 
 
 class InputImageSerializer(serializers.ModelSerializer):
+    # the upload is stored untouched and processed by the images.process_image task
+    file = serializers.ImageField(source="original", write_only=True)
     tags = TagListSerializerField()
+    latitude = serializers.FloatField(
+        write_only=True, required=False, min_value=-90, max_value=90
+    )
+    longitude = serializers.FloatField(
+        write_only=True, required=False, min_value=-180, max_value=180
+    )
 
     class Meta:
         model = Image
         fields = ("file", "dish", "latitude", "longitude", "restaurant", "tags")
 
+    def validate(self, attrs):
+        if ("latitude" in attrs) != ("longitude" in attrs):
+            raise serializers.ValidationError("Send both latitude and longitude.")
+        return attrs
+
     @staticmethod
-    def _get_point_object(obj):
-        point = f"POINT({obj.longitude} {obj.latitude})"
-        return GEOSGeometry(point)
+    def _set_point(validated_data):
+        if "latitude" in validated_data:
+            validated_data["point"] = make_point(
+                validated_data.pop("latitude"), validated_data.pop("longitude")
+            )
 
     def create(self, validated_data):
+        self._set_point(validated_data)
+        validated_data["processing_status"] = Image.PENDING
         obj = super().create(validated_data)
-        obj.point = self._get_point_object(obj)
-        obj.save()
+        process_image.delay(image_id=obj.id)
         return obj
 
+    def update(self, instance, validated_data):
+        self._set_point(validated_data)
+        obj = super().update(instance, validated_data)
+        if "original" in validated_data:
+            process_image.delay(image_id=obj.id)
+        return obj
+
+
+def upload_directory(profile):
+    """ the storage directory a profile's direct uploads must be placed in """
+    return os.path.dirname(original_image_path(Image(creator=profile), "upload")) + "/"
+
+
+class UploadRequestSerializer(serializers.Serializer):
+    """ what a client is about to upload straight to storage """
+    ALLOWED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic")
+
+    filename = serializers.CharField()
+    content_type = serializers.RegexField(r"^image/[\w.+-]+$")
+
+    def validate_filename(self, filename):
+        if os.path.splitext(filename)[1].lower() not in self.ALLOWED_EXTENSIONS:
+            raise serializers.ValidationError("Unsupported image type.")
+        return filename
+
+
+class FinalizeUploadSerializer(InputImageSerializer):
+    """ creates the Image for a file the client uploaded straight to storage """
+    # the storage name handed out by the upload endpoint
+    file = serializers.CharField(source="original", write_only=True)
+
+    ALREADY_FINALIZED = "This upload was already finalized."
+
+    def validate_file(self, name):
+        request = self.context["request"]
+        storage = Image._meta.get_field("original").storage
+        if (
+            not name.startswith(upload_directory(request.user.profile))
+            or ".." in name
+            or not storage.exists(name)
+        ):
+            raise serializers.ValidationError("No such upload.")
+        if Image.objects.filter(original=name).exists():
+            raise serializers.ValidationError(self.ALREADY_FINALIZED)
+        if storage.size(name) > settings.IMAGE_UPLOAD_MAX_SIZE:
+            storage.delete(name)
+            raise serializers.ValidationError("The uploaded file is too large.")
+        return name
+
+    def create(self, validated_data):
+        # a concurrent finalize of the same upload passes validate_file too,
+        # the unique index on Image.original lets only one of them through
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({"file": [self.ALREADY_FINALIZED]})
+
+
+class NotificationActorSerializer(serializers.ModelSerializer):
+    """ Used for the notifications, only what fits in an inbox row """
+
+    class Meta:
+        model = Profile
+        fields = ("id", "profile_image", "username", "name")
+
 
 class NotificationSerializer(serializers.ModelSerializer):
-    creator = UserProfileSerializer()
+    creator = NotificationActorSerializer()
     image = SmallImageSerializer()
+    is_unread = serializers.SerializerMethodField()
 
     class Meta:
         model = Notification
         fields = (
             "id",
             "creator",
+            "actor_count",
             "image",
             "comment",
             "notification_type",
             "to",
+            "is_unread",
             "updated_at",
             "natural_time",
         )
+
+    def get_is_unread(self, notification):
+        """ `read_at` is the recipient's notifications_read_at, passed in the context """
+        read_at = self.context.get("read_at")
+        return read_at is None or notification.created_at > read_at
+
+
+class NotificationStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Profile
+        fields = ("unread_notifications_count", "notifications_read_at")
+
+
+class LikeBatchSerializer(serializers.Serializer):
+    """ image ids to like and to unlike, the final state of each image only """
+    MAX_IMAGES = 100
+
+    like = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list)
+    unlike = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list)
+
+    def validate(self, data):
+        if len(data["like"]) + len(data["unlike"]) > self.MAX_IMAGES:
+            raise serializers.ValidationError(f"At most {self.MAX_IMAGES} images per batch.")
+        if set(data["like"]) & set(data["unlike"]):
+            raise serializers.ValidationError("An image can not be both liked and unliked.")
+        return data
+
+
+class ProfileBatchSerializer(serializers.Serializer):
+    """ profiles to follow or unfollow, by id and/or by username """
+    MAX_PROFILES = 100
+
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list)
+    usernames = serializers.ListField(child=serializers.CharField(), default=list)
+
+    def validate(self, data):
+        total = len(data["ids"]) + len(data["usernames"])
+        if not total:
+            raise serializers.ValidationError("No profiles given.")
+        if total > self.MAX_PROFILES:
+            raise serializers.ValidationError(f"At most {self.MAX_PROFILES} profiles at once.")
+        return data
+
+
+class ContactsSerializer(serializers.Serializer):
+    """ phone numbers in international format, e.g. +14155552671 """
+    MAX_PHONES = 1000
+
+    phones = serializers.ListField(child=serializers.CharField(max_length=32))
+
+    def validate_phones(self, phones):
+        if len(phones) > self.MAX_PHONES:
+            raise serializers.ValidationError(f"At most {self.MAX_PHONES} numbers at once.")
+        return phones
+
+
+class HashtagSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source="tag.name")
+
+    class Meta:
+        model = HashtagStat
+        fields = ("name", "images_count")
+
+
+class TrendingTagSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source="tag.name")
+
+    class Meta:
+        model = TrendingTag
+        fields = ("name", "score")
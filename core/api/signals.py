@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.accounts.models import Follow, Profile
+from core.api import cache
+from core.images.models import Comment, Image, Like
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def image_changed(sender, instance, **kwargs):
+    cache.invalidate_images([instance.id])
+    # post_count
+    cache.invalidate_profiles([instance.creator_id])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def image_activity(sender, instance, **kwargs):
+    cache.invalidate_images([instance.image_id])
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    cache.invalidate_profiles([instance.id])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    """ Follows written through the ORM, the views invalidate core.accounts.follows' own """
+    cache.invalidate_profiles([instance.follower_id, instance.followee_id])
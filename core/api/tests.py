@@ -1,3 +1,677 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import threading
+import time
+from base64 import b64encode
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import (
+    APIClient,
+    APIRequestFactory,
+    APITestCase,
+    APITransactionTestCase,
+)
+from rest_framework_jwt.settings import api_settings
+
+from core.accounts import verification
+from core.accounts.models import Follow, Profile
+from core.api.authentication import CachedTokenAuthentication, JWTAuthentication, token_cache
+from core.api.pagination import KeysetPagination
+from core.api.serializers import FinalizeUploadSerializer, upload_directory
+from core.images import feed, notifications, stream
+from core.images.geo import make_point
+from core.images.models import Image, Notification, TimelineEntry
+from core.images.notifications import PendingNotification
+
+MEDIA_ROOT = tempfile.mkdtemp()
+RESPONSE_CACHE_DIR = tempfile.mkdtemp()
+
+
+class DirectUploadStorage(FileSystemStorage):
+    """ Local stand-in for core.storage_backends.MediaStorage, nothing is signed """
+
+    def presigned_post(self, name, content_type, max_size, expire):
+        return {"url": self.url(name), "fields": {"key": name, "Content-Type": content_type}}
+
+    def presigned_put(self, name, content_type, expire):
+        return self.url(name)
+
+
+def create_profile(username):
+    return Profile.create_profile(user=User.objects.create_user(username))
+
+
+@override_settings(DEFAULT_FILE_STORAGE="core.api.tests.DirectUploadStorage", MEDIA_ROOT=MEDIA_ROOT)
+class DirectUploadTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.profile = create_profile("uploader")
+        self.other = create_profile("other")
+        self.client.force_authenticate(user=self.profile.owner)
+
+    def upload(self, profile):
+        """ What a client PUTs to the presigned URL, returns the storage name """
+        response = self.client.post(
+            reverse("api:image_upload"),
+            {"filename": "dish.jpg", "content_type": "image/jpeg"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        name = response.data["file"].replace(
+            upload_directory(self.profile), upload_directory(profile)
+        )
+        return default_storage.save(name, ContentFile(b"not checked until processing"))
+
+    def finalize(self, name):
+        return self.client.post(
+            reverse("api:finalize_image_upload"),
+            {"file": name, "dish": "Soup", "restaurant": "Chez Test", "tags": ["soup"]},
+            format="json",
+        )
+
+    def test_upload_target_is_in_the_profile_directory(self):
+        response = self.client.post(
+            reverse("api:image_upload"),
+            {"filename": "dish.jpg", "content_type": "image/jpeg"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["file"].startswith(upload_directory(self.profile)))
+        self.assertIn("post", response.data)
+        self.assertIn("put", response.data)
+
+    def test_upload_rejects_other_file_types(self):
+        response = self.client.post(
+            reverse("api:image_upload"),
+            {"filename": "dish.exe", "content_type": "image/jpeg"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalize_own_upload(self):
+        name = self.upload(self.profile)
+
+        response = self.finalize(name)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Image.objects.get(creator=self.profile).original.name, name)
+
+    def test_finalize_twice(self):
+        name = self.upload(self.profile)
+        self.finalize(name)
+
+        response = self.finalize(name)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Image.objects.filter(original=name).count(), 1)
+
+    def test_concurrent_finalize(self):
+        name = self.upload(self.profile)
+        request = SimpleNamespace(user=self.profile.owner)
+        data = {"file": name, "dish": "Soup", "restaurant": "Chez Test", "tags": ["soup"]}
+        serializer = FinalizeUploadSerializer(data=data, context={"request": request})
+        self.assertTrue(serializer.is_valid())
+        # the other request creates its image between this one's validation and save
+        Image.objects.create(
+            creator=self.profile, original=name, restaurant="Chez Test", dish="Soup"
+        )
+
+        with self.assertRaises(ValidationError):
+            serializer.save(creator=self.profile)
+        self.assertEqual(Image.objects.filter(original=name).count(), 1)
+
+    def test_finalize_rejects_another_profiles_upload(self):
+        name = self.upload(self.other)
+
+        response = self.finalize(name)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Image.objects.exists())
+
+    def test_finalize_rejects_a_path_leaving_the_profile_directory(self):
+        name = self.upload(self.other)
+        escaped = upload_directory(self.profile) + "../" + name.split("/", 1)[1]
+
+        response = self.finalize(escaped)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Image.objects.exists())
+
+    def test_finalize_rejects_a_missing_upload(self):
+        response = self.finalize(upload_directory(self.profile) + "never-uploaded.jpg")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=4)
+    def test_finalize_deletes_an_oversized_upload(self):
+        name = self.upload(self.profile)
+
+        response = self.finalize(name)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(default_storage.exists(name))
+
+
+def cursor_url(url, position):
+    cursor = b64encode(json.dumps({"p": position}).encode("utf-8")).decode("ascii")
+    return f"{url}?cursor={cursor}"
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.author = create_profile("author")
+        self.images = [
+            Image.objects.create(creator=self.author, restaurant="Chez Test", dish=f"Dish {number}")
+            for number in range(5)
+        ]
+
+    def paginate(self, querysets, url="/?page_size=2", ordering=("-created_at", "-id")):
+        """ The ids of the page at url, and its next and previous links """
+        paginator = KeysetPagination()
+        page = paginator.paginate_querysets(
+            querysets,
+            Request(APIRequestFactory().get(url)),
+            view=SimpleNamespace(keyset_ordering=ordering),
+        )
+        ids = [getattr(row, ordering[-1].lstrip("-")) for row in page]
+        return ids, paginator.get_next_link(), paginator.get_previous_link()
+
+    def walk(self, querysets, **kwargs):
+        """ Every page forward from the first, then backward from the last """
+        forward, url = [], "/?page_size=2"
+        while url is not None:
+            ids, url, previous = self.paginate(querysets, url=url, **kwargs)
+            forward.append(ids)
+        backward, url = [], previous
+        while url is not None:
+            ids, _, url = self.paginate(querysets, url=url, **kwargs)
+            backward.insert(0, ids)
+        return forward, backward
+
+    def test_pages_across_a_tie(self):
+        Image.objects.update(created_at=timezone.now())
+        newest_first = sorted((image.id for image in self.images), reverse=True)
+
+        forward, backward = self.walk([Image.objects.all()])
+
+        self.assertEqual(forward, [newest_first[:2], newest_first[2:4], newest_first[4:]])
+        self.assertEqual(backward, forward[:-1])
+
+    def test_merges_querysets_without_duplicates(self):
+        reader = create_profile("reader")
+        Follow.objects.create(follower=reader, followee=self.author)
+        Profile.objects.filter(id=self.author.id).update(fanout_on_read=True)
+        now = timezone.now()
+        for age, image in enumerate(self.images):
+            Image.objects.filter(id=image.id).update(created_at=now - timedelta(minutes=age))
+        # fanned out before the author switched to fan-out-on-read, also pulled now
+        for image in Image.objects.filter(id__in=[self.images[0].id, self.images[3].id]):
+            TimelineEntry.objects.create(profile=reader, image=image, created_at=image.created_at)
+
+        querysets = feed.home_feed(reader)
+        forward, backward = self.walk(querysets, ordering=("-created_at", "-image_id"))
+
+        ids = [image.id for image in self.images]
+        self.assertEqual(len(querysets), 2)
+        self.assertEqual(forward, [ids[:2], ids[2:4], ids[4:]])
+        self.assertEqual(backward, forward[:-1])
+
+
+class InvalidCursorTests(APITestCase):
+    def setUp(self):
+        self.profile = create_profile("reader")
+        self.client.force_authenticate(user=self.profile.owner)
+
+    def test_invalid_cursors_are_not_found(self):
+        url = reverse("api:feed-list")
+        for position in (
+            ["not a date", 1],
+            [timezone.now().isoformat(), "not an id"],
+            [timezone.now().isoformat(), 2 ** 40],
+            [None, 1],
+            [{"a": 1}, [1]],
+            [timezone.now().isoformat()],
+        ):
+            with self.subTest(position=position):
+                response = self.client.get(cursor_url(url, position))
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_garbage_cursor_is_not_found(self):
+        response = self.client.get(reverse("api:feed-list") + "?cursor=garbage")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def jwt_for(user, **claims):
+    payload = api_settings.JWT_PAYLOAD_HANDLER(user)
+    payload.update(claims)
+    return "JWT " + api_settings.JWT_ENCODE_HANDLER(payload)
+
+
+class JWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.profile = create_profile("reader")
+        self.user = self.profile.owner
+
+    def authenticate(self, header):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=header)
+        return JWTAuthentication().authenticate(request)
+
+    def test_user_is_loaded_with_its_profile_only_when_accessed(self):
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(jwt_for(self.user))
+            self.assertEqual((user.id, user.username), (self.user.id, self.user.username))
+            self.assertTrue(user and user.is_authenticated)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user.profile.id, self.profile.id)
+            self.assertEqual(user.email, self.user.email)
+
+    def test_expired_token_is_rejected(self):
+        expired = timezone.now() - timedelta(seconds=1)
+
+        response = self.client.get(
+            reverse("api:feed-list"), HTTP_AUTHORIZATION=jwt_for(self.user, exp=expired)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_tokens_are_rejected(self):
+        tampered = jwt_for(self.user)[:-2] + "xx"
+        for header in (tampered, "JWT not.a.token", jwt_for(self.user, user_id=None)):
+            with self.subTest(header=header):
+                response = self.client.get(reverse("api:feed-list"), HTTP_AUTHORIZATION=header)
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_valid_token_is_accepted(self):
+        response = self.client.get(reverse("api:feed-list"), HTTP_AUTHORIZATION=jwt_for(self.user))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user = create_profile("reader").owner
+        self.token = Token.objects.create(user=self.user)
+        self.addCleanup(token_cache.delete, self.token.key)
+
+    def authenticate(self, key):
+        return CachedTokenAuthentication().authenticate_credentials(key)
+
+    def test_cached_token_needs_no_query(self):
+        self.authenticate(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = self.authenticate(self.token.key)
+        self.assertEqual((user.id, token.key), (self.user.id, self.token.key))
+        # every request gets its own instance
+        self.assertIsNot(user, self.authenticate(self.token.key)[0])
+
+    def test_deleted_token_is_evicted(self):
+        header = f"Token {self.token.key}"
+        self.assertEqual(
+            self.client.get(reverse("api:feed-list"), HTTP_AUTHORIZATION=header).status_code,
+            status.HTTP_200_OK,
+        )
+
+        response = self.client.delete(reverse("api:logout"), HTTP_AUTHORIZATION=header)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertIsNone(token_cache.get(self.token.key))
+        response = self.client.get(reverse("api:feed-list"), HTTP_AUTHORIZATION=header)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unknown_token_is_rejected(self):
+        response = self.client.get(reverse("api:feed-list"), HTTP_AUTHORIZATION="Token unknown")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class NearbyImagesTests(APITestCase):
+    # (latitude, longitude) of Paris and of a point 3 km east of it
+    PARIS = (48.8566, 2.3522)
+    EAST = (48.8566, 2.3932)
+
+    def setUp(self):
+        profile = create_profile("reader")
+        self.client.force_authenticate(user=profile.owner)
+        self.near = Image.objects.create(
+            creator=profile, restaurant="Chez Test", dish="Soup", point=make_point(*self.PARIS)
+        )
+        self.far = Image.objects.create(
+            creator=profile, restaurant="Chez Test", dish="Stew", point=make_point(*self.EAST)
+        )
+
+    def nearby(self, **params):
+        return self.client.get(reverse("api:images-list"), params)
+
+    def test_nearest_first(self):
+        response = self.nearby(latitude=self.EAST[0], longitude=self.EAST[1], radius=5000)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [image["id"] for image in response.data["results"]]
+        self.assertEqual(ids, [self.far.id, self.near.id])
+
+    def test_radius(self):
+        response = self.nearby(latitude=self.PARIS[0], longitude=self.PARIS[1], radius=1000)
+
+        self.assertEqual([image["id"] for image in response.data["results"]], [self.near.id])
+
+    @override_settings(IMAGES_NEARBY_MAX_RADIUS=1000)
+    def test_radius_is_capped(self):
+        response = self.nearby(latitude=self.PARIS[0], longitude=self.PARIS[1], radius=100000)
+
+        self.assertEqual([image["id"] for image in response.data["results"]], [self.near.id])
+
+    def test_invalid_coordinates(self):
+        for params in (
+            {"latitude": 91, "longitude": 2},
+            {"latitude": 48, "longitude": 181},
+            {"latitude": "north", "longitude": 2},
+            {"latitude": 48, "longitude": 2, "radius": 0},
+            {"latitude": 48, "longitude": 2, "radius": "far"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.nearby(**params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UnavailableProvider:
+    def check(self, phone, country_code, code):
+        raise verification.ProviderUnavailable("timed out")
+
+
+class ConfirmPhoneTests(APITestCase):
+    def setUp(self):
+        self.profile = create_profile("reader")
+        self.client.force_authenticate(user=self.profile.owner)
+        self.url = reverse(
+            "api:user_profile-verify_number", kwargs={"owner__username": "reader"}
+        )
+
+    @mock.patch.object(
+        verification, "_provider", verification.CircuitBreaker(UnavailableProvider(), 5, 30)
+    )
+    def test_unavailable_provider(self):
+        response = self.client.put(self.url, {"token": "000000"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.profile.refresh_from_db()
+        self.assertFalse(self.profile.verified)
+
+    @mock.patch.object(
+        verification,
+        "_provider",
+        verification.CircuitBreaker(verification.FakeProvider(), 5, 30),
+    )
+    @override_settings(PHONE_VERIFICATION_FAKE_CODE="000000", PHONE_VERIFICATION_FAKE_LATENCY=0)
+    def test_verified(self):
+        response = self.client.put(self.url, {"token": "000000"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.verified)
+
+
+class NotificationInboxTests(APITestCase):
+    def setUp(self):
+        self.author = create_profile("author")
+        self.fans = [create_profile(f"fan{number}") for number in range(2)]
+        self.image = Image.objects.create(creator=self.author, restaurant="Chez Test", dish="Soup")
+        self.client.force_authenticate(user=self.author.owner)
+
+    def like(self, fan):
+        notifications.write(
+            [PendingNotification(fan.id, self.author.id, Notification.LIKE, self.image.id, None)]
+        )
+
+    def comment(self, fan):
+        pending = PendingNotification(
+            fan.id, self.author.id, Notification.COMMENT, self.image.id, "Yum"
+        )
+        notifications.write([pending])
+
+    def status(self):
+        return self.client.get(reverse("api:notification_status")).data
+
+    def inbox(self):
+        return self.client.get(reverse("api:notifications")).data["results"]
+
+    def test_unread_likes_are_grouped(self):
+        for fan in self.fans:
+            self.like(fan)
+        self.comment(self.fans[0])
+
+        self.assertEqual(self.status()["unread_notifications_count"], 2)
+        inbox = self.inbox()
+        self.assertEqual([item["notification_type"] for item in inbox], ["C", "L"])
+        self.assertEqual(inbox[1]["actor_count"], 2)
+        self.assertTrue(all(item["is_unread"] for item in inbox))
+
+    def test_reading_moves_the_watermark(self):
+        self.like(self.fans[0])
+
+        response = self.client.post(reverse("api:read_notifications"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["unread_notifications_count"], 0)
+        self.assertIsNotNone(response.data["notifications_read_at"])
+        self.assertFalse(self.inbox()[0]["is_unread"])
+
+    def test_likes_after_reading_start_a_new_group(self):
+        self.like(self.fans[0])
+        self.client.post(reverse("api:read_notifications"))
+
+        self.like(self.fans[1])
+
+        self.assertEqual(self.status()["unread_notifications_count"], 1)
+        inbox = self.inbox()
+        self.assertEqual([item["is_unread"] for item in inbox], [True, False])
+        self.assertEqual([item["actor_count"] for item in inbox], [1, 1])
+
+    def test_only_the_recipients_inbox(self):
+        notifications.write(
+            [PendingNotification(self.author.id, self.fans[0].id, Notification.FOLLOW, None, None)]
+        )
+
+        self.assertEqual(self.inbox(), [])
+        self.assertEqual(self.status()["unread_notifications_count"], 0)
+
+
+@override_settings(NOTIFICATION_STREAM_BACKEND="local", NOTIFICATION_STREAM_TIMEOUT=0)
+@mock.patch.object(stream, "_local_hub", stream.NotificationHub())
+class NotificationStreamTests(APITestCase):
+    def setUp(self):
+        self.author = create_profile("author")
+        self.fan = create_profile("fan")
+        self.client.force_authenticate(user=self.author.owner)
+
+    def follow_notification(self):
+        notifications.write(
+            [PendingNotification(self.fan.id, self.author.id, Notification.FOLLOW, None, None)]
+        )
+        return Notification.objects.get(to=self.author)
+
+    def poll(self, since=None):
+        params = {} if since is None else {"since": since}
+        return self.client.get(reverse("api:notification_stream"), params)
+
+    def test_times_out_empty(self):
+        self.follow_notification()
+
+        response = self.poll()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+        self.assertTrue(response.data["since"].endswith(",0"))
+
+    def test_returns_what_arrived_after_the_cursor(self):
+        since = self.poll().data["since"]
+        notification = self.follow_notification()
+
+        response = self.poll(since)
+
+        self.assertEqual([item["id"] for item in response.data["results"]], [notification.id])
+        self.assertEqual(self.poll(response.data["since"]).data["results"], [])
+
+    def test_regrouped_notification_comes_back(self):
+        since = self.poll().data["since"]
+        self.follow_notification()
+        since = self.poll(since).data["since"]
+        other = create_profile("other")
+        notifications.write(
+            [PendingNotification(other.id, self.author.id, Notification.FOLLOW, None, None)]
+        )
+
+        results = self.poll(since).data["results"]
+
+        self.assertEqual([item["actor_count"] for item in results], [2])
+
+    def test_invalid_cursor(self):
+        for since in ("yesterday,1", "2026-10-18T10:00:00Z,x", "2026-10-18T10:00:00Z"):
+            with self.subTest(since=since):
+                self.assertEqual(self.poll(since).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(
+    NOTIFICATION_STREAM_BACKEND="local",
+    NOTIFICATION_STREAM_TIMEOUT=10,
+    NOTIFICATION_STREAM_POLL=10,
+)
+@mock.patch.object(stream, "_local_hub", stream.NotificationHub())
+class NotificationStreamWakeUpTests(TransactionTestCase):
+    def test_woken_by_a_new_notification(self):
+        author = create_profile("author")
+        fan = create_profile("fan")
+        client = APIClient()
+        client.force_authenticate(user=author.owner)
+        pending = PendingNotification(fan.id, author.id, Notification.FOLLOW, None, None)
+
+        def notify():
+            time.sleep(0.5)
+            try:
+                notifications.write([pending])
+            finally:
+                connections.close_all()
+
+        writer = threading.Thread(target=notify)
+        writer.start()
+        started = time.monotonic()
+        response = client.get(reverse("api:notification_stream"))
+        writer.join()
+
+        self.assertEqual(len(response.data["results"]), 1)
+        # well before NOTIFICATION_STREAM_POLL, the write woke the request
+        self.assertLess(time.monotonic() - started, 5)
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "responses": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": RESPONSE_CACHE_DIR,
+        },
+    },
+    RESPONSE_CACHE="responses",
+    TASKS_ALWAYS_EAGER=True,
+)
+class ResponseCacheTests(APITransactionTestCase):
+    """ Transactional, the versions are only dropped once the writes commit """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(RESPONSE_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        caches["responses"].clear()
+        self.author = create_profile("author")
+        self.fan = create_profile("fan")
+        self.image = Image.objects.create(creator=self.author, restaurant="Chez Test", dish="Soup")
+        self.client.force_authenticate(user=self.fan.owner)
+        self.image_url = reverse("api:images-detail", kwargs={"pk": self.image.id})
+        self.profile_url = reverse(
+            "api:user_profile-detail", kwargs={"owner__username": "author"}
+        )
+
+    def get(self, url, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_unchanged_response_is_not_modified(self):
+        response = self.get(self.image_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["ETag"].startswith('W/"'))
+
+        cached = self.get(self.image_url, etag=response["ETag"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached["ETag"], response["ETag"])
+
+    def test_etag_is_per_viewer(self):
+        etag = self.get(self.image_url)["ETag"]
+        self.client.force_authenticate(user=self.author.owner)
+
+        self.assertEqual(self.get(self.image_url, etag=etag).status_code, status.HTTP_200_OK)
+
+    def test_like_and_unlike_change_the_image(self):
+        etag = self.get(self.image_url)["ETag"]
+
+        like = self.client.post(reverse("api:like_image", kwargs={"image_id": self.image.id}))
+        self.assertEqual(like.status_code, status.HTTP_201_CREATED)
+        response = self.get(self.image_url, etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["likes_count"], 1)
+
+        self.client.post(
+            reverse("api:like_batch"), {"like": [], "unlike": [self.image.id]}, format="json"
+        )
+        response = self.get(self.image_url, etag=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["likes_count"], 0)
+
+    def test_follow_and_unfollow_change_the_profile(self):
+        etag = self.get(self.profile_url)["ETag"]
+
+        follow = self.client.post(
+            reverse("api:follow_user", kwargs={"profile_id": self.author.id})
+        )
+        self.assertEqual(follow.status_code, status.HTTP_200_OK)
+        response = self.get(self.profile_url, etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["followers_count"], 1)
+
+        self.client.post(reverse("api:unfollow_users"), {"ids": [self.author.id]}, format="json")
+        response = self.get(self.profile_url, etag=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["followers_count"], 0)
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        RESPONSE_CACHE="default",
+    )
+    def test_per_process_cache_is_not_used(self):
+        response = self.get(self.image_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header("ETag"))
@@ -33,9 +33,13 @@ urlpatterns = [
     path("token/refresh/", refresh_jwt_token),
     path("token/verify/", verify_jwt_token),
     path("logout/", api_views.Logout.as_view(), name='logout'),
+    path("metrics/auth/", api_views.AuthMetrics.as_view(), name='auth_metrics'),
 
     # Users
     path("users/explore/", api_views.ExploreUsers.as_view(), name="explore_users"),
+    path("users/follow/", view=api_views.FollowUsers.as_view(), name="follow_users"),
+    path("users/unfollow/", view=api_views.UnfollowUsers.as_view(), name="unfollow_users"),
+    path("users/contacts/", view=api_views.ImportContacts.as_view(), name="import_contacts"),
     path(
         "users/<int:profile_id>/follow/",
         view=api_views.FollowUser.as_view(),
@@ -65,18 +69,50 @@ urlpatterns = [
     path("users/login/facebook/", view=api_views.FacebookLogin.as_view(), name="fb_login"),
     path("users/login/instagram/", view=api_views.InstagramLogin.as_view(), name="ig_login"),
     # Images
+    path("uploads/", view=api_views.ImageUpload.as_view(), name="image_upload"),
+    path(
+        "uploads/finalize/",
+        view=api_views.FinalizeImageUpload.as_view(),
+        name="finalize_image_upload",
+    ),
     # path("<int:image_id>/", view=api_views.ImageDetail.as_view(), name="image_detail"),
     path("<int:image_id>/likes/", view=api_views.LikeImage.as_view(), name="like_image"),
     path("<int:image_id>/unlikes/", view=api_views.UnlikeImage.as_view(), name="unlike_image"),
+    path("likes/", view=api_views.LikeBatch.as_view(), name="like_batch"),
     path(
-        "<int:image_id>)/comments/", view=api_views.CommentOnImage.as_view(), name="comment_image"
+        "<int:image_id>/comments/", view=api_views.CommentOnImage.as_view(), name="comment_image"
     ),
     path(
-        "<int:image_id>)/comments/<int:comment_id>/",
+        "<int:image_id>/comments/<int:comment_id>/",
         view=api_views.ModerateComments.as_view(),
         name="moderate_comments",
     ),
     path("comments/<int:comment_id>/", view=api_views.CommentView.as_view(), name="comment"),
     path("search/", view=api_views.SearchByHashtag.as_view(), name="search"),
+    path(
+        "search/hashtags/trending/",
+        view=api_views.TrendingHashtags.as_view(),
+        name="trending_hashtags",
+    ),
+    path(
+        "search/hashtags/",
+        view=api_views.HashtagAutocomplete.as_view(),
+        name="hashtag_autocomplete",
+    ),
     path("notifications/", view=api_views.NotificationsView.as_view(), name="notifications"),
+    path(
+        "notifications/stream/",
+        view=api_views.NotificationStream.as_view(),
+        name="notification_stream",
+    ),
+    path(
+        "notifications/status/",
+        view=api_views.NotificationStatus.as_view(),
+        name="notification_status",
+    ),
+    path(
+        "notifications/read/",
+        view=api_views.ReadNotifications.as_view(),
+        name="read_notifications",
+    ),
 ]
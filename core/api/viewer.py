@@ -0,0 +1,67 @@
+from django.utils.functional import cached_property
+
+from core.accounts.models import Follow
+from core.images.models import Like
+
+
+class ViewerContext:
+    """
+    Request-scoped answers to "has the viewer liked this image" and
+    "does the viewer follow this profile".
+
+    List serializers prime it with every object of the page so each question
+    costs one query per page instead of one query per row.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._liked_image_ids = set()
+        self._checked_image_ids = set()
+        self._following_ids = set()
+        self._checked_profile_ids = set()
+
+    @classmethod
+    def for_request(cls, request):
+        viewer = getattr(request, "_viewer_context", None)
+        if viewer is None:
+            viewer = cls(request.user)
+            request._viewer_context = viewer
+        return viewer
+
+    @cached_property
+    def profile_id(self):
+        profile = getattr(self.user, "profile", None)
+        return profile.id if profile is not None else None
+
+    def prime_likes(self, image_ids):
+        image_ids = set(image_ids) - self._checked_image_ids
+        if not image_ids or self.profile_id is None:
+            return
+        self._liked_image_ids.update(
+            Like.objects.filter(creator_id=self.profile_id, image_id__in=image_ids).values_list(
+                "image_id", flat=True
+            )
+        )
+        self._checked_image_ids.update(image_ids)
+
+    def prime_following(self, profile_ids):
+        profile_ids = set(profile_ids) - self._checked_profile_ids
+        if not profile_ids or self.profile_id is None:
+            return
+        self._following_ids.update(
+            Follow.objects.filter(
+                follower_id=self.profile_id, followee_id__in=profile_ids
+            ).values_list("followee_id", flat=True)
+        )
+        self._checked_profile_ids.update(profile_ids)
+
+    def is_liked(self, image_id):
+        self.prime_likes([image_id])
+        return image_id in self._liked_image_ids
+
+    def is_following(self, profile_id):
+        self.prime_following([profile_id])
+        return profile_id in self._following_ids
+
+    def is_self(self, profile_id):
+        return self.profile_id is not None and profile_id == self.profile_id
@@ -1,34 +1,60 @@
 # Create your views here.
+import time
 
 from allauth.socialaccount.providers.facebook.views import FacebookOAuth2Adapter
 from allauth.socialaccount.providers.instagram.views import InstagramOAuth2Adapter
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from django.db.models import Count
-from rest_framework import filters
 from rest_auth.registration.views import SocialLoginView
 from rest_framework import status, permissions, viewsets
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import GenericAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
-from core.accounts.models import Profile
-from core.api.pagination import StandardResultsSetPagination
+from core.accounts import follows, recommendations, search, verification
+from core.accounts.models import Follow, Profile
+from core.api import cache
+from core.api.authentication import TimedBasicAuthentication, auth_timings
+from core.api.pagination import KeysetPagination
 from core.api.permissions import IsOwnerOrReadOnly
 from core.api.serializers import (
     SignupSerializer,
     NotificationSerializer,
+    NotificationStatusSerializer,
     ListUserSerializer,
     UserProfileSerializer,
     ImageSerializer,
     InputImageSerializer,
     CommentSerializer,
+    UploadRequestSerializer,
+    FinalizeUploadSerializer,
+    LikeBatchSerializer,
+    ProfileBatchSerializer,
+    ContactsSerializer,
+    HashtagSerializer,
+    TrendingTagSerializer,
 )
-from core.images.models import Notification, Image, Like, Comment
+from core.images import feed, likes, nearby, notifications, stream
+from core.images.models import (
+    Notification,
+    Image,
+    Like,
+    Comment,
+    HashtagStat,
+    TrendingTag,
+    original_image_path,
+)
+from core.images.notifications import PendingNotification
 
 
 class SignupViewSet(ModelViewSet):
@@ -38,7 +64,13 @@ class SignupViewSet(ModelViewSet):
 
 
 class CustomJWTTokenSignin(ObtainAuthToken):
+    """ the only view accepting HTTP Basic credentials, username/password in the body work too """
+    authentication_classes = (TimedBasicAuthentication,)
+
     def post(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            token, created = Token.objects.get_or_create(user=request.user)
+            return Response({"token": token.key})
         return super().post(request, *args, **kwargs)
 
 
@@ -51,23 +83,110 @@ class Logout(GenericAPIView):
         """
         Remove all issued tokens to the logged user and finishes his session
         """
-        request.user.auth_token.delete()
+        # also drops them from the token cache, see core.api.authentication
+        Token.objects.filter(user_id=request.user.id).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class NotificationsView(APIView):
+class AuthMetrics(APIView):
+    """ time spent per authentication scheme in this process """
+    permission_classes = [IsAdminUser]
+
     def get(self, request, format=None):
-        user = request.user.profile
-        notifications = Notification.objects.filter(to=user)
-        serializer = NotificationSerializer(notifications, many=True)
+        return Response(data=auth_timings(), status=status.HTTP_200_OK)
+
+
+class NotificationsView(GenericAPIView):
+    """ the inbox, newest first """
+    pagination_class = KeysetPagination
+
+    def get(self, request, format=None):
+        profile = request.user.profile
+        inbox = Notification.objects.filter(to=profile).select_related("creator__owner", "image")
+        page = self.paginate_queryset(inbox)
+        serializer = NotificationSerializer(
+            page, many=True, context={"request": request, "read_at": profile.notifications_read_at}
+        )
+        return self.get_paginated_response(serializer.data)
+
+
+class NotificationStream(APIView):
+    """
+    long-poll for new notifications, oldest first: `?since=<cursor>` answers as soon as
+    something was created after the cursor, or empty after NOTIFICATION_STREAM_TIMEOUT
+    seconds. Poll again with the `since` of the response, without one the wait starts now.
+    Grouped notifications that get another actor come back with their new created_at.
+    """
+    page_size = 50
+
+    def get(self, request, format=None):
+        profile = request.user.profile
+        created_at, last_id = self._parse_since(request.query_params.get("since"))
+        inbox = (
+            Notification.objects.filter(to=profile)
+            .select_related("creator__owner", "image")
+            .order_by("created_at", "id")
+        )
+        newer = inbox.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=last_id)
+        )
+
+        deadline = time.monotonic() + settings.NOTIFICATION_STREAM_TIMEOUT
+        with stream.local_hub().subscribe(profile.id) as woken:
+            while True:
+                page = list(newer[:self.page_size])
+                remaining = deadline - time.monotonic()
+                if page or remaining <= 0:
+                    break
+                woken.wait(min(remaining, settings.NOTIFICATION_STREAM_POLL))
+                woken.clear()
+
+        if page:
+            created_at, last_id = page[-1].created_at, page[-1].id
+        serializer = NotificationSerializer(
+            page, many=True, context={"request": request, "read_at": profile.notifications_read_at}
+        )
+        return Response(
+            data={"since": self._format_since(created_at, last_id), "results": serializer.data},
+            status=status.HTTP_200_OK,
+        )
+
+    @staticmethod
+    def _format_since(created_at, last_id):
+        """ `<UTC ISO 8601 with a Z>,<id>`, nothing in it needs escaping in a query string """
+        created_at = timezone.localtime(created_at, timezone.utc).replace(tzinfo=None)
+        return f"{created_at.isoformat()}Z,{last_id}"
+
+    @staticmethod
+    def _parse_since(since):
+        if not since:
+            return timezone.now(), 0
+        try:
+            created_at, last_id = since.rsplit(",", 1)
+            created_at, last_id = parse_datetime(created_at), int(last_id)
+        except ValueError:
+            created_at = None
+        if created_at is None:
+            raise ValidationError({"since": "Invalid cursor."})
+        return created_at, last_id
+
+
+class NotificationStatus(APIView):
+    """ how many notifications arrived since the inbox was last read """
+
+    def get(self, request, format=None):
+        serializer = NotificationStatusSerializer(request.user.profile)
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
 
-def create_notification(creator, to, notification_type, image=None, comment=None):
-    notification = Notification.objects.create(
-        creator=creator, to=to, notification_type=notification_type, image=image, comment=comment
-    )
-    notification.save()
+class ReadNotifications(APIView):
+    """ mark the whole inbox as read """
+
+    def post(self, request, format=None):
+        profile = request.user.profile
+        notifications.mark_read(profile)
+        serializer = NotificationStatusSerializer(profile)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
 
 
 class FacebookLogin(SocialLoginView):
@@ -78,46 +197,97 @@ class InstagramLogin(SocialLoginView):
     adapter_class = InstagramOAuth2Adapter
 
 
-class ExploreUsers(APIView):
-    """ returns the 5 users which posted images recently """
+class ExploreUsers(GenericAPIView):
+    """ profiles to follow, best first, precomputed by core.accounts.recommendations """
     http_method_names = ['get']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-score', '-id')
 
     def get(self, request, format=None):
-        explore_list = []
-        last_five_images = Image.objects.all()[:5]
-
-        for image in last_five_images:
-            if image.creator not in explore_list:
-                explore_list.append(image.creator)
-
-        serializer = ListUserSerializer(explore_list[:5], many=True, context={"request": request})
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        page = self.paginate_queryset(recommendations.for_profile(request.user.profile))
+        return cache.cached_response(
+            request,
+            ListUserSerializer,
+            [recommendation.candidate_id for recommendation in page],
+            Profile.objects.select_related("owner"),
+            paginator=self.paginator,
+        )
 
 
 class FollowUser(APIView):
     def post(self, request, profile_id, format=None):
-        user = request.user
-        try:
-            profile_to_follow = Profile.objects.get(id=profile_id)
-            user.profile.following.add(profile_to_follow)
-            user.profile.save()
-            """ create notification for following """
-            create_notification(user.profile, profile_to_follow, "follow")
-            return Response(status=status.HTTP_200_OK)
-        except Profile.DoesNotExist:
+        profile = request.user.profile
+        followed = follows.follow(profile, [profile_id])
+        if followed:
+            _after_follow(profile, followed)
+            cache.invalidate_profiles([profile.id, *followed])
+        elif not Profile.objects.filter(id=profile_id).exists():
             return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_200_OK)
 
 
 class UnfollowUser(APIView):
     def post(self, request, profile_id, format=None):
-        user = request.user
-        try:
-            user_to_unfollow = Profile.objects.get(id=profile_id)
-            user.profile.following.remove(user_to_unfollow)
-            user.profile.save()
-            return Response(status=status.HTTP_200_OK)
-        except Profile.DoesNotExist:
+        profile = request.user.profile
+        unfollowed = follows.unfollow(profile, [profile_id])
+        if unfollowed:
+            feed.unfollow_many(profile, unfollowed)
+            cache.invalidate_profiles([profile.id, *unfollowed])
+        elif not Profile.objects.filter(id=profile_id).exists():
             return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_200_OK)
+
+
+class FollowUsers(APIView):
+    """ follow many profiles, by id or username, e.g. the suggestions of an onboarding """
+
+    def post(self, request, format=None):
+        profile = request.user.profile
+        serializer = ProfileBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        targets = follows.resolve(**serializer.validated_data).values_list("id", flat=True)
+        followed = follows.follow(profile, list(targets))
+        _after_follow(profile, followed)
+        if followed:
+            cache.invalidate_profiles([profile.id, *followed])
+        return Response(data={"followed": followed}, status=status.HTTP_200_OK)
+
+
+class UnfollowUsers(APIView):
+    def post(self, request, format=None):
+        profile = request.user.profile
+        serializer = ProfileBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        targets = follows.resolve(**serializer.validated_data).values_list("id", flat=True)
+        unfollowed = follows.unfollow(profile, list(targets))
+        feed.unfollow_many(profile, unfollowed)
+        if unfollowed:
+            cache.invalidate_profiles([profile.id, *unfollowed])
+        return Response(data={"unfollowed": unfollowed}, status=status.HTTP_200_OK)
+
+
+class ImportContacts(APIView):
+    """ the profiles matching the phone numbers of the user's address book """
+
+    def post(self, request, format=None):
+        serializer = ContactsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        profiles = follows.from_contacts(serializer.validated_data["phones"]).select_related(
+            "owner"
+        )
+        serializer = ListUserSerializer(profiles, many=True, context={"request": request})
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+
+def _after_follow(profile, followed_ids):
+    """ backfill the feed with the newly followed profiles' images and notify them """
+    if not followed_ids:
+        return
+    feed.follow_many(profile, Profile.objects.filter(id__in=followed_ids))
+    for followed_id in followed_ids:
+        notifications.queue(
+            PendingNotification(profile.id, followed_id, Notification.FOLLOW, None, None)
+        )
 
 
 class UserProfile(viewsets.ModelViewSet):
@@ -126,6 +296,18 @@ class UserProfile(viewsets.ModelViewSet):
     queryset = Profile.objects.all()
     lookup_field = "owner__username"
 
+    def retrieve(self, request, owner__username=None):
+        profile_ids = self.get_queryset().filter(owner__username=owner__username).values_list(
+            "id", flat=True
+        )
+        return cache.cached_response(
+            request,
+            UserProfileSerializer,
+            profile_ids,
+            self.get_queryset().select_related("owner"),
+            many=False,
+        )
+
     @action(
         methods=["put"],
         detail=True,
@@ -143,7 +325,10 @@ class UserProfile(viewsets.ModelViewSet):
         if not token:
             return Response("Invalid token.", status=status.HTTP_400_BAD_REQUEST)
 
-        verified, error_msgs = profile.verify(token=token)
+        try:
+            verified, error_msgs = profile.verify(token=token)
+        except verification.ProviderUnavailable as e:
+            return Response(str(e), status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
         if verified:
             return Response({"verified": verified}, status=status.HTTP_200_OK)
@@ -151,35 +336,52 @@ class UserProfile(viewsets.ModelViewSet):
             return Response(error_msgs, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserFollowers(APIView):
+class ProfileEdgeList(GenericAPIView):
+    """
+    Profiles at one end of a page of edges (follows, likes), most recent edge first.
+    Keyset-paginated over the edge table, profile_field is the edge's profile foreign key.
+    """
+    pagination_class = KeysetPagination
+    profile_field = None
+
+    def get_edges_response(self, edges):
+        edges = edges.select_related(f"{self.profile_field}__owner")
+        page = self.paginate_queryset(edges)
+        profiles = [getattr(edge, self.profile_field) for edge in page]
+        serializer = ListUserSerializer(profiles, many=True, context={"request": self.request})
+        return self.get_paginated_response(serializer.data)
+
+
+class UserFollowers(ProfileEdgeList):
+    profile_field = "follower"
+
     def get(self, request, username, format=None):
         try:
             found_user = Profile.objects.get(owner__username=username)
         except Profile.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        user_followers = found_user.followers.all()
-        serializer = ListUserSerializer(user_followers, many=True, context={"request": request})
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return self.get_edges_response(Follow.objects.filter(followee=found_user))
+
 
+class UserFollowing(ProfileEdgeList):
+    profile_field = "followee"
 
-class UserFollowing(APIView):
     def get(self, request, username, format=None):
         try:
             found_user = Profile.objects.get(owner__username=username)
         except Profile.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        user_following = found_user.following.all()
-        serializer = ListUserSerializer(user_following, many=True, context={"request": request})
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return self.get_edges_response(Follow.objects.filter(follower=found_user))
 
 
 class Search(APIView):
-    """ search for a user by username """
+    """ search for a user by username or name prefix, `?username=` or `?q=` """
 
     def get(self, request, format=None):
-        username = request.query_params.get("username", None)
+        username = request.query_params.get("q", request.query_params.get("username", None))
         if username is not None:
-            users = Profile.objects.filter(owner__username__istartswith=username)
+            viewer = getattr(request.user, "profile", None)
+            users = search.search(username, viewer)
             serializer = ListUserSerializer(users, many=True, context={"request": request})
             return Response(data=serializer.data, status=status.HTTP_200_OK)
         else:
@@ -206,11 +408,15 @@ class ChangePassword(APIView):
 
 
 class ImagesViewSet(viewsets.ModelViewSet):
-    queryset = Image.objects.annotate(num_likes=Count('likes'))
+    queryset = Image.objects.for_listing()
     permission_classes = [IsOwnerOrReadOnly, IsAuthenticated]
-    filter_backends = (filters.OrderingFilter,)
-    pagination_class = StandardResultsSetPagination
-    ordering = ['-num_likes']
+    pagination_class = KeysetPagination
+    # `num_likes` is kept as an alias from when popularity was a COUNT annotation
+    ordering_fields = {
+        'num_likes': 'likes_count',
+        'likes_count': 'likes_count',
+        'created_at': 'created_at',
+    }
 
     def get_serializer_class(self, *args, **kwargs):
         if self.request.method == 'POST':
@@ -222,19 +428,122 @@ class ImagesViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
+    def _is_nearby(self):
+        query_params = self.request.query_params
+        return bool(query_params.get('latitude') and query_params.get('longitude'))
+
+    def _nearby_params(self):
+        """ `?latitude=..&longitude=..&radius=<meters>` """
+        query_params = self.request.query_params
+        try:
+            latitude = float(query_params['latitude'])
+            longitude = float(query_params['longitude'])
+            radius = float(query_params.get('radius', settings.IMAGES_NEARBY_RADIUS))
+        except ValueError:
+            raise ValidationError("latitude, longitude and radius must be numbers.")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and radius > 0):
+            raise ValidationError("Invalid latitude, longitude or radius.")
+        return latitude, longitude, min(radius, settings.IMAGES_NEARBY_MAX_RADIUS)
+
+    def _is_trending(self):
+        return self.request.query_params.get('ordering') == 'trending'
+
+    def get_keyset_ordering(self):
+        """
+        `?ordering=(-)created_at|(-)likes_count|trending`, most liked first by default,
+        `trending` only lists the images of the last rollup (core.images.trending)
+        """
+        if self._is_nearby():
+            return ('knn', 'id')
+        if self._is_trending():
+            return ('-trending_score', '-id')
+        ordering = self.request.query_params.get('ordering', '-likes_count')
+        field = self.ordering_fields.get(ordering.lstrip('-'))
+        if field is None:
+            return ('-likes_count', '-id')
+        if ordering.startswith('-'):
+            return ('-' + field, '-id')
+        return (field, 'id')
+
     def get_queryset(self):
-        latitude = self.request.query_params.get('latitude')
-        longitude = self.request.query_params.get('longitude')
         qs = super().get_queryset()
-        if latitude and longitude:
-            return qs.within(lat=latitude, long=longitude).order_by('distance')
+        if self.action == 'list':
+            qs = qs.ready()
+        if self._is_nearby():
+            latitude, longitude, radius = self._nearby_params()
+            if nearby.is_cacheable(radius):
+                cached = nearby.nearby_from_cache(qs, latitude, longitude, radius)
+                if cached is not None:
+                    return cached
+            return qs.nearby(latitude, longitude, radius)
+        if self._is_trending():
+            return qs.filter(trending__isnull=False).annotate(trending_score=F('trending__score'))
         return qs
 
+    def list(self, request, *args, **kwargs):
+        # page over the bare rows, the serialized images come from core.api.cache
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset.select_related(None).prefetch_related(None))
+        return cache.cached_response(
+            request,
+            ImageSerializer,
+            [image.id for image in page],
+            Image.objects.for_listing(),
+            paginator=self.paginator,
+        )
+
+    def retrieve(self, request, pk=None):
+        if not str(pk).isdigit():
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return cache.cached_response(
+            request, ImageSerializer, [int(pk)], self.get_queryset(), many=False
+        )
+
     def perform_create(self, serializer):
+        # the image is fanned out to feeds once processed, see core.images.tasks
         serializer.save(creator=self.request.user.profile)
         return serializer
 
 
+class ImageUpload(APIView):
+    """ hand out a presigned target to upload an image straight to storage """
+
+    def post(self, request, format=None):
+        storage = Image._meta.get_field("original").storage
+        if not hasattr(storage, "presigned_post"):
+            return Response(
+                "Direct uploads are not supported by the configured storage.",
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        serializer = UploadRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        filename = serializer.validated_data["filename"]
+        content_type = serializer.validated_data["content_type"]
+        name = original_image_path(Image(creator=request.user.profile), filename)
+        expire = settings.IMAGE_UPLOAD_URL_EXPIRE
+        data = {
+            "file": name,
+            "post": storage.presigned_post(
+                name, content_type, settings.IMAGE_UPLOAD_MAX_SIZE, expire
+            ),
+            "put": storage.presigned_put(name, content_type, expire),
+            "expires_in": expire,
+        }
+        return Response(data=data, status=status.HTTP_200_OK)
+
+
+class FinalizeImageUpload(APIView):
+    """ create the image once its direct upload is in storage """
+
+    def post(self, request, format=None):
+        serializer = FinalizeUploadSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        image = serializer.save(creator=request.user.profile)
+        data = ImageSerializer(image, context={"request": request}).data
+        return Response(data=data, status=status.HTTP_201_CREATED)
+
+
 class GenericImageView(APIView):
     def _get_object(self, image_id):
         try:
@@ -243,49 +552,80 @@ class GenericImageView(APIView):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-class LikeImage(GenericImageView):
+class LikeImage(ProfileEdgeList):
+    profile_field = "creator"
+
     def get(self, request, image_id, format=None):
-        likes = Like.objects.filter(image__id=image_id)
-        like_creator_ids = likes.values("creator_id")
-        users = Profile.objects.filter(id__in=like_creator_ids)
-        serializer = ListUserSerializer(users, many=True, context={"request": request})
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return self.get_edges_response(
+            Like.objects.filter(image_id=image_id, creator__isnull=False)
+        )
 
     def post(self, request, image_id, format=None):
         user = request.user.profile
-        found_image = self._get_object(image_id)
-        like, created = Like.objects.get_or_create(creator=user, image=found_image)
-        if created:
-            create_notification(user, found_image.creator, "like", found_image)
+        liked = likes.like(user, [image_id])
+        if liked:
+            _notify_likes(user, liked)
+            cache.invalidate_images([image_id])
             return Response(status=status.HTTP_201_CREATED)
+        if not Image.objects.filter(id=image_id).exists():
+            return Response(status=status.HTTP_404_NOT_FOUND)
         return Response(status=status.HTTP_202_ACCEPTED)
 
 
-class UnlikeImage(GenericImageView):
+class UnlikeImage(APIView):
     def delete(self, request, image_id, format=None):
-        user = request.user.profile
-        found_image = self._get_object(image_id)
-        try:
-            preexisting_like = Like.objects.get(creator=user, image=found_image)
-            preexisting_like.delete()
+        if likes.unlike(request.user.profile, [image_id]):
+            cache.invalidate_images([image_id])
             return Response(status=status.HTTP_204_NO_CONTENT)
-        except Like.DoesNotExist:
-            return Response(status=status.HTTP_202_ACCEPTED)
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+
+class LikeBatch(APIView):
+    """ apply likes and unlikes queued by an offline client, repeating them is harmless """
+
+    def post(self, request, format=None):
+        user = request.user.profile
+        serializer = LikeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        liked = likes.like(user, serializer.validated_data["like"])
+        unliked = likes.unlike(user, serializer.validated_data["unlike"])
+        _notify_likes(user, liked)
+        cache.invalidate_images([image_id for image_id, _ in liked] + unliked)
+        data = {"liked": sorted(image_id for image_id, _ in liked), "unliked": sorted(unliked)}
+        return Response(data=data, status=status.HTTP_200_OK)
+
+
+def _notify_likes(profile, liked):
+    for image_id, creator_id in liked:
+        notifications.queue(
+            PendingNotification(profile.id, creator_id, Notification.LIKE, image_id, None)
+        )
 
 
-class CommentOnImage(GenericImageView):
-    """ post a comment """
+class CommentOnImage(GenericImageView, GenericAPIView):
+    """ list and post comments """
+    pagination_class = KeysetPagination
+
+    def get(self, request, image_id, format=None):
+        comments = Comment.objects.filter(image__id=image_id).select_related("creator__owner")
+        page = self.paginate_queryset(comments)
+        serializer = CommentSerializer(page, many=True, context={"request": request})
+        return self.get_paginated_response(serializer.data)
 
     def post(self, request, image_id, format=None):
         user = request.user.profile
         found_image = self._get_object(image_id)
-        serializer = CommentSerializer(data=request.data, context={"request:": request})
+        serializer = CommentSerializer(data=request.data, context={"request": request})
 
         if serializer.is_valid(raise_exception=True):
             serializer.save(creator=user, image=found_image)
             """ create notification for comment """
-            create_notification(
-                user, found_image.creator, "comment", found_image, serializer.data["message"]
+            notifications.create_notification(
+                user,
+                found_image.creator,
+                Notification.COMMENT,
+                found_image,
+                serializer.data["message"],
             )
             return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
@@ -319,20 +659,56 @@ class ModerateComments(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class SearchByHashtag(APIView):
-    """ search for a hastag """
+class SearchByHashtag(GenericAPIView):
+    """
+    search for hashtags, `?hashtags=a,b` matches any of them, `&match=all` all of them.
+    Hottest first (core.images.ranking), without hashtags the hottest images overall.
+    """
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-hot_score', '-id')
 
     def get(self, request, format=None):
+        images = Image.objects.ready()
         hashtags = request.query_params.get("hashtags", None)
         if hashtags is not None:
-            hashtags = hashtags.split(",")
-            images = Image.objects.filter(tags__name__in=hashtags).distinct()
-            serializer = ImageSerializer(images, many=True, context={"request": request})
-            return Response(data=serializer.data, status=status.HTTP_200_OK)
-        else:
-            images = Image.objects.all()[:30]
-            serializer = ImageSerializer(images, many=True, context={"request": request})
-            return Response(data=serializer.data, status=status.HTTP_200_OK)
+            hashtags = [hashtag.strip() for hashtag in hashtags.split(",") if hashtag.strip()]
+            match_all = request.query_params.get("match", "any") == "all"
+            images = images.tagged(hashtags, match_all=match_all)
+        page = self.paginate_queryset(images.only("id", "hot_score"))
+        return cache.cached_response(
+            request,
+            ImageSerializer,
+            [image.id for image in page],
+            Image.objects.for_listing(),
+            paginator=self.paginator,
+        )
+
+
+class HashtagAutocomplete(APIView):
+    """ hashtags starting with `?q=`, most used first """
+    limit = 10
+
+    def get(self, request, format=None):
+        prefix = request.query_params.get("q", "").strip()
+        if not prefix:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        stats = (
+            HashtagStat.objects.filter(tag__name__istartswith=prefix, images_count__gt=0)
+            .select_related("tag")
+            .order_by("-images_count", "tag_id")[: self.limit]
+        )
+        serializer = HashtagSerializer(stats, many=True)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+
+class TrendingHashtags(APIView):
+    """ the hashtags of the last trending rollup, hottest first """
+    limit = 20
+
+    def get(self, request, format=None):
+        tags = TrendingTag.objects.select_related("tag").order_by("-score", "tag_id")[: self.limit]
+        serializer = TrendingTagSerializer(tags, many=True)
+        return Response(data=serializer.data, status=status.HTTP_200_OK)
 
 
 class ImageDetail(APIView):
@@ -344,13 +720,9 @@ class ImageDetail(APIView):
             return None
 
     def get(self, request, image_id, format=None):
-        try:
-            image = Image.objects.get(id=image_id)
-        except Image.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-
-        serializer = ImageSerializer(image, context={"request": request})
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return cache.cached_response(
+            request, ImageSerializer, [image_id], Image.objects.for_listing(), many=False
+        )
 
     def put(self, request, image_id, format=None):
         user = request.user.profile
@@ -376,15 +748,19 @@ class ImageDetail(APIView):
 
 
 class FeedView(ModelViewSet):
+    """ the home feed, newest first, paginated over the timeline (core.images.feed) """
     serializer_class = ImageSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-image_id')
     queryset = Image.objects.all()
     http_method_names = ['get']
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-        profile = self.request.user.profile
-        following_users_id = profile.following.values_list('id', flat=True)
-        my_images = profile.images.all()
-        return qs.filter(creator__id__in=[following_users_id]).order_by('-created_at') | my_images
+    def list(self, request, *args, **kwargs):
+        entries = self.paginator.paginate_querysets(
+            feed.home_feed(request.user.profile), request, view=self
+        )
+        images = Image.objects.for_listing().in_bulk([entry.image_id for entry in entries])
+        page = [images[entry.image_id] for entry in entries if entry.image_id in images]
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
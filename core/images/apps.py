@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ImagesConfig(AppConfig):
     name = 'core.images'
+
+    def ready(self):
+        from core.images import signals  # noqa: F401
@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from core.accounts.models import Follow, Profile
+from core.images.models import Image, TimelineEntry
+
+FANOUT_BATCH_SIZE = 1000
+
+# Django 2.1 has no bulk_create(ignore_conflicts=True), an entry may already
+# be there when the profile followed the creator while the image was processed
+INSERT_ENTRIES_SQL = """
+INSERT INTO {timeline} (profile_id, image_id, created_at)
+SELECT unnest(%(profile_ids)s::integer[]), unnest(%(image_ids)s::integer[]),
+       unnest(%(created_at)s::timestamptz[])
+ON CONFLICT (profile_id, image_id) DO NOTHING
+"""
+
+
+def _insert_entries(entries):
+    """ Add (profile_id, image) entries to timelines, skipping the ones already there """
+    if not entries:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            INSERT_ENTRIES_SQL.format(
+                timeline=connection.ops.quote_name(TimelineEntry._meta.db_table)
+            ),
+            {
+                "profile_ids": [profile_id for profile_id, image in entries],
+                "image_ids": [image.id for profile_id, image in entries],
+                "created_at": [image.created_at for profile_id, image in entries],
+            },
+        )
+
+
+def _entries_for(image, profile_ids):
+    return [(profile_id, image) for profile_id in profile_ids]
+
+
+def fan_out(image):
+    """
+    Write a new image into the creator's feed and the feeds of everyone following them.
+    Creators with more followers than FEED_FANOUT_MAX_FOLLOWERS are switched to
+    fan-out-on-read instead, so a single post never turns into millions of inserts.
+    """
+    creator = image.creator
+    if creator is None:
+        return
+
+    _insert_entries(_entries_for(image, [creator.id]))
+
+    if not creator.fanout_on_read:
+        if creator.followers_count > settings.FEED_FANOUT_MAX_FOLLOWERS:
+            Profile.objects.filter(id=creator.id).update(fanout_on_read=True)
+            creator.fanout_on_read = True
+
+    if creator.fanout_on_read:
+        return
+
+    follower_ids = (
+        Follow.objects.filter(followee=creator)
+        .values_list("follower_id", flat=True)
+        .order_by("follower_id")
+    )
+    batch = []
+    for follower_id in follower_ids.iterator():
+        batch.append(follower_id)
+        if len(batch) == FANOUT_BATCH_SIZE:
+            _insert_entries(_entries_for(image, batch))
+            batch = []
+    if batch:
+        _insert_entries(_entries_for(image, batch))
+
+
+def _backfill(profile, creator):
+    existing = TimelineEntry.objects.filter(profile=profile, image__creator=creator)
+    images = (
+        Image.objects.ready()
+        .filter(creator=creator)
+        .exclude(id__in=existing.values("image_id"))
+        .order_by("-created_at")
+        .only("id", "created_at")[: settings.FEED_BACKFILL_SIZE]
+    )
+    _insert_entries([(profile.id, image) for image in images])
+
+
+def follow(profile, followed):
+    """ Backfill the most recent images of a newly followed profile into the follower's feed """
+    if not followed.fanout_on_read:
+        _backfill(profile, followed)
+
+
+def unfollow(profile, unfollowed):
+    """ Trim an unfollowed profile's images out of the follower's feed """
+    TimelineEntry.objects.filter(profile=profile, image__creator=unfollowed).delete()
+
+
+def follow_many(profile, followed_profiles):
+    for followed in followed_profiles:
+        follow(profile, followed)
+
+
+def unfollow_many(profile, unfollowed_ids):
+    TimelineEntry.objects.filter(profile=profile, image__creator__in=unfollowed_ids).delete()
+
+
+def rebuild(profile):
+    """ Recompute a profile's feed from scratch, used to seed the timeline table """
+    TimelineEntry.objects.filter(profile=profile).delete()
+    _backfill(profile, profile)
+    for followed in profile.following.filter(fanout_on_read=False):
+        _backfill(profile, followed)
+
+
+def home_feed(profile):
+    """
+    Querysets of the ready entries of the profile's home feed, each row has the
+    created_at and image_id of an image, to be paginated as one sequence over
+    (-created_at, -image_id). The precomputed timeline, plus the images of
+    followed profiles that are served with fan-out-on-read.
+    """
+    # backfills used to add images that were still being processed
+    timeline = TimelineEntry.objects.filter(
+        profile=profile, image__processing_status=Image.READY
+    ).only("created_at", "image_id")
+    pulled_creators = profile.following.filter(fanout_on_read=True).values("id")
+    if not pulled_creators.exists():
+        return [timeline]
+
+    pulled = (
+        Image.objects.ready()
+        .filter(creator__in=pulled_creators)
+        .annotate(image_id=F("id"))
+        .only("created_at")
+    )
+    return [timeline, pulled]
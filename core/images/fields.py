@@ -0,0 +1,59 @@
+import os
+
+from django.core.files.images import get_image_dimensions
+from imagekit.models import ProcessedImageField
+from imagekit.models.fields.files import ProcessedImageFieldFile
+from imagekit.utils import generate, suggest_extension
+
+
+class MeasuredImageFieldFile(ProcessedImageFieldFile):
+    def save(self, name, content, save=True):
+        filename, ext = os.path.splitext(name)
+        spec = self.field.get_spec(source=content)
+        ext = suggest_extension(name, spec.format)
+        new_name = '%s%s' % (filename, ext)
+        content = generate(spec)
+        self.field.update_metadata_fields(self.instance, content, spec.format)
+        # the content is already processed, skip ProcessedImageFieldFile.save
+        return super(ProcessedImageFieldFile, self).save(new_name, content, save)
+
+
+class MeasuredImageField(ProcessedImageField):
+    """
+    ProcessedImageField that records the *processed* image's width, height,
+    byte size and format on the model while saving it, so they can be read
+    later without opening the file from storage.
+
+    Django's own width_field/height_field are not used on purpose: they are
+    measured before processing (before Transpose swaps the sides of rotated
+    photos) and re-read the file from storage on load when they are empty.
+    """
+    attr_class = MeasuredImageFieldFile
+
+    def __init__(self, *args, processed_width_field=None, processed_height_field=None,
+                 size_field=None, format_field=None, **kwargs):
+        self.processed_width_field = processed_width_field
+        self.processed_height_field = processed_height_field
+        self.size_field = size_field
+        self.format_field = format_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        for option in ('processed_width_field', 'processed_height_field', 'size_field',
+                       'format_field'):
+            if getattr(self, option):
+                kwargs[option] = getattr(self, option)
+        return name, path, args, kwargs
+
+    def update_metadata_fields(self, instance, content, file_format):
+        width, height = get_image_dimensions(content)
+        values = {
+            self.processed_width_field: width,
+            self.processed_height_field: height,
+            self.size_field: content.size,
+            self.format_field: file_format or '',
+        }
+        for field_name, value in values.items():
+            if field_name:
+                setattr(instance, field_name, value)
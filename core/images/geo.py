@@ -0,0 +1,81 @@
+import math
+
+from django.conf import settings
+from django.contrib.gis.geos import Point, Polygon
+from django.db.models import FloatField, Func, Value
+
+SRID = 4326
+METERS_PER_DEGREE = 111320
+EARTH_RADIUS = 6370986
+
+
+def make_point(latitude, longitude):
+    return Point(longitude, latitude, srid=SRID)
+
+
+def bounding_box(latitude, longitude, radius):
+    """ Lon/lat rectangle enclosing the circle of `radius` meters around the point """
+    lat_delta = radius / METERS_PER_DEGREE
+    # the width of a degree of longitude shrinks towards the poles
+    lng_delta = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    box = Polygon.from_bbox(
+        (longitude - lng_delta, latitude - lat_delta, longitude + lng_delta, latitude + lat_delta)
+    )
+    box.srid = SRID
+    return box
+
+
+class KNNDistance(Func):
+    """
+    PostGIS `<->` operator. Ordering by it walks the GiST index on the column
+    nearest first instead of computing and sorting every distance.
+    """
+    arg_joiner = " <-> "
+    template = "(%(expressions)s)"
+
+    def __init__(self, expression, point, **extra):
+        origin = Func(
+            Func(Value(point.x), Value(point.y), function="ST_MakePoint"),
+            Value(point.srid),
+            function="ST_SetSRID",
+        )
+        super().__init__(expression, origin, output_field=FloatField(), **extra)
+
+
+def distance(latitude, longitude, other_latitude, other_longitude):
+    """ Great-circle distance in meters, on the sphere ST_DistanceSphere uses """
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+    other_latitude, other_longitude = math.radians(other_latitude), math.radians(other_longitude)
+    a = (
+        math.sin((other_latitude - latitude) / 2) ** 2
+        + math.cos(latitude) * math.cos(other_latitude)
+        * math.sin((other_longitude - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def tile_of(latitude, longitude):
+    """ The NEARBY_TILE_SIZE degrees grid cell containing the point, as (row, column) """
+    size = settings.NEARBY_TILE_SIZE
+    return math.floor(latitude / size), math.floor(longitude / size)
+
+
+def tile_center(tile):
+    size = settings.NEARBY_TILE_SIZE
+    row, column = tile
+    return (row + 0.5) * size, (column + 0.5) * size
+
+
+def tiles_around(latitude, longitude, radius):
+    """ Every tile whose center may lie within `radius` meters of the point """
+    size = settings.NEARBY_TILE_SIZE
+    row, column = tile_of(latitude, longitude)
+    lat_delta = radius / METERS_PER_DEGREE
+    lng_delta = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    rows = math.ceil(lat_delta / size) + 1
+    columns = math.ceil(lng_delta / size) + 1
+    return [
+        (row + row_offset, column + column_offset)
+        for row_offset in range(-rows, rows + 1)
+        for column_offset in range(-columns, columns + 1)
+    ]
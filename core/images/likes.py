@@ -0,0 +1,65 @@
+"""
+Like and unlike in one statement each.
+
+The Like row and Image.likes_count change together in a single INSERT ... ON
+CONFLICT DO NOTHING or DELETE ... RETURNING statement, so a double tap can
+neither create a second like nor count one twice, and a batch of images
+costs the same round trip as one. These paths bypass the Like signals, the
+counter and hot_score updates are part of the statement instead.
+"""
+from django.db import connection
+
+from core.images.models import Image, Like
+from core.images.ranking import HOT_SCORE_SQL
+
+LIKE_SQL = """
+WITH liked AS (
+    INSERT INTO {like} (creator_id, image_id, created_at, updated_at)
+    SELECT %(creator_id)s, id, now(), now() FROM {image} WHERE id = ANY(%(image_ids)s)
+    ON CONFLICT (creator_id, image_id) DO NOTHING
+    RETURNING image_id
+)
+UPDATE {image} SET likes_count = likes_count + 1, hot_score = {liked_hot_score}
+FROM liked WHERE {image}.id = liked.image_id
+RETURNING {image}.id, {image}.creator_id
+"""
+
+UNLIKE_SQL = """
+WITH unliked AS (
+    DELETE FROM {like} WHERE creator_id = %(creator_id)s AND image_id = ANY(%(image_ids)s)
+    RETURNING image_id
+)
+UPDATE {image} SET likes_count = likes_count - 1, hot_score = {unliked_hot_score}
+FROM unliked WHERE {image}.id = unliked.image_id
+RETURNING {image}.id
+"""
+
+
+def _execute(sql, profile, image_ids):
+    sql = sql.format(
+        like=connection.ops.quote_name(Like._meta.db_table),
+        image=connection.ops.quote_name(Image._meta.db_table),
+        liked_hot_score=HOT_SCORE_SQL.format(
+            likes_count="likes_count + 1", created_at="created_at"
+        ),
+        unliked_hot_score=HOT_SCORE_SQL.format(
+            likes_count="likes_count - 1", created_at="created_at"
+        ),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"creator_id": profile.id, "image_ids": sorted(set(image_ids))})
+        return cursor.fetchall()
+
+
+def like(profile, image_ids):
+    """ Like the images not liked yet, returns (image_id, image creator_id) of each new like """
+    if not image_ids:
+        return []
+    return _execute(LIKE_SQL, profile, image_ids)
+
+
+def unlike(profile, image_ids):
+    """ Remove the profile's likes of image_ids, returns the ids of the images actually unliked """
+    if not image_ids:
+        return []
+    return [image_id for image_id, in _execute(UNLIKE_SQL, profile, image_ids)]
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from PIL import Image as PILImage
+
+from core.images.models import Image
+
+
+def measure(image):
+    """ Read one stored file's dimensions, size and format; runs in a worker thread """
+    try:
+        with image.file.open("rb") as stored:
+            with PILImage.open(stored) as decoded:
+                width, height = decoded.size
+                file_format = decoded.format or ""
+        return image.id, dict(
+            width=width, height=height, file_size=image.file.size, file_format=file_format
+        )
+    except (IOError, OSError) as e:
+        return image.id, e
+
+
+class Command(BaseCommand):
+    help = "Record width, height, size and format of images stored before they were tracked"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="concurrent storage reads")
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        updated = failed = 0
+        last_id = 0
+        missing = Image.objects.filter(width__isnull=True).exclude(file="").order_by("id")
+
+        # storage reads happen in the pool, database writes stay on this thread
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            while True:
+                batch = list(
+                    missing.filter(id__gt=last_id).only("id", "file")[: options["batch_size"]]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                for image_id, result in pool.map(measure, batch):
+                    if isinstance(result, Exception):
+                        failed += 1
+                        self.stderr.write(f"Image {image_id}: {result}")
+                        continue
+                    Image.objects.filter(id=image_id).update(**result)
+                    updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} images, {failed} failed"))
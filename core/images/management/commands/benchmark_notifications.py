@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.accounts.models import Profile
+from core.images.models import Image, Notification
+from core.images.notifications import PendingNotification, write
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the statements a storm of likes costs written one by one and through "
+        "the notification buffer. Runs against existing profiles and images, nothing is kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--actions", type=int, default=1000)
+        parser.add_argument("--images", type=int, default=10, help="number of liked images")
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        images = list(Image.objects.order_by("-id")[: options["images"]])
+        actors = list(
+            Profile.objects.exclude(id__in=[image.creator_id for image in images]).values_list(
+                "id", flat=True
+            )[:500]
+        )
+        if not images or not actors:
+            raise CommandError("Needs at least one image and one profile that did not post it")
+
+        pending = [
+            PendingNotification(
+                actors[number % len(actors)],
+                images[number % len(images)].creator_id,
+                Notification.LIKE,
+                images[number % len(images)].id,
+                None,
+            )
+            for number in range(options["actions"])
+        ]
+        size = options["batch_size"]
+
+        def legacy():
+            # what every request did before: create() followed by save()
+            for item in pending:
+                notification = Notification.objects.create(
+                    creator_id=item.creator_id,
+                    to_id=item.to_id,
+                    notification_type=item.notification_type,
+                    image_id=item.image_id,
+                )
+                notification.save()
+
+        def unbuffered():
+            for item in pending:
+                write([item])
+
+        def buffered():
+            for start in range(0, len(pending), size):
+                write(pending[start:start + size])
+
+        for label, run in (
+            ("create() + save()", legacy),
+            ("grouped, one by one", unbuffered),
+            (f"grouped, batches of {size}", buffered),
+        ):
+            statements, writes, elapsed = self._measure(run)
+            self.stdout.write(
+                f"{label:<28} {statements:>7} statements {writes:>7} writes "
+                f"{writes / len(pending):>6.2f} writes/action {elapsed:>8.3f}s"
+            )
+
+    @staticmethod
+    def _measure(run):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.monotonic()
+                run()
+                elapsed = time.monotonic() - started
+            transaction.set_rollback(True)
+        statements = [
+            query["sql"].lstrip().split(None, 1)[0].upper() for query in queries.captured_queries
+        ]
+        statements = [verb for verb in statements if verb not in ("SAVEPOINT", "RELEASE")]
+        writes = sum(verb in ("INSERT", "UPDATE", "DELETE") for verb in statements)
+        return len(statements), writes, elapsed
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.accounts.models import Profile
+from core.images import feed
+
+
+class Command(BaseCommand):
+    help = "Rebuild the precomputed home feed of every profile (or the given usernames)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*")
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.order_by("id")
+        if options["usernames"]:
+            profiles = profiles.filter(owner__username__in=options["usernames"])
+
+        rebuilt = 0
+        for profile in profiles.iterator():
+            feed.rebuild(profile)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} feeds"))
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from core.accounts.models import Follow, Profile
+from core.images.models import Comment, Image, Like
+from core.images.ranking import HotScore
+
+
+def _count(queryset, field):
+    counts = queryset.values(field).annotate(total=Count("id")).values("total")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def image_counters():
+    likes_count = _count(Like.objects.filter(image=OuterRef("pk")), "image")
+    return {
+        "likes_count": likes_count,
+        "comments_count": _count(Comment.objects.filter(image=OuterRef("pk")), "image"),
+        "hot_score": HotScore(likes_count, F("created_at")),
+    }
+
+
+def profile_counters():
+    return {
+        "post_count": _count(Image.objects.filter(creator=OuterRef("pk")), "creator"),
+        "followers_count": _count(Follow.objects.filter(followee=OuterRef("pk")), "followee"),
+        "following_count": _count(Follow.objects.filter(follower=OuterRef("pk")), "follower"),
+    }
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized like/comment/post/follow counters where they drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        fixed_images = self.reconcile(Image, image_counters, batch_size)
+        fixed_profiles = self.reconcile(Profile, profile_counters, batch_size)
+        self.stdout.write(
+            self.style.SUCCESS(f"Fixed {fixed_images} images and {fixed_profiles} profiles")
+        )
+
+    @staticmethod
+    def reconcile(model, counters, batch_size):
+        """ Walk the table by primary key range and only rewrite the rows that drifted """
+        fixed = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not batch:
+                return fixed
+            last_pk = batch[-1]
+
+            with transaction.atomic():
+                expected, drifted = {}, Q()
+                for field, value in counters().items():
+                    expected[f"expected_{field}"] = value
+                    drifted |= ~Q(**{field: F(f"expected_{field}")})
+                drifted_pks = list(
+                    model.objects.filter(pk__in=batch)
+                    .annotate(**expected)
+                    .filter(drifted)
+                    .values_list("pk", flat=True)
+                )
+                if drifted_pks:
+                    model.objects.filter(pk__in=drifted_pks).update(**counters())
+            fixed += len(drifted_pks)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core.images import trending
+from core.images.tasks import schedule_trending_rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the trending images and tags, or start the periodic rollup task"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="queue the images.rollup_trending task, which reschedules itself every "
+            "TRENDING_INTERVAL seconds, instead of running once (e.g. from cron)",
+        )
+
+    def handle(self, *args, **options):
+        if options["schedule"]:
+            # the task is left to the worker process, this one exits right away
+            if schedule_trending_rollup(wake=False) is None:
+                self.stdout.write("A trending rollup is already scheduled")
+            else:
+                self.stdout.write(self.style.SUCCESS("Scheduled the trending rollup"))
+            return
+
+        images, tags = trending.rollup()
+        self.stdout.write(self.style.SUCCESS(f"{images} trending images, {tags} trending tags"))
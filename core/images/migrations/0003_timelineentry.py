@@ -0,0 +1,32 @@
+# Generated by Django 2.1.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_profile_fanout_on_read'),
+        ('images', '0002_auto_20181009_1928'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='images.Image')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='accounts.Profile')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelineentry',
+            unique_together={('profile', 'image')},
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['profile', '-created_at'], name='timeline_profile_created_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 2.1.2 on 2026-10-18 10:03
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field):
+    counts = queryset.values(field).annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def populate_counters(apps, schema_editor):
+    Image = apps.get_model('images', 'Image')
+    Like = apps.get_model('images', 'Like')
+    Comment = apps.get_model('images', 'Comment')
+    Profile = apps.get_model('accounts', 'Profile')
+    Following = Profile.following.through
+
+    Image.objects.update(
+        likes_count=_count(Like.objects.filter(image=OuterRef('pk')), 'image'),
+        comments_count=_count(Comment.objects.filter(image=OuterRef('pk')), 'image'),
+    )
+    Profile.objects.update(
+        post_count=_count(Image.objects.filter(creator=OuterRef('pk')), 'creator'),
+        followers_count=_count(Following.objects.filter(to_profile=OuterRef('pk')), 'to_profile'),
+        following_count=_count(
+            Following.objects.filter(from_profile=OuterRef('pk')), 'from_profile'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_profile_counters'),
+        ('images', '0003_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='image',
+            options={},
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='likes_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['likes_count', 'id'], name='image_likes_count_idx'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
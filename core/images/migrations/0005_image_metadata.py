@@ -0,0 +1,40 @@
+# Generated by Django 2.1.2 on 2026-10-18 11:20
+
+import core.images.fields
+import core.images.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='file_format',
+            field=models.CharField(blank=True, editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='file_size',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='height',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='width',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='file',
+            field=core.images.fields.MeasuredImageField(format_field='file_format', processed_height_field='height', processed_width_field='width', size_field='file_size', upload_to=core.images.models.post_image_path),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.1.2 on 2026-10-18 12:40
+
+import core.images.fields
+import core.images.models
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0005_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='original',
+            field=models.FileField(blank=True, null=True, upload_to=core.images.models.original_image_path),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='processing_status',
+            field=models.CharField(choices=[('P', 'Pending'), ('R', 'Ready')], default='R', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='renditions',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='file',
+            field=core.images.fields.MeasuredImageField(blank=True, format_field='file_format', processed_height_field='height', processed_width_field='width', size_field='file_size', upload_to=core.images.models.post_image_path),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.1.2 on 2026-10-18 13:30
+
+from django.contrib.gis.geos import Point
+from django.db import migrations
+
+
+def copy_coordinates_to_point(apps, schema_editor):
+    """ keep the location of rows whose point was never set before dropping the text columns """
+    Image = apps.get_model('images', 'Image')
+    missing = Image.objects.filter(point__isnull=True, latitude__isnull=False, longitude__isnull=False)
+    for image in missing.only('id', 'latitude', 'longitude').iterator():
+        try:
+            point = Point(float(image.longitude), float(image.latitude), srid=4326)
+        except ValueError:
+            continue
+        Image.objects.filter(id=image.id).update(point=point)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0006_image_processing'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_coordinates_to_point, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='image',
+            name='latitude',
+        ),
+        migrations.RemoveField(
+            model_name='image',
+            name='longitude',
+        ),
+    ]
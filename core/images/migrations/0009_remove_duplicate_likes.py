@@ -0,0 +1,26 @@
+# Generated by Django 2.1.2 on 2026-10-18 15:10
+
+from django.db import migrations
+
+REMOVE_DUPLICATES = """
+DELETE FROM images_like duplicate USING images_like kept
+WHERE duplicate.creator_id = kept.creator_id
+  AND duplicate.image_id = kept.image_id
+  AND duplicate.id > kept.id;
+
+UPDATE images_image SET likes_count = counted.total
+FROM (SELECT image_id, count(*) AS total FROM images_like GROUP BY image_id) counted
+WHERE images_image.id = counted.image_id AND images_image.likes_count <> counted.total;
+"""
+
+
+class Migration(migrations.Migration):
+    """ keep the oldest like of every (creator, image) before it becomes unique """
+
+    dependencies = [
+        ('images', '0008_notification_grouping'),
+    ]
+
+    operations = [
+        migrations.RunSQL(REMOVE_DUPLICATES, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.1.2 on 2026-10-18 15:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0009_remove_duplicate_likes'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='like',
+            unique_together={('creator', 'image')},
+        ),
+    ]
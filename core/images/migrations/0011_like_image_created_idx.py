@@ -0,0 +1,17 @@
+# Generated by Django 2.1.2 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0010_like_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['image', '-created_at'], name='like_image_created_idx'),
+        ),
+    ]
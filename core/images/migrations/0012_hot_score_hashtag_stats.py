@@ -0,0 +1,54 @@
+# Generated by Django 2.1.2 on 2026-10-18 17:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+POPULATE = """
+UPDATE images_image
+SET hot_score = log(greatest(likes_count, 1)) + extract(epoch from created_at) / 45000;
+
+INSERT INTO images_hashtagstat (tag_id, images_count)
+SELECT tagged.tag_id, count(*)
+FROM taggit_taggeditem tagged
+JOIN django_content_type content_type ON content_type.id = tagged.content_type_id
+WHERE content_type.app_label = 'images' AND content_type.model = 'image'
+GROUP BY tagged.tag_id;
+"""
+
+# hashtag autocomplete, matches what istartswith generates
+CREATE_TAG_INDEX = """
+CREATE INDEX IF NOT EXISTS taggit_tag_name_upper_like
+    ON taggit_tag (UPPER("name"::text) text_pattern_ops);
+"""
+
+DROP_TAG_INDEX = "DROP INDEX IF EXISTS taggit_tag_name_upper_like;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0002_auto_20150616_2121'),
+        ('images', '0011_like_image_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['-hot_score', '-id'], name='image_hot_score_idx'),
+        ),
+        migrations.CreateModel(
+            name='HashtagStat',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stat', serialize=False, to='taggit.Tag')),
+                ('images_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(POPULATE, migrations.RunSQL.noop),
+        migrations.RunSQL(CREATE_TAG_INDEX, DROP_TAG_INDEX),
+    ]
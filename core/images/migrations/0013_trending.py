@@ -0,0 +1,45 @@
+# Generated by Django 2.1.2 on 2026-10-18 18:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taggit', '0002_auto_20150616_2121'),
+        ('images', '0012_hot_score_hashtag_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingImage',
+            fields=[
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='images.Image')),
+                ('score', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingTag',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='taggit.Tag')),
+                ('score', models.FloatField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='trendingimage',
+            index=models.Index(fields=['-score', '-image'], name='trending_image_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendingtag',
+            index=models.Index(fields=['-score'], name='trending_tag_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created_at'], name='comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['created_at'], name='like_created_idx'),
+        ),
+    ]
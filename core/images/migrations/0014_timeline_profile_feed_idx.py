@@ -0,0 +1,21 @@
+# Generated by Django 2.1.2 on 2026-10-18 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0013_trending'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='timeline_profile_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['profile', '-created_at', '-image'], name='timeline_profile_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.1.2 on 2026-10-18 22:30
+
+from django.db import migrations
+
+# images without an original store an empty name, only real uploads must be unique
+CREATE_INDEX = """
+UPDATE images_image duplicate SET original = ''
+FROM images_image kept
+WHERE duplicate.original = kept.original
+  AND duplicate.original <> ''
+  AND duplicate.id > kept.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS image_original_uniq
+    ON images_image (original) WHERE original <> '';
+"""
+
+DROP_INDEX = "DROP INDEX IF EXISTS image_original_uniq;"
+
+
+class Migration(migrations.Migration):
+    """ one Image per upload, the later copies of an upload finalized twice lose their original """
+
+    dependencies = [
+        ('images', '0014_timeline_profile_feed_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEX, DROP_INDEX),
+    ]
@@ -1,25 +1,78 @@
 import os
 import uuid
 
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models
-from django.contrib.gis.db.models.functions import Distance
-from django.contrib.gis.geos import Point
+from django.contrib.postgres.fields import JSONField
 from django.contrib.gis.measure import D
+from django.db.models import OuterRef, Prefetch, Subquery
 from taggit.managers import TaggableManager
+from taggit.models import Tag, TaggedItem
 from django.contrib.humanize.templatetags.humanize import naturaltime
-from imagekit.models import ProcessedImageField
 from imagekit.processors import Transpose
 
 # Create your models here.
 from core.abstract_models import TimeStampedModel
 from core.accounts.models import Profile
+from core.images.fields import MeasuredImageField
+from core.images.geo import KNNDistance, bounding_box, make_point
 
 
 class ImageQuerySet(models.QuerySet):
-    def within(self, lat, long):
-        ref_location = Point(float(lat), float(long))
-        return self.filter(point__distance_gte=(ref_location, D(m=2000))).annotate(
-            distance=Distance("point", ref_location))
+    def nearby(self, latitude, longitude, radius):
+        """
+        Images within `radius` meters of the point, annotated with `knn` to be
+        ordered nearest first. The bounding box test (`&&`) and the `<->`
+        ordering both run on the GiST index on `point`, the exact spherical
+        distance is only checked for the rows inside the box.
+        """
+        origin = make_point(latitude, longitude)
+        return self.filter(
+            point__bboverlaps=bounding_box(latitude, longitude, radius),
+            point__distance_lte=(origin, D(m=radius)),
+        ).annotate(knn=KNNDistance("point", origin))
+
+    def ready(self):
+        """ Images whose upload has been processed """
+        return self.filter(processing_status=Image.READY)
+
+    def tagged(self, names, match_all=False):
+        """
+        Images tagged with any of `names`, or all of them with match_all. Each tag
+        is a semi-join on taggit's tagged item rows, never a DISTINCT over the join.
+        """
+        tagged_images = TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Image)
+        )
+        if not match_all:
+            return self.filter(
+                id__in=tagged_images.filter(tag__name__in=names).values("object_id")
+            )
+        queryset = self
+        for name in set(names):
+            queryset = queryset.filter(
+                id__in=tagged_images.filter(tag__name=name).values("object_id")
+            )
+        return queryset
+
+    def for_listing(self):
+        """
+        Load everything ImageSerializer renders in a fixed number of queries:
+        creators with their users, the most recent comments with their
+        creators (at most IMAGE_INLINE_COMMENTS per image) and tags.
+        """
+        recent_comment_ids = Comment.objects.filter(image=OuterRef("image")).order_by(
+            "-created_at", "-id"
+        ).values("id")[: settings.IMAGE_INLINE_COMMENTS]
+        recent_comments = (
+            Comment.objects.filter(id__in=Subquery(recent_comment_ids))
+            .select_related("creator__owner")
+            .order_by("-created_at", "-id")
+        )
+        return self.select_related("creator__owner").prefetch_related(
+            Prefetch("comments", queryset=recent_comments, to_attr="recent_comments"), "tags"
+        )
 
 
 def post_image_path(instance, filename):
@@ -28,37 +81,93 @@ def post_image_path(instance, filename):
     return 'images/{0}/{1}'.format(instance.creator.username, name)
 
 
+def original_image_path(instance, filename):
+    name, ext = os.path.splitext(filename)
+    name = f'{uuid.uuid4()}{ext}'
+    return 'originals/{0}/{1}'.format(instance.creator.username, name)
+
+
 class Image(TimeStampedModel):
     """ Image Model """
-    file = ProcessedImageField(
+    PENDING = "P"
+    READY = "R"
+
+    PROCESSING_CHOICES = ((PENDING, "Pending"), (READY, "Ready"))
+
+    # the upload as received, processed in the background by core.images.tasks,
+    # unique when set (partial index image_original_uniq, see migration 0015)
+    original = models.FileField(upload_to=original_image_path, null=True, blank=True)
+    processing_status = models.CharField(
+        max_length=1, choices=PROCESSING_CHOICES, default=READY
+    )
+    file = MeasuredImageField(
         processors=[Transpose()], format="JPEG", options={"quality": 50},
-        upload_to=post_image_path
+        upload_to=post_image_path, blank=True, processed_width_field="width",
+        processed_height_field="height", size_field="file_size", format_field="file_format"
     )
+    # stored names of the resized copies, see core.images.renditions
+    renditions = JSONField(default=dict, blank=True)
+    # filled in by MeasuredImageField when the processed file is saved
+    width = models.PositiveIntegerField(null=True, editable=False)
+    height = models.PositiveIntegerField(null=True, editable=False)
+    file_size = models.PositiveIntegerField(null=True, editable=False)
+    file_format = models.CharField(max_length=10, blank=True, editable=False)
     restaurant = models.TextField()
     dish = models.TextField()
     creator = models.ForeignKey(Profile, on_delete=models.CASCADE, null=True, related_name="images")
     tags = TaggableManager()
-    latitude = models.CharField(max_length=80, null=True)
-    longitude = models.CharField(max_length=80, null=True)
     point = models.PointField(null=True, blank=True)
+    # denormalized counters, kept up to date by core.images.signals
+    likes_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+    # recency and likes in one sortable value, see core.images.ranking
+    hot_score = models.FloatField(default=0)
 
     objects = ImageQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["likes_count", "id"], name="image_likes_count_idx"),
+            models.Index(fields=["-hot_score", "-id"], name="image_hot_score_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # where the image was before a move, see core.images.signals.image_saved
+        instance._loaded_point = instance.__dict__.get("point")
+        return instance
+
     @property
-    def likes_count(self):
-        return self.likes.count()
+    def latitude(self):
+        return self.point.y if self.point else None
 
     @property
-    def comments_count(self):
-        return self.comments.count()
+    def longitude(self):
+        return self.point.x if self.point else None
 
     @property
     def natural_time(self):
         return naturaltime(self.created_at)
 
+    def get_recent_comments(self):
+        """ The comments inlined in listings, served from for_listing()'s prefetch when present """
+        if not hasattr(self, "recent_comments"):
+            self.recent_comments = list(
+                self.comments.select_related("creator__owner").order_by("-created_at", "-id")[
+                    : settings.IMAGE_INLINE_COMMENTS
+                ]
+            )
+        return self.recent_comments
+
     @property
     def is_vertical(self):
-        return self.file.width < self.file.height
+        if self.width is None or self.height is None:
+            if not self.file:
+                return None  # still being processed
+            # stored before its dimensions were recorded, see backfill_image_metadata
+            return self.file.width < self.file.height
+        return self.width < self.height
 
     def __str__(self):
         return f"{self.restaurant} - {self.dish}"
@@ -73,6 +182,10 @@ class Comment(TimeStampedModel):
     )
     tags = TaggableManager()
 
+    class Meta:
+        # recent activity for core.images.trending
+        indexes = [models.Index(fields=["created_at"], name="comment_created_idx")]
+
     def __str__(self):
         return self.message
 
@@ -82,6 +195,16 @@ class Like(TimeStampedModel):
     creator = models.ForeignKey(Profile, on_delete=models.PROTECT, null=True)
     image = models.ForeignKey(Image, on_delete=models.CASCADE, null=True, related_name="likes")
 
+    class Meta:
+        # core.images.likes relies on it for ON CONFLICT DO NOTHING
+        unique_together = ("creator", "image")
+        # likers of an image, most recent first
+        indexes = [
+            models.Index(fields=["image", "-created_at"], name="like_image_created_idx"),
+            # recent activity for core.images.trending
+            models.Index(fields=["created_at"], name="like_created_idx"),
+        ]
+
     def __str__(self):
         return "User: {} - Image Caption: {}".format(
             self.creator.owner.username, self.image.dish
@@ -104,6 +227,9 @@ class Notification(TimeStampedModel):
     notification_type = models.CharField(max_length=1, choices=TYPE_CHOICES)
     image = models.ForeignKey(Image, on_delete=models.CASCADE, null=True, blank=True)
     comment = models.TextField(null=True, blank=True)
+    # likes and follows are grouped while unread, see core.images.notifications,
+    # creator is then the latest actor and created_at the time of the latest action
+    actor_count = models.IntegerField(default=1)
 
     @property
     def natural_time(self):
@@ -111,6 +237,68 @@ class Notification(TimeStampedModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["to", "-created_at"], name="notification_to_created_idx")
+        ]
+
+    def __str__(self):
+        return "From: {} - To: {}".format(self.creator, self.to)
+
+
+class TimelineEntry(models.Model):
+    """ Precomputed home feed entry, one row per image per feed it was fanned out to """
+    profile = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    image = models.ForeignKey(Image, on_delete=models.CASCADE, related_name="timeline_entries")
+    # copied from the image so a feed page is a single index scan
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("profile", "image")
+        indexes = [
+            # a feed page, see core.images.feed.home_feed
+            models.Index(
+                fields=["profile", "-created_at", "-image"], name="timeline_profile_feed_idx"
+            )
+        ]
+
+    def __str__(self):
+        return "Feed: {} - Image: {}".format(self.profile, self.image_id)
+
+
+class HashtagStat(models.Model):
+    """ Number of images per tag, kept up to date by core.images.signals for autocomplete """
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name="stat")
+    images_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return "{}: {}".format(self.tag_id, self.images_count)
+
+
+class TrendingImage(models.Model):
+    """ Time-decayed engagement of recently active images, rebuilt by core.images.trending """
+    image = models.OneToOneField(
+        Image, on_delete=models.CASCADE, primary_key=True, related_name="trending"
+    )
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [models.Index(fields=["-score", "-image"], name="trending_image_score_idx")]
+
+    def __str__(self):
+        return "{}: {}".format(self.image_id, self.score)
+
+
+class TrendingTag(models.Model):
+    """ Time-decayed engagement of the images of a tag, rebuilt by core.images.trending """
+    tag = models.OneToOneField(
+        Tag, on_delete=models.CASCADE, primary_key=True, related_name="trending"
+    )
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [models.Index(fields=["-score"], name="trending_tag_score_idx")]
 
     def __str__(self):
-        return "From: {} - To: {}".format(self.creator, self.to)
\ No newline at end of file
+        return "{}: {}".format(self.tag_id, self.score)
@@ -0,0 +1,102 @@
+"""
+Tile cache for nearby browsing.
+
+Requests are snapped to a grid of NEARBY_TILE_SIZE degrees. The images
+within the radius bucket plus half the tile's diagonal of the tile's center,
+which includes every image within the radius of any point of the tile, are
+looked up once and their ids kept in the NEARBY_CACHE cache, nearest first.
+Each request then filters and orders those candidates by their exact
+distance from its own point, on a few hundred rows instead of a PostGIS
+search of the whole table. When a dense tile has more than NEARBY_CACHE_SIZE
+candidates, the list only covers the distance of its last one and requests
+reaching further are searched without the cache.
+
+Each tile has a version key. Creating, moving or deleting an image bumps
+the versions of the tiles around its old and new points, which orphans
+their cached lists.
+"""
+import math
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.images.geo import METERS_PER_DEGREE, distance, tile_center, tile_of, tiles_around
+from core.images.models import Image
+
+RADIUS_BUCKET = 500
+
+
+def is_cacheable(radius):
+    return radius <= settings.NEARBY_CACHE_MAX_RADIUS
+
+
+def _cache():
+    return caches[settings.NEARBY_CACHE]
+
+
+def _version_key(tile):
+    return "nearby:v:{}:{}".format(*tile)
+
+
+def _radius_bucket(radius):
+    return int(math.ceil(radius / RADIUS_BUCKET) * RADIUS_BUCKET)
+
+
+def _half_tile_diagonal():
+    """ in meters, at the equator where tiles are the widest """
+    return settings.NEARBY_TILE_SIZE * METERS_PER_DEGREE * math.sqrt(2) / 2
+
+
+def candidates(latitude, longitude, radius):
+    """
+    (ids, covered): the ready images around the tile of the point, nearest
+    to its center first, and the distance from the center up to which the
+    list is complete.
+    """
+    cache = _cache()
+    tile = tile_of(latitude, longitude)
+    radius = _radius_bucket(radius)
+    version = cache.get(_version_key(tile), "0")
+    key = "nearby:candidates:{}:{}:{}:{}".format(tile[0], tile[1], radius, version)
+
+    cached = cache.get(key)
+    if cached is None:
+        center_latitude, center_longitude = tile_center(tile)
+        covered = radius + _half_tile_diagonal()
+        rows = list(
+            Image.objects.ready()
+            .nearby(center_latitude, center_longitude, covered)
+            .order_by("knn", "id")
+            .values_list("id", "point")[: settings.NEARBY_CACHE_SIZE]
+        )
+        if len(rows) == settings.NEARBY_CACHE_SIZE:
+            last_point = rows[-1][1]
+            covered = distance(center_latitude, center_longitude, last_point.y, last_point.x)
+        cached = ([image_id for image_id, point in rows], covered)
+        cache.set(key, cached, settings.NEARBY_CACHE_TIMEOUT)
+    return cached
+
+
+def nearby_from_cache(queryset, latitude, longitude, radius):
+    """
+    `queryset.nearby(...)` restricted to the cached candidates of the tile,
+    None when they don't cover the whole circle
+    """
+    ids, covered = candidates(latitude, longitude, radius)
+    center_latitude, center_longitude = tile_center(tile_of(latitude, longitude))
+    if distance(latitude, longitude, center_latitude, center_longitude) + radius > covered:
+        return None
+    if not ids:
+        return queryset.none()
+    return queryset.filter(id__in=ids).nearby(latitude, longitude, radius)
+
+
+def invalidate(point):
+    """ Drop the cached candidates of every tile that could contain an image at `point` """
+    radius = _radius_bucket(settings.NEARBY_CACHE_MAX_RADIUS) + _half_tile_diagonal()
+    tiles = tiles_around(point.y, point.x, radius)
+    version = uuid.uuid4().hex
+    _cache().set_many(
+        {_version_key(tile): version for tile in tiles}, settings.NEARBY_CACHE_TIMEOUT
+    )
@@ -0,0 +1,227 @@
+"""
+Notification inbox writes.
+
+Likes on the same image and new followers are grouped at write time: while
+the recipient has not read it, an existing group is reused, its creator
+becomes the latest actor, actor_count goes up and it moves back to the top
+of the inbox ("A and 23 others liked your photo"). Comments always get
+their own row.
+
+Every new inbox row bumps Profile.unread_notifications_count, which is reset
+together with the Profile.notifications_read_at watermark when the inbox is
+read, so "anything new?" is a single column read.
+
+Request paths do not write notifications themselves. Once their transaction
+commits, `create_notification` hands them to this process's buffer, which
+stores them in batches when NOTIFICATION_BUFFER_SIZE are waiting or
+NOTIFICATION_BUFFER_INTERVAL seconds after the first one, whichever comes
+first. A batch costs a handful of statements however many actions it holds.
+The buffer is flushed at interpreter exit, a killed process loses at most
+the notifications of that last interval. A batch that fails is written
+again row by row, so only the rows that can't be stored are dropped.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, OrderedDict, namedtuple
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from core.accounts.models import Profile
+from core.images import stream
+from core.images.models import Notification
+
+logger = logging.getLogger(__name__)
+
+GROUPED_TYPES = (Notification.LIKE, Notification.FOLLOW)
+
+PendingNotification = namedtuple(
+    "PendingNotification", "creator_id to_id notification_type image_id comment"
+)
+
+
+def create_notification(creator, to, notification_type, image=None, comment=None):
+    """ Queue a notification, it is buffered once the current transaction commits """
+    if to is not None:
+        queue(
+            PendingNotification(
+                creator.id, to.id, notification_type, image.id if image else None, comment
+            )
+        )
+
+
+def queue(pending):
+    """ create_notification for callers that only have ids """
+    if pending.to_id is None or pending.creator_id == pending.to_id:
+        return
+    transaction.on_commit(lambda: local_buffer().add(pending))
+
+
+def _coalesce(pending):
+    """ Fold grouped notifications of the batch: key -> [latest creator_id, actions] """
+    groups = OrderedDict()
+    singles = []
+    for item in pending:
+        if item.notification_type not in GROUPED_TYPES:
+            singles.append(item)
+            continue
+        key = (item.to_id, item.notification_type, item.image_id)
+        if key in groups:
+            groups[key][0] = item.creator_id
+            groups[key][1] += 1
+        else:
+            groups[key] = [item.creator_id, 1]
+    return groups, singles
+
+
+def _unread_groups(groups):
+    """ Ids of the unread inbox rows the batch's groups fold into, by group key """
+    read_at = dict(
+        Profile.objects.filter(id__in={to_id for to_id, _, _ in groups}).values_list(
+            "id", "notifications_read_at"
+        )
+    )
+    conditions = []
+    for to_id, notification_type, image_id in groups:
+        condition = Q(to_id=to_id, notification_type=notification_type, image_id=image_id)
+        if read_at.get(to_id) is not None:
+            condition &= Q(created_at__gt=read_at[to_id])
+        conditions.append(condition)
+
+    existing = {}
+    rows = Notification.objects.filter(reduce(or_, conditions)).order_by("created_at")
+    for row in rows.values("id", "to_id", "notification_type", "image_id"):
+        existing[(row["to_id"], row["notification_type"], row["image_id"])] = row["id"]
+    return existing
+
+
+def write(pending):
+    """ Store a batch of PendingNotification """
+    groups, singles = _coalesce(pending)
+    now = timezone.now()
+
+    with transaction.atomic():
+        existing = _unread_groups(groups) if groups else {}
+        new_rows = []
+        for key, (creator_id, actions) in groups.items():
+            if key in existing:
+                Notification.objects.filter(id=existing[key]).update(
+                    creator_id=creator_id,
+                    actor_count=F("actor_count") + actions,
+                    created_at=now,
+                    updated_at=now,
+                )
+            else:
+                to_id, notification_type, image_id = key
+                new_rows.append(
+                    Notification(
+                        creator_id=creator_id,
+                        to_id=to_id,
+                        notification_type=notification_type,
+                        image_id=image_id,
+                        actor_count=actions,
+                    )
+                )
+        new_rows.extend(
+            Notification(
+                creator_id=item.creator_id,
+                to_id=item.to_id,
+                notification_type=item.notification_type,
+                image_id=item.image_id,
+                comment=item.comment,
+            )
+            for item in singles
+        )
+        stream.announce([to_id for to_id, _, _ in groups] + [item.to_id for item in singles])
+        if not new_rows:
+            return
+
+        Notification.objects.bulk_create(new_rows)
+        unread = Counter(row.to_id for row in new_rows)
+        Profile.objects.filter(id__in=unread).update(
+            unread_notifications_count=F("unread_notifications_count")
+            + Case(
+                *[When(id=to_id, then=Value(count)) for to_id, count in unread.items()],
+                output_field=IntegerField(),
+            )
+        )
+
+
+class NotificationBuffer:
+    """ Collects pending notifications and writes them in batches """
+
+    def __init__(self, size, interval):
+        self.size = size
+        self.interval = interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, item):
+        with self._lock:
+            self._pending.append(item)
+            full = len(self._pending) >= self.size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.interval, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """ Write everything pending on the calling thread, returns the number of notifications """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if pending:
+            try:
+                write(pending)
+            except Exception:
+                logger.exception("Failed to write a batch of %s notifications", len(pending))
+                # one bad row must not cost the whole batch, only it is dropped
+                for item in pending:
+                    try:
+                        write([item])
+                    except Exception:
+                        logger.exception("Dropped notification %s", item)
+        return len(pending)
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # the timer thread's own connection
+            connections.close_all()
+
+
+_local_buffer = None
+_local_buffer_lock = threading.Lock()
+
+
+def local_buffer():
+    """ The buffer of this process, created on first use (after any fork) """
+    global _local_buffer
+    with _local_buffer_lock:
+        if _local_buffer is None:
+            _local_buffer = NotificationBuffer(
+                settings.NOTIFICATION_BUFFER_SIZE, settings.NOTIFICATION_BUFFER_INTERVAL
+            )
+            atexit.register(_local_buffer.flush)
+    return _local_buffer
+
+
+def mark_read(profile):
+    """ Move the read watermark to now and reset the unread counter """
+    now = timezone.now()
+    Profile.objects.filter(id=profile.id).update(
+        notifications_read_at=now, unread_notifications_count=0
+    )
+    profile.notifications_read_at = now
+    profile.unread_notifications_count = 0
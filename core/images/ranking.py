@@ -0,0 +1,31 @@
+"""
+The "hot" score images are ranked by in hashtag search.
+
+    hot_score = log10(max(likes_count, 1)) + seconds since the epoch / HOT_SCORE_DECAY
+
+It only depends on the image's own row, so it is stored in Image.hot_score
+and indexed, and only has to be rewritten when likes_count changes. With a
+decay of 45000 seconds an image needs ten times the likes of one posted
+12.5 hours later to rank with it.
+"""
+from django.db.models import FloatField, Func
+
+HOT_SCORE_DECAY = 45000
+
+HOT_SCORE_SQL = "(log(greatest({likes_count}, 1)) + extract(epoch from {created_at}) / %d)" % (
+    HOT_SCORE_DECAY
+)
+
+
+class HotScore(Func):
+    """ HOT_SCORE_SQL as an expression, e.g. HotScore(F("likes_count") + 1, F("created_at")) """
+
+    def __init__(self, likes_count, created_at, **extra):
+        super().__init__(likes_count, created_at, output_field=FloatField(), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        likes_count, created_at = self.get_source_expressions()
+        likes_sql, likes_params = compiler.compile(likes_count)
+        created_sql, created_params = compiler.compile(created_at)
+        sql = HOT_SCORE_SQL.format(likes_count=likes_sql, created_at=created_sql)
+        return sql, [*likes_params, *created_params]
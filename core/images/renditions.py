@@ -0,0 +1,48 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from imagekit.processors import ResizeToFit, Transpose
+from PIL import Image as PILImage
+from pilkit.utils import save_image
+
+# output formats of every rendition: (key in Image.renditions, PIL format, save options)
+RENDITION_FORMATS = (
+    ("webp", "WEBP", {"quality": 75, "method": 4}),
+    ("jpeg", "JPEG", {"quality": 75, "optimize": True, "progressive": True}),
+)
+
+
+def rendition_path(image, name, extension):
+    return "renditions/{0}/{1}/{2}.{3}".format(image.creator.username, image.id, name, extension)
+
+
+def generate_renditions(image, data):
+    """
+    Decode the original once and store every size in IMAGE_RENDITIONS in every
+    RENDITION_FORMATS format. Returns the map saved in Image.renditions:
+    {"thumbnail": {"width": 320, "height": 240, "webp": <name>, "jpeg": <name>}, ...}
+    """
+    storage = image.file.storage
+    source = Transpose().process(PILImage.open(BytesIO(data)))
+    renditions = {}
+
+    for name, max_side in settings.IMAGE_RENDITIONS.items():
+        resized = ResizeToFit(max_side, max_side, upscale=False).process(source.copy())
+        rendition = {"width": resized.width, "height": resized.height}
+        for key, pil_format, options in RENDITION_FORMATS:
+            output = BytesIO()
+            save_image(resized, output, pil_format, options)
+            rendition[key] = storage.save(
+                rendition_path(image, name, key), ContentFile(output.getvalue())
+            )
+        renditions[name] = rendition
+
+    return renditions
+
+
+def delete_renditions(storage, renditions):
+    for rendition in renditions.values():
+        for key, _format, _options in RENDITION_FORMATS:
+            if rendition.get(key):
+                storage.delete(rendition[key])
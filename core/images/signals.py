@@ -0,0 +1,92 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from taggit.models import TaggedItem
+
+from core.accounts.models import Profile
+from core.images import nearby
+from core.images.models import Comment, HashtagStat, Image, Like
+from core.images.ranking import HotScore
+
+
+def _add_to_counter(model, pk, field, amount):
+    if pk is not None:
+        model.objects.filter(pk=pk).update(**{field: F(field) + amount})
+
+
+def _add_to_likes(image_id, amount):
+    """ likes_count and the hot_score derived from it """
+    if image_id is not None:
+        Image.objects.filter(pk=image_id).update(
+            likes_count=F("likes_count") + amount,
+            hot_score=HotScore(F("likes_count") + amount, F("created_at")),
+        )
+
+
+def _add_to_hashtag(tag_id, amount):
+    if not HashtagStat.objects.filter(tag_id=tag_id).update(
+        images_count=F("images_count") + amount
+    ):
+        HashtagStat.objects.get_or_create(tag_id=tag_id, defaults={"images_count": max(amount, 0)})
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        _add_to_likes(instance.image_id, 1)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    _add_to_likes(instance.image_id, -1)
+
+
+@receiver(post_save, sender=TaggedItem)
+def image_tagged(sender, instance, created, **kwargs):
+    if created and instance.content_type_id == ContentType.objects.get_for_model(Image).id:
+        _add_to_hashtag(instance.tag_id, 1)
+
+
+@receiver(post_delete, sender=TaggedItem)
+def image_untagged(sender, instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(Image).id:
+        _add_to_hashtag(instance.tag_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        _add_to_counter(Image, instance.image_id, "comments_count", 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    _add_to_counter(Image, instance.image_id, "comments_count", -1)
+
+
+@receiver(post_save, sender=Image)
+def image_created(sender, instance, created, **kwargs):
+    if created:
+        _add_to_counter(Profile, instance.creator_id, "post_count", 1)
+        Image.objects.filter(pk=instance.pk).update(
+            hot_score=HotScore(F("likes_count"), F("created_at"))
+        )
+
+
+@receiver(post_delete, sender=Image)
+def image_deleted(sender, instance, **kwargs):
+    _add_to_counter(Profile, instance.creator_id, "post_count", -1)
+    if instance.point is not None:
+        nearby.invalidate(instance.point)
+
+
+@receiver(post_save, sender=Image)
+def image_saved(sender, instance, **kwargs):
+    """ the nearby tiles around where the image is now, and around where it was when moved """
+    previous_point = getattr(instance, "_loaded_point", None)
+    if previous_point is not None and previous_point != instance.point:
+        nearby.invalidate(previous_point)
+    if instance.point is not None and instance.processing_status == Image.READY:
+        nearby.invalidate(instance.point)
+    instance._loaded_point = instance.point
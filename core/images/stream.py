@@ -0,0 +1,133 @@
+"""
+Wake-ups for the notification long-poll.
+
+Requests waiting in NotificationStream subscribe to their profile id on this
+process's hub. Whenever notifications are stored, the recipients are
+published on the hub of the process that stored them. With
+NOTIFICATION_STREAM_BACKEND = "postgres" they are sent with NOTIFY on the
+NOTIFICATION_STREAM_CHANNEL channel instead. Every process then runs one
+thread that LISTENs on it and republishes the ids on its own hub, so a like
+stored by any web or worker process wakes the waiting request wherever it is.
+
+Wake-ups are only hints: waiting requests still re-check the database every
+NOTIFICATION_STREAM_POLL seconds, so a lost message only delays delivery.
+"""
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import psycopg2
+from django.conf import settings
+from django.db import connection, connections, transaction
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+logger = logging.getLogger(__name__)
+
+# stay well below the 8000 bytes NOTIFY payload limit
+NOTIFY_CHUNK_SIZE = 500
+
+
+class NotificationHub:
+    """ In-process pub/sub keyed by recipient profile id """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = defaultdict(set)
+
+    @contextmanager
+    def subscribe(self, profile_id):
+        """ Yields an Event set when profile_id gets a notification, subscribe before checking """
+        event = threading.Event()
+        with self._lock:
+            self._waiters[profile_id].add(event)
+        try:
+            yield event
+        finally:
+            with self._lock:
+                self._waiters[profile_id].discard(event)
+                if not self._waiters[profile_id]:
+                    del self._waiters[profile_id]
+
+    def publish(self, profile_ids):
+        with self._lock:
+            events = [
+                event for profile_id in profile_ids for event in self._waiters.get(profile_id, ())
+            ]
+        for event in events:
+            event.set()
+
+
+class PostgresListener(threading.Thread):
+    """ LISTENs on its own connection and republishes every payload on the hub """
+
+    def __init__(self, hub, channel):
+        super().__init__(name="notification-listener", daemon=True)
+        self.hub = hub
+        self.channel = channel
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Notification listener failed, reconnecting")
+                time.sleep(5)
+
+    def _listen(self):
+        params = connections["default"].get_connection_params()
+        listener = psycopg2.connect(**params)
+        listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            with listener.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            while True:
+                if select.select([listener], [], [], 60) == ([], [], []):
+                    continue
+                listener.poll()
+                while listener.notifies:
+                    payload = listener.notifies.pop(0).payload
+                    self.hub.publish(int(profile_id) for profile_id in payload.split(","))
+        finally:
+            listener.close()
+
+
+def _postgres():
+    return settings.NOTIFICATION_STREAM_BACKEND == "postgres"
+
+
+def announce(profile_ids):
+    """
+    Tell waiting streams that profile_ids have new notifications. Call it inside
+    the transaction that stores them: NOTIFY is only delivered on commit.
+    """
+    profile_ids = sorted(set(profile_ids))
+    if not profile_ids:
+        return
+    if _postgres():
+        with connection.cursor() as cursor:
+            for start in range(0, len(profile_ids), NOTIFY_CHUNK_SIZE):
+                chunk = profile_ids[start:start + NOTIFY_CHUNK_SIZE]
+                cursor.execute(
+                    "SELECT pg_notify(%s, %s)",
+                    [settings.NOTIFICATION_STREAM_CHANNEL, ",".join(map(str, chunk))],
+                )
+    else:
+        transaction.on_commit(lambda: local_hub().publish(profile_ids))
+
+
+_local_hub = None
+_local_hub_lock = threading.Lock()
+
+
+def local_hub():
+    """ The hub of this process, its listener thread is started on first use """
+    global _local_hub
+    with _local_hub_lock:
+        if _local_hub is None:
+            _local_hub = NotificationHub()
+            if _postgres():
+                PostgresListener(_local_hub, settings.NOTIFICATION_STREAM_CHANNEL).start()
+    return _local_hub
@@ -0,0 +1,72 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from core.images import feed, trending
+from core.images.models import Image
+from core.images.renditions import delete_renditions, generate_renditions
+from core.tasks.models import Task
+from core.tasks.queue import task
+
+
+@task("images.process_image", max_attempts=5)
+def process_image(image_id):
+    """
+    Turn an uploaded original into the processed `file` (which also records its
+    dimensions) and the renditions. A new upload is published to feeds once ready,
+    a replaced file keeps serving the previous version until then.
+    """
+    try:
+        image = Image.objects.select_related("creator__owner").get(id=image_id)
+    except Image.DoesNotExist:
+        return
+    if not image.original:
+        return
+
+    with image.original.open("rb") as original:
+        data = original.read()
+
+    previous_renditions = image.renditions
+    is_new = image.processing_status == Image.PENDING
+
+    image.file.save(os.path.basename(image.original.name), ContentFile(data), save=False)
+    image.renditions = generate_renditions(image, data)
+    image.processing_status = Image.READY
+    with transaction.atomic():
+        image.save(
+            update_fields=[
+                "file", "width", "height", "file_size", "file_format", "renditions",
+                "processing_status", "updated_at",
+            ]
+        )
+        if is_new:
+            feed.fan_out(image)
+
+    if not is_new:
+        delete_renditions(image.file.storage, previous_renditions)
+
+
+@task("images.rollup_trending", max_attempts=1)
+def rollup_trending():
+    """ Rebuild the trending tables, then schedule the next rollup TRENDING_INTERVAL later """
+    try:
+        trending.rollup()
+    finally:
+        if not Task.objects.filter(name=rollup_trending.task_name, status=Task.PENDING).exists():
+            rollup_trending.delay(
+                run_after=timezone.now() + timedelta(seconds=settings.TRENDING_INTERVAL)
+            )
+
+
+def schedule_trending_rollup(delay=0, wake=True):
+    """ Start the periodic rollup unless a rollup is already waiting or running """
+    scheduled = Task.objects.filter(
+        name=rollup_trending.task_name, status__in=(Task.PENDING, Task.RUNNING)
+    )
+    if scheduled.exists():
+        return None
+    return rollup_trending.delay(run_after=timezone.now() + timedelta(seconds=delay), wake=wake)
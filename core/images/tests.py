@@ -1,3 +1,471 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.accounts.models import Follow, Profile
+from core.images import feed, likes, nearby, notifications, trending
+from core.images.geo import bounding_box, distance, make_point
+from core.images.models import (
+    Comment,
+    HashtagStat,
+    Image,
+    Like,
+    Notification,
+    TimelineEntry,
+    TrendingImage,
+    TrendingTag,
+)
+from core.images.notifications import NotificationBuffer, PendingNotification
+from core.images.tasks import rollup_trending, schedule_trending_rollup
+from core.tasks.models import Task
+
+
+def create_profile(username):
+    return Profile.create_profile(user=User.objects.create_user(username))
+
+
+def count_writes(run):
+    """ INSERT, UPDATE and DELETE statements issued by run() """
+    with CaptureQueriesContext(connection) as queries:
+        run()
+    verbs = [query["sql"].lstrip().split(None, 1)[0].upper() for query in queries.captured_queries]
+    return sum(verb in ("INSERT", "UPDATE", "DELETE") for verb in verbs)
+
+
+class NotificationWriteTests(TestCase):
+    def setUp(self):
+        self.author = create_profile("author")
+        self.fans = [create_profile(f"fan{number}") for number in range(20)]
+        self.image = Image.objects.create(creator=self.author, restaurant="Chez Test", dish="Soup")
+
+    def likes(self):
+        return [
+            PendingNotification(fan.id, self.author.id, Notification.LIKE, self.image.id, None)
+            for fan in self.fans
+        ]
+
+    def test_likes_are_grouped(self):
+        notifications.write(self.likes())
+
+        notification = Notification.objects.get(to=self.author)
+        self.assertEqual(notification.actor_count, len(self.fans))
+        self.assertEqual(notification.creator_id, self.fans[-1].id)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.unread_notifications_count, 1)
+
+    def test_batch_writes_a_constant_number_of_statements(self):
+        one_by_one = count_writes(lambda: [notifications.write([item]) for item in self.likes()])
+        Notification.objects.all().delete()
+        batched = count_writes(lambda: notifications.write(self.likes()))
+
+        # the group's insert and the recipient's unread counter
+        self.assertEqual(batched, 2)
+        self.assertGreaterEqual(one_by_one, len(self.fans))
+
+    def test_flush_only_drops_the_failing_rows(self):
+        buffer = NotificationBuffer(size=100, interval=60)
+        # too long for the column, the batch's insert fails
+        broken = PendingNotification(self.fans[0].id, self.author.id, "XX", None, None)
+        for item in self.likes() + [broken]:
+            buffer.add(item)
+
+        with self.assertLogs("core.images.notifications", "ERROR"):
+            self.assertEqual(buffer.flush(), len(self.fans) + 1)
+
+        notification = Notification.objects.get(to=self.author)
+        self.assertEqual(notification.actor_count, len(self.fans))
+
+
+class LikeTests(TestCase):
+    def setUp(self):
+        self.author = create_profile("author")
+        self.fan = create_profile("fan")
+        self.image = Image.objects.create(creator=self.author, restaurant="Chez Test", dish="Soup")
+
+    def assertLikes(self, count):
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.likes_count, count)
+        self.assertEqual(self.image.likes.count(), count)
+
+    def test_like(self):
+        liked = likes.like(self.fan, [self.image.id])
+
+        self.assertEqual(liked, [(self.image.id, self.author.id)])
+        self.assertLikes(1)
+
+    def test_like_twice_counts_once(self):
+        likes.like(self.fan, [self.image.id])
+
+        self.assertEqual(likes.like(self.fan, [self.image.id, self.image.id]), [])
+        self.assertLikes(1)
+
+    def test_like_skips_missing_images(self):
+        self.assertEqual(likes.like(self.fan, [self.image.id + 1]), [])
+
+    def test_unlike(self):
+        likes.like(self.fan, [self.image.id])
+
+        self.assertEqual(likes.unlike(self.fan, [self.image.id]), [self.image.id])
+        self.assertLikes(0)
+
+    def test_unlike_without_like(self):
+        self.assertEqual(likes.unlike(self.fan, [self.image.id]), [])
+        self.assertLikes(0)
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.author = create_profile("author")
+        self.reader = create_profile("reader")
+        Follow.objects.create(follower=self.reader, followee=self.author)
+        self.author.refresh_from_db()
+
+    def create_image(self, **fields):
+        return Image.objects.create(
+            creator=self.author, restaurant="Chez Test", dish="Soup", **fields
+        )
+
+    def feed_image_ids(self):
+        return sorted(
+            entry.image_id for queryset in feed.home_feed(self.reader) for entry in queryset
+        )
+
+    def test_fan_out(self):
+        image = self.create_image()
+
+        feed.fan_out(image)
+
+        self.assertEqual(self.feed_image_ids(), [image.id])
+        self.assertTrue(TimelineEntry.objects.filter(profile=self.author, image=image).exists())
+
+    def test_fan_out_keeps_existing_entries(self):
+        image = self.create_image()
+        TimelineEntry.objects.create(profile=self.reader, image=image, created_at=image.created_at)
+
+        feed.fan_out(image)
+
+        self.assertEqual(TimelineEntry.objects.filter(image=image).count(), 2)
+
+    def test_backfill_skips_images_being_processed(self):
+        Follow.objects.all().delete()
+        ready = self.create_image()
+        self.create_image(processing_status=Image.PENDING)
+
+        feed.follow(self.reader, self.author)
+
+        self.assertEqual(self.feed_image_ids(), [ready.id])
+
+    def test_fan_out_on_read_skips_images_being_processed(self):
+        Profile.objects.filter(id=self.author.id).update(fanout_on_read=True)
+        ready = self.create_image()
+        self.create_image(processing_status=Image.PENDING)
+
+        self.assertEqual(self.feed_image_ids(), [ready.id])
+
+
+class CounterTests(TestCase):
+    """ likes_count, comments_count and post_count kept by core.images.signals """
+
+    def setUp(self):
+        self.author = create_profile("author")
+        self.fans = [create_profile(f"fan{number}") for number in range(3)]
+        self.image = Image.objects.create(creator=self.author, restaurant="Chez Test", dish="Soup")
+
+    def assertCountersMatch(self):
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.post_count, Image.objects.filter(creator=self.author).count())
+        for image in Image.objects.all():
+            self.assertEqual(image.likes_count, image.likes.count())
+            self.assertEqual(image.comments_count, image.comments.count())
+
+    def test_post(self):
+        Image.objects.create(creator=self.author, restaurant="Chez Test", dish="Stew")
+        self.assertCountersMatch()
+        self.assertEqual(self.author.post_count, 2)
+
+    def test_likes_and_comments(self):
+        for fan in self.fans:
+            Like.objects.create(creator=fan, image=self.image)
+            Comment.objects.create(creator=fan, image=self.image, message="Yum")
+        self.assertCountersMatch()
+
+        Like.objects.filter(creator=self.fans[0]).delete()
+        Comment.objects.filter(creator=self.fans[1]).delete()
+        self.assertCountersMatch()
+        self.image.refresh_from_db()
+        self.assertEqual((self.image.likes_count, self.image.comments_count), (2, 2))
+
+    def test_raw_sql_likes_and_orm_deletes(self):
+        likes.like(self.fans[0], [self.image.id])
+        Like.objects.create(creator=self.fans[1], image=self.image)
+        Like.objects.filter(creator=self.fans[0]).delete()
+        likes.unlike(self.fans[1], [self.image.id])
+        self.assertCountersMatch()
+
+    def test_delete_image(self):
+        Like.objects.create(creator=self.fans[0], image=self.image)
+        Comment.objects.create(creator=self.fans[0], image=self.image, message="Yum")
+
+        self.image.delete()
+
+        self.assertCountersMatch()
+        self.assertEqual(self.author.post_count, 0)
+
+    def test_reconcile_counters_repairs_drift(self):
+        Follow.objects.create(follower=self.fans[0], followee=self.author)
+        Like.objects.create(creator=self.fans[0], image=self.image)
+        Comment.objects.create(creator=self.fans[0], image=self.image, message="Yum")
+        Image.objects.update(likes_count=7, comments_count=0)
+        Profile.objects.update(post_count=3, followers_count=0, following_count=5)
+
+        out = StringIO()
+        call_command("reconcile_counters", batch_size=2, stdout=out)
+
+        self.assertCountersMatch()
+        for profile in [self.author, *self.fans]:
+            profile.refresh_from_db()
+            self.assertEqual(profile.followers_count, profile.follower_edges.count())
+            self.assertEqual(profile.following_count, profile.following_edges.count())
+        self.assertIn(f"Fixed 1 images and {1 + len(self.fans)} profiles", out.getvalue())
+
+
+# a point in Paris and points east of it, (latitude, longitude)
+PARIS = (48.8566, 2.3522)
+
+
+def east_of(point, meters):
+    latitude, longitude = point
+    return latitude, longitude + meters / (111320 * 0.6579)
+
+
+class GeoTests(TestCase):
+    def test_points_are_longitude_first(self):
+        point = make_point(*PARIS)
+
+        self.assertEqual((point.x, point.y), (PARIS[1], PARIS[0]))
+
+    def test_distance(self):
+        london = (51.5074, -0.1278)
+
+        self.assertAlmostEqual(distance(*PARIS, *london) / 1000, 343.5, delta=2)
+        self.assertAlmostEqual(distance(*PARIS, *east_of(PARIS, 1000)), 1000, delta=5)
+
+    def test_bounding_box_encloses_the_circle(self):
+        box = bounding_box(*PARIS, 1000)
+
+        self.assertTrue(box.contains(make_point(*east_of(PARIS, 990))))
+        self.assertFalse(box.contains(make_point(*east_of(PARIS, 1500))))
+
+
+class NearbyTests(TestCase):
+    def setUp(self):
+        caches[settings.NEARBY_CACHE].clear()
+        self.author = create_profile("author")
+
+    def create_image(self, point, **fields):
+        return Image.objects.create(
+            creator=self.author,
+            restaurant="Chez Test",
+            dish="Soup",
+            point=make_point(*point),
+            **fields,
+        )
+
+    def nearby_ids(self, point, radius, cached=True):
+        images = Image.objects.ready()
+        if cached:
+            images = nearby.nearby_from_cache(images, *point, radius)
+        else:
+            images = images.nearby(*point, radius)
+        return [image.id for image in images.order_by("knn", "id")]
+
+    def test_nearest_first_within_the_radius(self):
+        far = self.create_image(east_of(PARIS, 3000))
+        near = self.create_image(east_of(PARIS, 100))
+        middle = self.create_image(east_of(PARIS, 800))
+        self.create_image(east_of(PARIS, 5000))
+        # latitude and longitude swapped, far away in the Indian Ocean
+        self.create_image((PARIS[1], PARIS[0]))
+        self.create_image(east_of(PARIS, 200), processing_status=Image.PENDING)
+
+        for cached in (False, True):
+            with self.subTest(cached=cached):
+                self.assertEqual(
+                    self.nearby_ids(PARIS, 4000, cached=cached), [near.id, middle.id, far.id]
+                )
+
+    def test_cache_matches_the_search_from_any_point_of_the_tile(self):
+        for meters in range(0, 6000, 250):
+            self.create_image(east_of(PARIS, meters))
+        # the request point is not the tile's center
+        point = east_of(PARIS, 420)
+
+        for radius in (300, 1000, 2600):
+            with self.subTest(radius=radius):
+                self.assertEqual(
+                    self.nearby_ids(point, radius), self.nearby_ids(point, radius, cached=False)
+                )
+
+    def test_saving_and_deleting_invalidate_the_tiles(self):
+        self.assertEqual(self.nearby_ids(PARIS, 1000), [])
+
+        image = self.create_image(east_of(PARIS, 100))
+        self.assertEqual(self.nearby_ids(PARIS, 1000), [image.id])
+
+        image.point = make_point(*east_of(PARIS, 20000))
+        image.save()
+        self.assertEqual(self.nearby_ids(PARIS, 1000), [])
+        self.assertEqual(self.nearby_ids(east_of(PARIS, 20000), 1000), [image.id])
+
+        image.delete()
+        self.assertEqual(self.nearby_ids(east_of(PARIS, 20000), 1000), [])
+
+    def test_candidates_are_cached(self):
+        self.assertEqual(self.nearby_ids(PARIS, 1000), [])
+        # bulk_create sends no post_save, the tile keeps its cached list
+        image = Image(
+            creator=self.author, restaurant="Chez Test", dish="Soup", point=make_point(*PARIS)
+        )
+        Image.objects.bulk_create([image])
+        self.assertEqual(self.nearby_ids(PARIS, 1000), [])
+
+        nearby.invalidate(make_point(*PARIS))
+
+        self.assertEqual(len(self.nearby_ids(PARIS, 1000)), 1)
+
+
+def ids(*images):
+    return sorted(image.id for image in images)
+
+
+class HashtagTests(TestCase):
+    def setUp(self):
+        self.author = create_profile("author")
+        self.soup, self.stew, self.cake = [
+            Image.objects.create(creator=self.author, restaurant="Chez Test", dish=dish)
+            for dish in ("Soup", "Stew", "Cake")
+        ]
+        self.soup.tags.add("hot", "vegan")
+        self.stew.tags.add("hot")
+        self.cake.tags.add("vegan", "sweet")
+
+    def tagged(self, names, match_all=False):
+        return sorted(image.id for image in Image.objects.tagged(names, match_all=match_all))
+
+    def stats(self):
+        return dict(HashtagStat.objects.values_list("tag__name", "images_count"))
+
+    def test_tagged_with_any(self):
+        self.assertEqual(self.tagged(["hot", "sweet"]), ids(self.soup, self.stew, self.cake))
+        self.assertEqual(self.tagged(["hot", "hot"]), ids(self.soup, self.stew))
+        self.assertEqual(self.tagged(["unknown"]), [])
+
+    def test_tagged_with_all(self):
+        self.assertEqual(self.tagged(["hot", "vegan"], match_all=True), [self.soup.id])
+        self.assertEqual(self.tagged(["hot", "hot"], match_all=True), ids(self.soup, self.stew))
+        self.assertEqual(self.tagged(["hot", "sweet"], match_all=True), [])
+
+    def test_only_image_tags(self):
+        comment = Comment.objects.create(creator=self.author, image=self.soup, message="Yum")
+        comment.tags.add("sweet")
+
+        self.assertEqual(self.tagged(["sweet"]), [self.cake.id])
+        self.assertEqual(self.stats()["sweet"], 1)
+
+    def test_stats_follow_tagging(self):
+        self.assertEqual(self.stats(), {"hot": 2, "vegan": 2, "sweet": 1})
+
+        self.soup.tags.remove("hot")
+        self.cake.delete()
+
+        self.assertEqual(self.stats(), {"hot": 1, "vegan": 1, "sweet": 0})
+
+
+@override_settings(
+    TRENDING_WINDOW_HOURS=48, TRENDING_HALF_LIFE=3600, TRENDING_COMMENT_WEIGHT=2, TRENDING_SIZE=10
+)
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.author = create_profile("author")
+        self.fan = create_profile("fan")
+
+    def create_image(self, tag, **fields):
+        image = Image.objects.create(
+            creator=self.author, restaurant="Chez Test", dish="Soup", **fields
+        )
+        image.tags.add(tag)
+        return image
+
+    def like(self, image, age=timedelta(0)):
+        like = Like.objects.create(creator=self.fan, image=image)
+        Like.objects.filter(id=like.id).update(created_at=timezone.now() - age)
+
+    def scores(self, model, field):
+        return dict(model.objects.values_list(field, "score"))
+
+    def test_rollup(self):
+        liked = self.create_image("soup")
+        commented = self.create_image("soup")
+        older = self.create_image("stew")
+        too_old = self.create_image("stew")
+        pending = self.create_image("cake", processing_status=Image.PENDING)
+        self.like(liked)
+        Comment.objects.create(creator=self.fan, image=commented, message="Yum")
+        self.like(older, age=timedelta(hours=1))
+        self.like(too_old, age=timedelta(hours=49))
+        self.like(pending)
+
+        self.assertEqual(trending.rollup(), (3, 3))
+
+        images = self.scores(TrendingImage, "image_id")
+        self.assertEqual(set(images), {liked.id, commented.id, older.id})
+        self.assertAlmostEqual(images[liked.id], 1, places=2)
+        self.assertAlmostEqual(images[commented.id], 2, places=2)
+        self.assertAlmostEqual(images[older.id], 0.5, places=2)
+        tags = self.scores(TrendingTag, "tag__name")
+        self.assertAlmostEqual(tags["soup"], 3, places=2)
+        self.assertAlmostEqual(tags["stew"], 0.5, places=2)
+        # tag scores don't depend on the image being ready
+        self.assertAlmostEqual(tags["cake"], 1, places=2)
+
+    @override_settings(TRENDING_SIZE=2)
+    def test_rollup_keeps_the_best(self):
+        images = [self.create_image("soup") for _ in range(3)]
+        for age, image in enumerate(images):
+            self.like(image, age=timedelta(hours=age))
+
+        trending.rollup()
+
+        self.assertEqual(
+            list(TrendingImage.objects.order_by("-score").values_list("image_id", flat=True)),
+            [images[0].id, images[1].id],
+        )
+
+    def test_rollup_replaces_the_previous_one(self):
+        image = self.create_image("soup")
+        self.like(image)
+        trending.rollup()
+        Like.objects.all().delete()
+
+        self.assertEqual(trending.rollup(), (0, 0))
+
+    def test_rollup_task_schedules_the_next_one(self):
+        rollup_trending()
+
+        scheduled = Task.objects.get(name=rollup_trending.task_name)
+        self.assertEqual(scheduled.status, Task.PENDING)
+        self.assertGreater(scheduled.run_after, timezone.now())
+        self.assertIsNone(schedule_trending_rollup(wake=False))
+
+        Task.objects.update(status=Task.RUNNING)
+        self.assertIsNone(schedule_trending_rollup(wake=False))
+        Task.objects.all().delete()
+        self.assertIsNotNone(schedule_trending_rollup(wake=False))
@@ -0,0 +1,85 @@
+"""
+Trending images and tags.
+
+`rollup()` scores the likes and comments of the last TRENDING_WINDOW_HOURS,
+each worth 2 ^ -(age / TRENDING_HALF_LIFE) (comments TRENDING_COMMENT_WEIGHT
+times more), and replaces the TrendingImage and TrendingTag tables with the
+TRENDING_SIZE highest sums. Readers only ever scan those small indexed
+tables. It runs periodically as the `images.rollup_trending` task, see the
+rollup_trending command.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+from taggit.models import TaggedItem
+
+from core.images.models import Comment, Image, Like, TrendingImage, TrendingTag
+
+EVENTS_SQL = """
+WITH events AS (
+    SELECT image_id, power(2, -extract(epoch from %(now)s - created_at) / %(half_life)s) AS weight
+    FROM {like} WHERE created_at > %(since)s AND image_id IS NOT NULL
+    UNION ALL
+    SELECT image_id,
+           %(comment_weight)s * power(2, -extract(epoch from %(now)s - created_at) / %(half_life)s)
+    FROM {comment} WHERE created_at > %(since)s AND image_id IS NOT NULL
+)
+"""
+
+IMAGES_SQL = EVENTS_SQL + """
+INSERT INTO {trending_image} (image_id, score)
+SELECT events.image_id, sum(events.weight)
+FROM events JOIN {image} image ON image.id = events.image_id AND image.processing_status = %(ready)s
+GROUP BY events.image_id
+ORDER BY 2 DESC
+LIMIT %(size)s
+"""
+
+TAGS_SQL = EVENTS_SQL + """
+INSERT INTO {trending_tag} (tag_id, score)
+SELECT tagged.tag_id, sum(events.weight)
+FROM events
+JOIN {tagged_item} tagged
+  ON tagged.object_id = events.image_id AND tagged.content_type_id = %(content_type)s
+GROUP BY tagged.tag_id
+ORDER BY 2 DESC
+LIMIT %(size)s
+"""
+
+
+def _tables():
+    quote = connection.ops.quote_name
+    return {
+        "like": quote(Like._meta.db_table),
+        "comment": quote(Comment._meta.db_table),
+        "image": quote(Image._meta.db_table),
+        "tagged_item": quote(TaggedItem._meta.db_table),
+        "trending_image": quote(TrendingImage._meta.db_table),
+        "trending_tag": quote(TrendingTag._meta.db_table),
+    }
+
+
+def rollup():
+    """ Recompute both trending tables in one transaction, returns their sizes """
+    now = timezone.now()
+    params = {
+        "now": now,
+        "since": now - timedelta(hours=settings.TRENDING_WINDOW_HOURS),
+        "half_life": settings.TRENDING_HALF_LIFE,
+        "comment_weight": settings.TRENDING_COMMENT_WEIGHT,
+        "size": settings.TRENDING_SIZE,
+        "ready": Image.READY,
+        "content_type": ContentType.objects.get_for_model(Image).id,
+    }
+    tables = _tables()
+
+    with transaction.atomic():
+        TrendingImage.objects.all().delete()
+        TrendingTag.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(IMAGES_SQL.format(**tables), params)
+            cursor.execute(TAGS_SQL.format(**tables), params)
+    return TrendingImage.objects.count(), TrendingTag.objects.count()
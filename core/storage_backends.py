@@ -4,3 +4,33 @@ from storages.backends.s3boto3 import S3Boto3Storage
 class MediaStorage(S3Boto3Storage):
     location = 'media'
     file_overwrite = False
+
+    def _key(self, name):
+        return self._encode_name(self._normalize_name(self._clean_name(name)))
+
+    def presigned_post(self, name, content_type, max_size, expire):
+        """ URL and form fields to POST a file of at most max_size bytes to `name` """
+        return self.bucket.meta.client.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=self._key(name),
+            Fields={'acl': self.default_acl, 'Content-Type': content_type},
+            Conditions=[
+                {'acl': self.default_acl},
+                {'Content-Type': content_type},
+                ['content-length-range', 1, max_size],
+            ],
+            ExpiresIn=expire,
+        )
+
+    def presigned_put(self, name, content_type, expire):
+        """ URL to PUT a file to `name`, its size is only checked when finalizing """
+        return self.bucket.meta.client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': self.bucket_name,
+                'Key': self._key(name),
+                'ACL': self.default_acl,
+                'ContentType': content_type,
+            },
+            ExpiresIn=expire,
+        )
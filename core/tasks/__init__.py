@@ -0,0 +1 @@
+default_app_config = 'core.tasks.apps.TasksConfig'
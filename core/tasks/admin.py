@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+from core.tasks.models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status', 'name')
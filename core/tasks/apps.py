@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class TasksConfig(AppConfig):
+    name = 'core.tasks'
+
+    def ready(self):
+        # register the @task functions of every app
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('tasks')
@@ -0,0 +1,27 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.tasks.worker import WorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run background tasks until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="number of worker threads")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        signal.signal(signal.SIGINT, lambda *args: stop.set())
+
+        pool = WorkerPool(options["concurrency"], settings.TASKS_POLL_INTERVAL)
+        pool.start()
+        self.stdout.write(f"Running tasks with {options['concurrency']} threads")
+        stop.wait()
+
+        self.stdout.write("Waiting for running tasks to finish")
+        pool.stop()
@@ -0,0 +1,28 @@
+from django.contrib.postgres.fields import JSONField
+from django.db import models
+from django.utils import timezone
+
+from core.abstract_models import TimeStampedModel
+
+
+class Task(TimeStampedModel):
+    """ A unit of background work, see core.tasks.queue """
+    PENDING = "P"
+    RUNNING = "R"
+    FAILED = "F"
+
+    STATUS_CHOICES = ((PENDING, "Pending"), (RUNNING, "Running"), (FAILED, "Failed"))
+
+    name = models.CharField(max_length=100)
+    payload = JSONField(default=dict)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"], name="task_status_run_after_idx")]
+
+    def __str__(self):
+        return f"{self.name} #{self.id}"
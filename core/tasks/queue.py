@@ -0,0 +1,152 @@
+"""
+A small database-backed task queue, so background work needs no external broker.
+
+Functions decorated with @task are registered by name. `func.delay(**payload)`
+inserts a Task row in the caller's transaction and, once that transaction
+commits, wakes this process's worker pool (see core.tasks.worker). Workers
+claim rows with SELECT ... FOR UPDATE SKIP LOCKED, so any number of threads
+and processes can share the table. Failed tasks are retried with exponential
+backoff until max_attempts, then kept with status FAILED for inspection.
+
+A running task holds a lease of TASKS_LEASE_SECONDS, renewed by a heartbeat
+thread while it runs. A task whose lease expires, because its worker died,
+is claimed again by another worker.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name, max_attempts=3, retry_delay=10):
+    """ Register a background task, retry_delay is in seconds and doubles with every attempt """
+
+    def register(func):
+        func.task_name = name
+        func.max_attempts = max_attempts
+        func.retry_delay = retry_delay
+        func.delay = lambda **payload: enqueue(name, **payload)
+        _registry[name] = func
+        return func
+
+    return register
+
+
+def enqueue(name, run_after=None, wake=True, **payload):
+    """
+    Insert the task, wake=False leaves it to the workers' polling instead of
+    waking this process's pool, e.g. from a short-lived management command
+    that would exit in the middle of running it
+    """
+    func = _registry[name]
+    job = Task.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=func.max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+    if wake:
+        transaction.on_commit(_dispatch)
+    return job
+
+
+def _dispatch():
+    if settings.TASKS_ALWAYS_EAGER:
+        run_pending()
+    else:
+        from core.tasks.worker import local_pool
+
+        local_pool().wake()
+
+
+def claim(limit=1):
+    """ Lock due tasks (and tasks whose worker died mid-run) and mark them as running """
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=settings.TASKS_LEASE_SECONDS)
+    due = Q(status=Task.PENDING, run_after__lte=now) | Q(
+        status=Task.RUNNING, updated_at__lt=lease_expired
+    )
+    with transaction.atomic():
+        jobs = list(
+            Task.objects.select_for_update(skip_locked=True).filter(due).order_by("run_after")[
+                :limit
+            ]
+        )
+        for job in jobs:
+            job.status = Task.RUNNING
+            job.attempts += 1
+            job.save(update_fields=["status", "attempts", "updated_at"])
+    return jobs
+
+
+class Heartbeat(threading.Thread):
+    """ Renews a running task's lease every third of TASKS_LEASE_SECONDS until stopped """
+
+    def __init__(self, job):
+        super().__init__(name=f"task-heartbeat-{job.id}", daemon=True)
+        self.job_id = job.id
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(settings.TASKS_LEASE_SECONDS / 3):
+                Task.objects.filter(id=self.job_id, status=Task.RUNNING).update(
+                    updated_at=timezone.now()
+                )
+        except Exception:
+            logger.exception("Could not renew the lease of task %s", self.job_id)
+        finally:
+            # the heartbeat thread's own connection
+            connections.close_all()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def execute(job):
+    func = _registry.get(job.name)
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        if func is None:
+            raise LookupError(f"No task registered as {job.name}")
+        func(**job.payload)
+    except Exception:
+        heartbeat.stop()
+        logger.exception("Task %s failed (attempt %s/%s)", job, job.attempts, job.max_attempts)
+        job.last_error = traceback.format_exc()
+        if func is None or job.attempts >= job.max_attempts:
+            job.status = Task.FAILED
+        else:
+            job.status = Task.PENDING
+            delay = func.retry_delay * 2 ** (job.attempts - 1)
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        job.save(update_fields=["status", "run_after", "last_error", "updated_at"])
+        return False
+    heartbeat.stop()
+    job.delete()
+    return True
+
+
+def run_pending():
+    """ Run due tasks on the current thread until there are none left """
+    count = 0
+    while True:
+        jobs = claim()
+        if not jobs:
+            return count
+        for job in jobs:
+            execute(job)
+            count += 1
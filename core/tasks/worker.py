@@ -0,0 +1,74 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from core.tasks.queue import claim, execute
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """ Threads that claim and run tasks, polling the table when there is nothing to wake them """
+
+    def __init__(self, size, poll_interval):
+        self.size = size
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for number in range(self.size):
+                thread = threading.Thread(
+                    target=self._work, name=f"task-worker-{number}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        if self.size:
+            self.start()
+            self._wakeup.set()
+
+    def stop(self, timeout=None):
+        """ Let the running tasks finish, then stop the threads """
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            close_old_connections()
+            try:
+                jobs = claim()
+                for job in jobs:
+                    execute(job)
+            except Exception:
+                logger.exception("Task worker iteration failed")
+                jobs = []
+            if not jobs:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+        close_old_connections()
+
+
+_local_pool = None
+_local_pool_lock = threading.Lock()
+
+
+def local_pool():
+    """ The pool running inside this process, started on first use (after any fork) """
+    global _local_pool
+    with _local_pool_lock:
+        if _local_pool is None:
+            _local_pool = WorkerPool(
+                settings.TASKS_IN_PROCESS_WORKERS, settings.TASKS_POLL_INTERVAL
+            )
+    return _local_pool
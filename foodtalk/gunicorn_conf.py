@@ -0,0 +1,45 @@
+"""
+Gunicorn settings for the web process:
+
+    gunicorn -c foodtalk/gunicorn_conf.py foodtalk.wsgi:application
+
+WEB_CONCURRENCY worker processes, one per core by default, each serving
+GUNICORN_THREADS requests at once. Threads mostly wait on the database and
+on notification long-polls (NOTIFICATION_STREAM_TIMEOUT), so there are many
+more of them than cores. The app is imported once in the master and forked.
+Nothing opens a connection or starts a thread at import time: the task
+worker pool, the notification buffer and the LISTEN thread start lazily in
+each worker. Workers are recycled after GUNICORN_MAX_REQUESTS requests,
+with jitter so they don't all restart at once, and get
+GUNICORN_GRACEFUL_TIMEOUT seconds to finish their requests.
+
+Background tasks, image processing included, are left to the `worker`
+process of the Procfile unless TASKS_IN_PROCESS_WORKERS is set.
+
+There is no ASGI entry point. Django 2.1 only speaks WSGI, and asgiref's
+WsgiToAsgi runs the wrapped app with sync_to_async(thread_sensitive=True),
+i.e. one request at a time per worker, so a single notification long-poll
+would stall a whole uvicorn worker. gthread workers are the async-friendly
+option here, a waiting long-poll only holds one of their threads.
+"""
+import multiprocessing
+import os
+
+# read by the settings, which the master imports after this file
+os.environ.setdefault("TASKS_IN_PROCESS_WORKERS", "0")
+
+bind = "0.0.0.0:{}".format(os.environ.get("PORT", 8000))
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes", "on")
+
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+# must stay above NOTIFICATION_STREAM_TIMEOUT
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+accesslog = "-"
+errorlog = "-"
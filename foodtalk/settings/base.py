@@ -47,7 +47,7 @@ INSTALLED_APPS = [
     "django.contrib.gis",
 ]
 
-LOCAL_APPS = ["core.api", "core.images", "core.accounts"]
+LOCAL_APPS = ["core.api", "core.images", "core.accounts", "core.tasks"]
 
 THIRD_PARTY_APPS = [
     "allauth",  # registration
@@ -110,6 +110,15 @@ DATABASES["default"] = env.db()
 DATABASES["default"]["ENGINE"] = "django.contrib.gis.db.backends.postgis"
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# local memory unless CACHE_URL points at a shared backend (e.g. memcache://...).
+# Set CACHE_URL in production: with per-process caches and several web workers the
+# response cache (core.api.cache) is disabled and the other caches are per worker
+
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -144,13 +153,16 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 # REST Framework
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    # see core.api.authentication, HTTP Basic is only accepted by the token view
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.BasicAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
-        "rest_framework_jwt.authentication.JSONWebTokenAuthentication",
-        "rest_framework.authentication.SessionAuthentication",
+        "core.api.authentication.JWTAuthentication",
+        "core.api.authentication.CachedTokenAuthentication",
+        "core.api.authentication.TimedSessionAuthentication",
     ),
 }
+# token -> user lookups of CachedTokenAuthentication, per process
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get("AUTH_TOKEN_CACHE_TTL", 60))
 JWT_AUTH = {
     "JWT_EXPIRATION_DELTA": datetime.timedelta(seconds=600),
     "JWT_REFRESH_EXPIRATION_DELTA": datetime.timedelta(days=7),
@@ -165,6 +177,18 @@ MEDIA_URL = "/media/"
 
 # Twilio
 ACCOUNT_SECURITY_API_KEY = os.environ.get("ACCOUNT_SECURITY_API_KEY", None)
+# Phone verification, see core.accounts.verification. FakeProvider sends nothing
+# and accepts PHONE_VERIFICATION_FAKE_CODE, for development and load tests
+PHONE_VERIFICATION_PROVIDER = os.environ.get(
+    "PHONE_VERIFICATION_PROVIDER", "core.accounts.verification.AuthyProvider"
+)
+PHONE_VERIFICATION_TIMEOUT = float(os.environ.get("PHONE_VERIFICATION_TIMEOUT", 5))
+PHONE_VERIFICATION_BREAKER_FAILURES = int(
+    os.environ.get("PHONE_VERIFICATION_BREAKER_FAILURES", 5)
+)
+PHONE_VERIFICATION_BREAKER_RESET = int(os.environ.get("PHONE_VERIFICATION_BREAKER_RESET", 30))
+PHONE_VERIFICATION_FAKE_CODE = os.environ.get("PHONE_VERIFICATION_FAKE_CODE", "000000")
+PHONE_VERIFICATION_FAKE_LATENCY = float(os.environ.get("PHONE_VERIFICATION_FAKE_LATENCY", 0))
 
 SITE_ID = 1
 
@@ -178,7 +202,98 @@ AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY', None)
 AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME', None)
 AWS_S3_CUSTOM_DOMAIN = f"{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com"
 AWS_S3_CUSTOM_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}"
+# point at an S3-compatible server (e.g. a local MinIO) instead of AWS
+AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL', None)
 
 AWS_S3_OBJECT_PARAMETERS = {
     'CacheControl': 'max-age=86400',
-}
\ No newline at end of file
+}
+
+# Home feed
+# Creators with more followers than this are not fanned out on write,
+# their images are merged into followers' feeds at read time instead
+FEED_FANOUT_MAX_FOLLOWERS = int(os.environ.get("FEED_FANOUT_MAX_FOLLOWERS", 5000))
+# How many recent images of a newly followed profile are copied into the feed
+FEED_BACKFILL_SIZE = int(os.environ.get("FEED_BACKFILL_SIZE", 100))
+
+# Nearby image search radius in meters, clients may ask for up to the max
+IMAGES_NEARBY_RADIUS = int(os.environ.get("IMAGES_NEARBY_RADIUS", 2000))
+IMAGES_NEARBY_MAX_RADIUS = int(os.environ.get("IMAGES_NEARBY_MAX_RADIUS", 50000))
+
+# Nearby searches up to this radius are answered from per-tile rankings cached
+# in the NEARBY_CACHE cache, tiles are NEARBY_TILE_SIZE degrees wide
+NEARBY_CACHE = os.environ.get("NEARBY_CACHE", "default")
+NEARBY_CACHE_MAX_RADIUS = int(os.environ.get("NEARBY_CACHE_MAX_RADIUS", 5000))
+NEARBY_CACHE_SIZE = int(os.environ.get("NEARBY_CACHE_SIZE", 1000))
+NEARBY_CACHE_TIMEOUT = int(os.environ.get("NEARBY_CACHE_TIMEOUT", 300))
+NEARBY_TILE_SIZE = float(os.environ.get("NEARBY_TILE_SIZE", 0.01))
+
+# Viewer-independent parts of serialized images and profiles (core.api.cache),
+# kept in the RESPONSE_CACHE cache for at most RESPONSE_CACHE_TIMEOUT seconds.
+# Only used when that cache is shared between processes, i.e. not locmemcache://
+RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE", "default")
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 300))
+
+# Number of most recent comments inlined in image listings
+IMAGE_INLINE_COMMENTS = int(os.environ.get("IMAGE_INLINE_COMMENTS", 3))
+
+# User search returns USER_SEARCH_LIMIT profiles ranked out of the USER_SEARCH_CANDIDATES
+# most followed matches, which are cached for prefixes up to USER_SEARCH_SHORT_PREFIX long
+USER_SEARCH_LIMIT = int(os.environ.get("USER_SEARCH_LIMIT", 20))
+USER_SEARCH_CANDIDATES = int(os.environ.get("USER_SEARCH_CANDIDATES", 200))
+USER_SEARCH_SHORT_PREFIX = int(os.environ.get("USER_SEARCH_SHORT_PREFIX", 2))
+USER_SEARCH_CACHE_TIMEOUT = int(os.environ.get("USER_SEARCH_CACHE_TIMEOUT", 600))
+
+# Explore users recommendations (core.accounts.recommendations), the RECOMMENDATIONS_SIZE
+# best candidates of each profile, rebuilt every RECOMMENDATIONS_INTERVAL seconds
+# RECOMMENDATIONS_BATCH profiles at a time. Activity and location are taken from the
+# images of the last RECOMMENDATIONS_DAYS, proximity counts up to RECOMMENDATIONS_RADIUS meters
+RECOMMENDATIONS_SIZE = int(os.environ.get("RECOMMENDATIONS_SIZE", 100))
+RECOMMENDATIONS_INTERVAL = int(os.environ.get("RECOMMENDATIONS_INTERVAL", 6 * 3600))
+RECOMMENDATIONS_BATCH = int(os.environ.get("RECOMMENDATIONS_BATCH", 500))
+RECOMMENDATIONS_DAYS = int(os.environ.get("RECOMMENDATIONS_DAYS", 30))
+RECOMMENDATIONS_RADIUS = int(os.environ.get("RECOMMENDATIONS_RADIUS", 25000))
+RECOMMENDATIONS_MUTUAL_WEIGHT = float(os.environ.get("RECOMMENDATIONS_MUTUAL_WEIGHT", 1))
+RECOMMENDATIONS_ACTIVITY_WEIGHT = float(os.environ.get("RECOMMENDATIONS_ACTIVITY_WEIGHT", 0.5))
+RECOMMENDATIONS_PROXIMITY_WEIGHT = float(os.environ.get("RECOMMENDATIONS_PROXIMITY_WEIGHT", 2))
+
+# Trending images and tags (core.images.trending): likes and comments of the last
+# TRENDING_WINDOW_HOURS, halving in weight every TRENDING_HALF_LIFE seconds, the
+# TRENDING_SIZE best of each kept and recomputed every TRENDING_INTERVAL seconds
+TRENDING_WINDOW_HOURS = int(os.environ.get("TRENDING_WINDOW_HOURS", 48))
+TRENDING_HALF_LIFE = int(os.environ.get("TRENDING_HALF_LIFE", 6 * 3600))
+TRENDING_COMMENT_WEIGHT = float(os.environ.get("TRENDING_COMMENT_WEIGHT", 2))
+TRENDING_SIZE = int(os.environ.get("TRENDING_SIZE", 500))
+TRENDING_INTERVAL = int(os.environ.get("TRENDING_INTERVAL", 600))
+
+# Notifications are written in batches of up to NOTIFICATION_BUFFER_SIZE, at most
+# NOTIFICATION_BUFFER_INTERVAL seconds after they were created, 1 writes them right away
+NOTIFICATION_BUFFER_SIZE = int(os.environ.get("NOTIFICATION_BUFFER_SIZE", 100))
+NOTIFICATION_BUFFER_INTERVAL = float(os.environ.get("NOTIFICATION_BUFFER_INTERVAL", 1))
+
+# Notification long-poll: requests wait up to NOTIFICATION_STREAM_TIMEOUT seconds and
+# re-check the database every NOTIFICATION_STREAM_POLL seconds. "postgres" wakes them
+# across processes with LISTEN/NOTIFY, "local" only within the process that stored them.
+# Every waiting request holds a server thread, size the web server's threads accordingly
+NOTIFICATION_STREAM_BACKEND = os.environ.get("NOTIFICATION_STREAM_BACKEND", "postgres")
+NOTIFICATION_STREAM_CHANNEL = os.environ.get("NOTIFICATION_STREAM_CHANNEL", "notifications")
+NOTIFICATION_STREAM_TIMEOUT = int(os.environ.get("NOTIFICATION_STREAM_TIMEOUT", 25))
+NOTIFICATION_STREAM_POLL = float(os.environ.get("NOTIFICATION_STREAM_POLL", 5))
+
+# Image renditions generated after upload: name -> longest side in pixels
+IMAGE_RENDITIONS = {"thumbnail": 320, "feed": 1080, "full": 2048}
+# Direct-to-storage uploads
+IMAGE_UPLOAD_MAX_SIZE = int(os.environ.get("IMAGE_UPLOAD_MAX_SIZE", 20 * 1024 * 1024))
+IMAGE_UPLOAD_URL_EXPIRE = int(os.environ.get("IMAGE_UPLOAD_URL_EXPIRE", 900))
+
+
+# Background tasks (core.tasks)
+# worker threads started inside each web process on first use, 0 leaves all
+# the work to `manage.py runtasks`
+TASKS_IN_PROCESS_WORKERS = int(os.environ.get("TASKS_IN_PROCESS_WORKERS", 2))
+TASKS_POLL_INTERVAL = float(os.environ.get("TASKS_POLL_INTERVAL", 5))
+# a running task's lease, renewed while it runs, a task whose worker died is
+# handed to another worker once its lease expires
+TASKS_LEASE_SECONDS = int(os.environ.get("TASKS_LEASE_SECONDS", 600))
+# run tasks synchronously when the enqueuing transaction commits
+TASKS_ALWAYS_EAGER = env.bool("TASKS_ALWAYS_EAGER", default=False)